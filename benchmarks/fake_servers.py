@@ -0,0 +1,338 @@
+"""Local stand-ins for the GitHub REST API and the Anthropic Messages API.
+
+They implement just enough of both for `resolve_issue.run` to go through the
+real PyGithub and Anthropic clients: repository and issue lookups (REST, and the
+GraphQL issue, issues and search queries issued by issue_utils), the Git Data
+API calls made by create_pull_request, pull request creation, and streamed or
+non-streamed message responses. Latency can be simulated per request and per
+streamed chunk so the benchmarks can model a slow network or model.
+
+    github = FakeGitHub(issues={1: body}).start()
+    anthropic = FakeAnthropic(first_token_delay=0.2).start()
+    os.environ['GITHUB_API_URL'] = github.url
+    os.environ['ANTHROPIC_BASE_URL'] = anthropic.url
+"""
+import hashlib
+import itertools
+import json
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        return json.loads(raw) if raw else {}
+
+    def _dispatch(self, verb):
+        fake = self.server.fake
+        fake.count(verb, self.path)
+        if fake.latency:
+            time.sleep(fake.latency)
+        body = self._body() if verb in ('POST', 'PATCH') else {}
+        fake.handle(self, verb, self.path.split('?')[0], body)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeServer:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    def count(self, verb, path):
+        key = verb + ' ' + re.sub(r'/[0-9a-f]{40}|/\d+', '/:id', path.split('?')[0])
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeGitHub(FakeServer):
+    """In-memory GitHub for a single repository (`owner/name`)."""
+
+    def __init__(self, issues, full_name='bench/synthetic', default_branch='main', latency=0.0):
+        super().__init__(latency)
+        self.full_name = full_name
+        self.default_branch = default_branch
+        self.issues = dict(issues)
+        self.pulls = []
+        self.refs = {}
+        self.blobs = {}
+        self._ids = itertools.count(1)
+
+    def _sha(self, *parts):
+        return hashlib.sha1(('\0'.join(map(str, parts)) + str(next(self._ids))).encode('utf-8')).hexdigest()
+
+    def _repo_url(self, suffix=''):
+        return f"{self.url}/repos/{self.full_name}{suffix}"
+
+    def _repo(self):
+        owner, name = self.full_name.split('/')
+        return {'id': 1, 'name': name, 'full_name': self.full_name, 'owner': {'login': owner},
+                'default_branch': self.default_branch, 'url': self._repo_url(),
+                'html_url': f"https://github.invalid/{self.full_name}"}
+
+    def _issue(self, number):
+        title, body = self.issues[number]
+        return {'number': number, 'title': title, 'body': body, 'state': 'open', 'labels': [],
+                'updated_at': '2024-01-01T00:00:00Z', 'url': self._repo_url(f"/issues/{number}"),
+                'html_url': f"https://github.invalid/{self.full_name}/issues/{number}"}
+
+    def _commit(self, sha):
+        return {'sha': sha, 'url': self._repo_url(f"/git/commits/{sha}"), 'message': 'base',
+                'tree': {'sha': 'f' * 40, 'url': self._repo_url('/git/trees/' + 'f' * 40)}, 'parents': []}
+
+    def _issue_node(self, number):
+        title, body = self.issues[number]
+        return {'number': number, 'title': title, 'body': body, 'updatedAt': '2024-01-01T00:00:00Z',
+                'url': f"https://github.invalid/{self.full_name}/issues/{number}", 'labels': {'nodes': []}}
+
+    def graphql(self, handler, body):
+        # Recognizes the queries by shape rather than parsing GraphQL, and
+        # always returns every field.
+        query, variables = body.get('query', ''), body.get('variables') or {}
+
+        def page(numbers):
+            start, first = int(variables.get('after') or 0), variables.get('first', 100)
+            return {'nodes': [self._issue_node(n) for n in numbers[start:start + first]],
+                    'pageInfo': {'hasNextPage': start + first < len(numbers), 'endCursor': str(start + first)}}
+
+        aliases = re.findall(r'(\w+): issue\(number: (\d+)\)', query)
+        if aliases:
+            payload = {'data': {'repository': {alias: self._issue_node(int(n)) if int(n) in self.issues else None
+                                               for alias, n in aliases}}}
+            missing = [n for _, n in aliases if int(n) not in self.issues]
+            if missing:
+                payload['errors'] = [{'type': 'NOT_FOUND', 'message': f"Could not resolve to an Issue with the number of {n}."}
+                                     for n in missing]
+        elif 'search(' in query:
+            phrase = re.search(r'in:title "([^"]*)"', variables.get('query', ''))
+            words = phrase.group(1).lower().split() if phrase else []
+            numbers = [n for n in sorted(self.issues) if all(w in self.issues[n][0].lower() for w in words)]
+            payload = {'data': {'search': dict(page(numbers), issueCount=len(numbers))}}
+        elif 'issues(' in query:
+            numbers = sorted(self.issues)
+            payload = {'data': {'repository': {'issues': dict(page(numbers), totalCount=len(numbers))}}}
+        else:
+            return handler.send_json(400, {'message': 'Unsupported query'})
+        handler.send_json(200, payload)
+
+    def handle(self, handler, verb, path, body):
+        if verb == 'POST' and path == '/graphql':
+            return self.graphql(handler, body)
+        prefix = f"/repos/{self.full_name}"
+        if not path.startswith(prefix):
+            return handler.send_json(404, {'message': 'Not Found'})
+        route = path[len(prefix):]
+        headers = {'X-RateLimit-Remaining': '4999', 'X-RateLimit-Reset': str(int(time.time()) + 3600),
+                   'ETag': f'"{hashlib.sha1(route.encode()).hexdigest()}"'}
+
+        if verb == 'GET' and route == '':
+            return handler.send_json(200, self._repo(), headers)
+        if verb == 'GET' and route == '/issues':
+            return handler.send_json(200, [self._issue(n) for n in sorted(self.issues)], headers)
+        match = re.fullmatch(r'/issues/(\d+)', route)
+        if verb == 'GET' and match:
+            number = int(match.group(1))
+            if number not in self.issues:
+                return handler.send_json(404, {'message': 'Not Found'})
+            return handler.send_json(200, self._issue(number), headers)
+        match = re.fullmatch(r'/branches/(.+)', route)
+        if verb == 'GET' and match:
+            sha = '0' * 40
+            return handler.send_json(200, {'name': match.group(1), 'commit': {
+                'sha': sha, 'url': self._repo_url(f"/commits/{sha}"), 'commit': self._commit(sha)}}, headers)
+
+        if verb == 'POST' and route == '/git/blobs':
+            sha = self._sha(body.get('content'))
+            self.blobs[sha] = body.get('content')
+            return handler.send_json(201, {'sha': sha, 'url': self._repo_url(f"/git/blobs/{sha}")})
+        if verb == 'POST' and route == '/git/trees':
+            sha = self._sha('tree', json.dumps(body.get('tree')))
+            return handler.send_json(201, {'sha': sha, 'url': self._repo_url(f"/git/trees/{sha}"),
+                                           'tree': body.get('tree', [])})
+        if verb == 'POST' and route == '/git/commits':
+            sha = self._sha('commit', body.get('message'))
+            commit = self._commit(sha)
+            commit.update(message=body.get('message'), tree={'sha': body.get('tree')})
+            return handler.send_json(201, commit)
+        if verb == 'POST' and route == '/git/refs':
+            if body['ref'] in self.refs:
+                return handler.send_json(422, {'message': 'Reference already exists'})
+            self.refs[body['ref']] = body['sha']
+            return handler.send_json(201, {'ref': body['ref'], 'url': self._repo_url(f"/git/{body['ref']}"),
+                                           'object': {'sha': body['sha'], 'type': 'commit'}})
+        if verb == 'POST' and route == '/pulls':
+            number = len(self.pulls) + 1
+            self.pulls.append(body)
+            return handler.send_json(201, {'number': number, 'title': body.get('title'), 'state': 'open',
+                                           'url': self._repo_url(f"/pulls/{number}"),
+                                           'html_url': f"https://github.invalid/{self.full_name}/pull/{number}"})
+        return handler.send_json(404, {'message': f"Not implemented: {verb} {route}"})
+
+
+class FakeAnthropic(FakeServer):
+    """Messages API that answers with a '# File:' section for each affected file.
+
+    The affected files are read back from the prompt's 'Affected Files:' line,
+    so the generated sections always target files that exist in the synthetic
+    repository and produce a real diff. Prompt caching is simulated: a prefix
+    ending in a cache_control block is written on first use and read after
+    that, which is reported in the usage and shortens the first-token delay.
+    """
+
+    def __init__(self, latency=0.0, first_token_delay=0.0, chunk_delay=0.0, chunk_size=64):
+        super().__init__(latency)
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_read_tokens = 0
+        self.cache_write_tokens = 0
+        self._prefixes = set()
+
+    def completion(self, prompt):
+        if 'outline a short plan' in prompt:
+            return "1. Update the affected functions consistently.\n"
+        # Fan-out calls name the files they are responsible for after the plan.
+        match = re.search(r'for these files only: (.*)', prompt) or re.search(r'Affected Files: (.*)', prompt)
+        paths = [p.strip() for p in match.group(1).split(',') if p.strip()] if match else []
+        sections = []
+        for path in paths or ['src/generated_fix.py']:
+            sections.append(f"# File: {path}\n"
+                            f"def patched_{zlib.crc32(path.encode('utf-8')) % 10000}(value):\n"
+                            "    return value\n")
+        return '\n'.join(sections)
+
+    @staticmethod
+    def cache_breakpoints(body):
+        # (digest, length) of every prompt prefix ending in a cache_control block.
+        blocks = [{'text': body['system']}] if isinstance(body.get('system'), str) else list(body.get('system') or [])
+        for message in body.get('messages', []):
+            content = message['content']
+            blocks.extend([{'text': content}] if isinstance(content, str) else content)
+        digest = hashlib.sha256()
+        length = 0
+        breakpoints = []
+        for block in blocks:
+            text = block.get('text', '')
+            digest.update(text.encode('utf-8'))
+            length += len(text)
+            if block.get('cache_control'):
+                breakpoints.append((digest.hexdigest(), length))
+        return breakpoints, length
+
+    def cache_usage(self, body):
+        breakpoints, length = self.cache_breakpoints(body)
+        read = written = 0
+        with self._lock:
+            for digest, prefix_length in breakpoints:
+                if digest in self._prefixes:
+                    read = prefix_length
+                else:
+                    self._prefixes.add(digest)
+                    written = prefix_length - read
+        return {'input_tokens': (length - read - written) // 4,
+                'cache_read_input_tokens': read // 4,
+                'cache_creation_input_tokens': written // 4}, (read / length if length else 0.0)
+
+    def handle(self, handler, verb, path, body):
+        if verb != 'POST' or path != '/v1/messages':
+            return handler.send_json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': path}})
+        prompt = ''.join(m['content'] if isinstance(m['content'], str) else
+                         ''.join(block.get('text', '') for block in m['content'])
+                         for m in body.get('messages', []))
+        text = self.completion(prompt)
+        usage, cached_fraction = self.cache_usage(body)
+        usage['output_tokens'] = len(text) // 4
+        with self._lock:
+            self.input_tokens += usage['input_tokens']
+            self.output_tokens += usage['output_tokens']
+            self.cache_read_tokens += usage['cache_read_input_tokens']
+            self.cache_write_tokens += usage['cache_creation_input_tokens']
+        if self.first_token_delay:
+            # Cached prefix tokens are read rather than processed again.
+            time.sleep(self.first_token_delay * max(0.1, 1.0 - cached_fraction))
+        message = {'id': 'msg_bench', 'type': 'message', 'role': 'assistant', 'model': body.get('model'),
+                   'stop_reason': 'end_turn', 'stop_sequence': None}
+        if not body.get('stream'):
+            # Generation takes as long as it would have taken to stream.
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay * -(-len(text) // self.chunk_size))
+            message.update(content=[{'type': 'text', 'text': text}], usage=usage)
+            return handler.send_json(200, message)
+
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Connection', 'close')
+        handler.end_headers()
+
+        def event(name, payload):
+            handler.wfile.write(f"event: {name}\ndata: {json.dumps(payload)}\n\n".encode('utf-8'))
+            handler.wfile.flush()
+
+        start = dict(message, content=[], stop_reason=None, usage=dict(usage, output_tokens=0))
+        event('message_start', {'type': 'message_start', 'message': start})
+        event('content_block_start', {'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}})
+        for i in range(0, len(text), self.chunk_size):
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            event('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                          'delta': {'type': 'text_delta', 'text': text[i:i + self.chunk_size]}})
+        event('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+        event('message_delta', {'type': 'message_delta', 'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                'usage': {'output_tokens': usage['output_tokens']}})
+        event('message_stop', {'type': 'message_stop'})
+        handler.close_connection = True
@@ -0,0 +1,320 @@
+"""Benchmark suite for the scan and issue-resolution hot paths.
+
+Usage:
+    python benchmarks/run.py [--sizes 1000,10000] [--repeat 3] [--only NAME,...] [--output PATH]
+    python benchmarks/run.py --compare BASE.json NEW.json
+
+Each size generates (once, then reuses) a deterministic synthetic repository
+under --workdir and times:
+
+    should_ignore          matcher construction plus one check per path
+    scan_cold              snapshot walk and full read, empty manifest
+    scan_warm              same, with every file served from the manifest
+    extract_issue_content  parsing synthetic issue bodies
+    clean_generated_code   cleaning fenced model output
+    resolve_issue          resolve_issue.run against local fake GitHub and
+                           Anthropic servers, end to end
+
+Results are written as JSON (default: benchmarks/results/<commit>.json) so runs
+from different commits can be compared with --compare.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from synthetic_repo import generate, layout, issue_bodies, python_files  # noqa: E402
+from fake_servers import FakeGitHub, FakeAnthropic  # noqa: E402
+
+BENCHMARKS = ('should_ignore', 'scan_cold', 'scan_warm', 'extract_issue_content',
+              'clean_generated_code', 'resolve_issue')
+DEFAULT_SIZES = '1000,10000'
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), 'issol-bench')
+PARSE_ITERATIONS = 200
+
+
+@contextlib.contextmanager
+def quiet():
+    # The commands print the full prompt and every generated file; keep that out of the timings.
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def measure(fn, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        with quiet():
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def result(name, files, timings, items, **extra):
+    median = statistics.median(timings)
+    row = {
+        'name': name,
+        'files': files,
+        'repeat': len(timings),
+        'min_s': round(min(timings), 6),
+        'median_s': round(median, 6),
+        'items': items,
+        'items_per_s': round(items / median, 1) if median else None,
+    }
+    row.update(extra)
+    return row
+
+
+def bench_should_ignore(root, files, args):
+    from issol.utils.github_utils import parse_gitignore, should_ignore
+    paths = [path for path, _ in layout(files, args.seed)]
+    directories = sorted({os.path.dirname(path) for path in paths} - {''})
+
+    def run():
+        matcher = parse_gitignore(root)
+        for directory in directories:
+            should_ignore(directory, matcher, is_dir=True)
+        for path in paths:
+            should_ignore(path, matcher)
+
+    return result('should_ignore', files, measure(run, args.repeat), len(paths) + len(directories))
+
+
+def bench_scan(root, files, args, warm):
+    from issol.utils.github_utils import scan_codebase_files
+    from issol.utils.manifest_utils import invalidate_cache
+    from issol.utils.snapshot_utils import get_codebase_snapshot
+    scanned = []
+
+    def setup():
+        if not warm:
+            invalidate_cache()
+        else:
+            scan_codebase_files('main', workers=args.workers)
+
+    def run():
+        get_codebase_snapshot(refresh=True)
+        scanned.append(len(scan_codebase_files('main', workers=args.workers)))
+
+    with working_directory(root):
+        timings = measure(run, args.repeat, setup)
+    name = 'scan_warm' if warm else 'scan_cold'
+    return result(name, files, timings, scanned[-1], workers=args.workers)
+
+
+def bench_extract_issue_content(root, files, args):
+    from issol.utils.github_utils import extract_issue_content
+    bodies = issue_bodies(files, PARSE_ITERATIONS, args.seed)
+
+    def run():
+        for body in bodies:
+            extract_issue_content(body)
+
+    return result('extract_issue_content', files, measure(run, args.repeat), len(bodies))
+
+
+def bench_clean_generated_code(root, files, args):
+    from issol.utils.github_utils import clean_generated_code
+    outputs = []
+    for path in python_files(files, args.seed)[:PARSE_ITERATIONS]:
+        with open(os.path.join(root, path), 'r', encoding='utf-8') as f:
+            outputs.append(f"Here is the updated file:\n```python\n{f.read()}\n```\n")
+
+    def run():
+        for output in outputs:
+            clean_generated_code(output)
+
+    return result('clean_generated_code', files, measure(run, args.repeat), len(outputs),
+                  bytes=sum(len(o) for o in outputs))
+
+
+def reset_clients():
+    from issol.utils import ai_utils, github_utils
+    github_utils._github_client = None
+    ai_utils._anthropic_client = None
+
+
+def bench_resolve_issue(root, files, args):
+    from issol.commands import resolve_issue
+    from issol.utils import ai_utils, github_utils
+    from issol.utils.github_utils import get_repo
+    from issol.utils.manifest_utils import invalidate_cache
+
+    bodies = issue_bodies(files, args.issues, args.seed)
+    issues = {n: (f"{resolve_issue.AI_MARKER}: synthetic issue {n}", body) for n, body in enumerate(bodies, 1)}
+    github = FakeGitHub(issues, latency=args.github_latency)
+    anthropic = FakeAnthropic(first_token_delay=args.model_latency, chunk_delay=args.chunk_latency)
+    saved_env = {name: os.environ.get(name) for name in
+                 ('GITHUB_TOKEN', 'ANTHROPIC_API_KEY', 'GITHUB_API_URL', 'ANTHROPIC_BASE_URL')}
+    saved_cache = ai_utils.response_cache.enabled
+    saved_pacing = github_utils.github_request_pacing
+
+    with github, anthropic, working_directory(root):
+        os.environ.update(GITHUB_TOKEN='bench', ANTHROPIC_API_KEY='bench',
+                          GITHUB_API_URL=github.url, ANTHROPIC_BASE_URL=anthropic.url)
+        ai_utils.response_cache.enabled = False
+        # PyGithub's pacing sleeps between writes; against the local fake that
+        # would be most of the measured time, as with cassette replays.
+        github_utils.github_request_pacing = False
+        reset_clients()
+
+        failures = []
+
+        def setup():
+            invalidate_cache()
+
+        def run():
+            # A run that opens no pull requests is fast, not good: check each one.
+            pulls_before = len(github.pulls)
+            model_before = sum(anthropic.requests.values())
+            repo = get_repo(github.full_name)
+            resolve_issue.run(repo, sorted(issues), 'main', workers=args.workers, concurrency=args.concurrency,
+                              fan_out=args.fan_out)
+            pull_requests = len(github.pulls) - pulls_before
+            model_requests = sum(anthropic.requests.values()) - model_before
+            if pull_requests != len(issues) or not model_requests:
+                failures.append(f"{pull_requests} pull requests for {len(issues)} issues, "
+                                f"{model_requests} model requests")
+
+        try:
+            timings = measure(run, args.repeat, setup)
+        finally:
+            ai_utils.response_cache.enabled = saved_cache
+            github_utils.github_request_pacing = saved_pacing
+            reset_clients()
+            for name, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    if failures:
+        sys.exit(f"resolve_issue failed in {len(failures)} of {len(timings)} runs: {'; '.join(failures)}")
+    return result('resolve_issue', files, timings, len(issues),
+                  pull_requests=len(github.pulls) // len(timings),
+                  github_requests=sum(github.requests.values()) // len(timings),
+                  model_requests=sum(anthropic.requests.values()) // len(timings),
+                  model_input_tokens=anthropic.input_tokens // len(timings),
+                  model_cache_read_tokens=anthropic.cache_read_tokens // len(timings),
+                  model_cache_write_tokens=anthropic.cache_write_tokens // len(timings),
+                  concurrency=args.concurrency, fan_out=args.fan_out)
+
+
+def run_benchmarks(args):
+    selected = args.only.split(',') if args.only else BENCHMARKS
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        sys.exit(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = []
+    for files in [int(size) for size in args.sizes.split(',')]:
+        root = os.path.join(args.workdir, f"repo-{files}-{args.seed}")
+        start = time.perf_counter()
+        generate(root, files, args.seed)
+        print(f"Synthetic repository with {files} files ready in {time.perf_counter() - start:.1f}s: {root}")
+        for name in selected:
+            if name in ('scan_cold', 'scan_warm'):
+                row = bench_scan(root, files, args, warm=name == 'scan_warm')
+            else:
+                row = globals()[f"bench_{name}"](root, files, args)
+            results.append(row)
+            print(f"  {name:<22} {row['median_s']:>9.4f}s  {row['items_per_s'] or 0:>12.1f} items/s")
+    return results
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BENCHMARK_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def compare(base_path, new_path):
+    with open(base_path, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+    base_rows = {(row['name'], row['files']): row for row in base['results']}
+    print(f"{'Benchmark':<22} {'Files':>7} {'Base (s)':>10} {'New (s)':>10} {'Change':>8}")
+    for row in new['results']:
+        key = (row['name'], row['files'])
+        if key not in base_rows:
+            continue
+        before, after = base_rows[key]['median_s'], row['median_s']
+        change = f"{(after - before) / before * 100:+.1f}%" if before else 'n/a'
+        print(f"{row['name']:<22} {row['files']:>7} {before:>10.4f} {after:>10.4f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark issol against synthetic repositories")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"Comma-separated file counts, 1000 to 200000 (default: {DEFAULT_SIZES})")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--workers', type=int, default=min(32, (os.cpu_count() or 1) + 4))
+    parser.add_argument('--issues', type=int, default=4, help="Issues resolved per resolve_issue run")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--fan-out', action='store_true', help="Resolve issues with one model call per affected file group")
+    parser.add_argument('--github-latency', type=float, default=0.0, help="Seconds added to every fake GitHub request")
+    parser.add_argument('--model-latency', type=float, default=0.0, help="Seconds before the fake model's first token")
+    parser.add_argument('--chunk-latency', type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument('--workdir', default=DEFAULT_WORKDIR, help=f"Where synthetic repositories are kept (default: {DEFAULT_WORKDIR})")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help="Compare two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit, dirty = git_commit()
+    results = run_benchmarks(args)
+    output = args.output or os.path.join(BENCHMARK_DIR, 'results', f"{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'meta': {
+                'commit': commit,
+                'dirty': dirty,
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'seed': args.seed,
+                'github_latency': args.github_latency,
+                'model_latency': args.model_latency,
+                'chunk_latency': args.chunk_latency,
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Startup benchmark: `issol -v` must not import the heavy SDKs or touch the network.
+
+Usage: python benchmarks/startup.py [--runs N] [--budget-ms MS]
+
+Runs the `issol -v` entry point in fresh interpreters, reports the median wall
+time and fails (exit code 1) if it exceeds the budget or if anthropic, github
+or git were imported.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ('anthropic', 'github', 'git', 'requests')
+DEFAULT_BUDGET_MS = 50
+# Equivalent to the `issol -v` console script.
+VERSION_CODE = "import sys; sys.argv = ['issol', '-v']; from issol.cli import main; main()"
+
+
+def interpreter_baseline(runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def time_version(runs, env):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', VERSION_CODE], check=True, stdout=subprocess.DEVNULL, env=env)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def heavy_imports(env):
+    code = (
+        VERSION_CODE + "; "
+        f"print('HEAVY:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True, env=env).stdout
+    return [m for m in output.strip().splitlines()[-1][len('HEAVY:'):].split(',') if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='Maximum median time for `issol -v` on top of a bare interpreter start')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env.get('PYTHONPATH')]))
+    # Make sure a missing token would fail loudly instead of prompting.
+    env.pop('GITHUB_TOKEN', None)
+    env.pop('ANTHROPIC_API_KEY', None)
+
+    baseline = interpreter_baseline(args.runs)
+    total = time_version(args.runs, env)
+    overhead_ms = (total - baseline) * 1000
+    imported = heavy_imports(env)
+
+    print(f"python startup:   {baseline * 1000:.1f} ms")
+    print(f"issol -v:         {total * 1000:.1f} ms (+{overhead_ms:.1f} ms)")
+    print(f"heavy imports:    {', '.join(imported) or 'none'}")
+
+    if imported or overhead_ms > args.budget_ms:
+        print(f"FAIL: budget is {args.budget_ms:.0f} ms with no heavy imports")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""Deterministic synthetic repositories for the benchmarks.
+
+Usage: python benchmarks/synthetic_repo.py DEST [--files N] [--seed S]
+
+The same (files, seed) pair always produces byte-identical trees. The mix is
+modelled on a typical mid-sized project: mostly Python and JavaScript sources,
+some docs and config, a few percent of binary assets, lockfiles and minified
+bundles, plus directories that the root and nested .gitignore files (or the
+built-in patterns) exclude, such as node_modules/, build/ and logs.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+
+FILES_PER_DIRECTORY = 40
+MARKER_FILE = '.synthetic_repo.json'
+
+ROOT_GITIGNORE = """# synthetic project
+*.log
+*.tmp
+.env
+build/
+dist/
+/coverage/
+!logs/keep.log
+"""
+
+NESTED_GITIGNORE = """*.generated.py
+fixtures/
+"""
+
+# (kind, share of the file count)
+MIX = [
+    ('python', 0.52),
+    ('javascript', 0.15),
+    ('markdown', 0.05),
+    ('config', 0.05),
+    ('binary', 0.05),
+    ('generated', 0.03),
+    ('ignored', 0.15),
+]
+
+WORDS = ('alpha bravo cache parser token config request session index graph '
+         'record stream worker buffer branch commit patch result status update').split()
+
+
+def layout(files, seed=0):
+    """Return the sorted list of (path, kind) pairs of a synthetic repository."""
+    rng = random.Random(seed)
+    entries = []
+    for kind, share in MIX:
+        count = max(1, int(files * share))
+        for i in range(count):
+            directory = i // FILES_PER_DIRECTORY
+            entries.append((_path(kind, directory, i, rng), kind))
+    entries = entries[:max(files, len(MIX))]
+    return sorted(entries)
+
+
+def _path(kind, directory, i, rng):
+    if kind == 'python':
+        return f"src/pkg_{directory}/module_{i}.py"
+    if kind == 'javascript':
+        return f"web/components/group_{directory}/component_{i}.js"
+    if kind == 'markdown':
+        return f"docs/section_{directory}/page_{i}.md"
+    if kind == 'config':
+        return f"config/env_{directory}/settings_{i}." + rng.choice(('json', 'yaml', 'toml'))
+    if kind == 'binary':
+        return f"assets/set_{directory}/image_{i}." + rng.choice(('png', 'bin', 'woff2'))
+    if kind == 'generated':
+        return rng.choice((f"vendor/bundle_{directory}/lib_{i}.min.js",
+                           f"src/pkg_{directory}/schema_{i}.generated.py",
+                           f"web/lock_{directory}/package-lock.json"))
+    return rng.choice((f"node_modules/dep_{directory}/file_{i}.js",
+                       f"build/out_{directory}/file_{i}.js",
+                       f"logs/run_{directory}/file_{i}.log",
+                       f"src/pkg_{directory}/fixtures/case_{i}.json"))
+
+
+def _sentence(rng, words=8):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _python_source(rng, i):
+    lines = [f'"""Module {i}: {_sentence(rng)}."""', 'import os', 'import json', '']
+    if rng.random() < 0.5:
+        other = rng.randrange(max(1, i))
+        lines.insert(3, f"from .module_{other} import helper_{other}")
+    for c in range(rng.randint(1, 3)):
+        name = f"{rng.choice(WORDS).title()}{rng.choice(WORDS).title()}{i}_{c}"
+        lines += ['', f"class {name}:", '    def __init__(self, value):', '        self.value = value', '']
+        for m in range(rng.randint(1, 4)):
+            lines += [f"    def {rng.choice(WORDS)}_{m}(self, {rng.choice(WORDS)}):",
+                      f"        # {_sentence(rng, 6)}",
+                      f"        return self.value + {rng.randint(0, 100)}", '']
+    lines += [f"def helper_{i}(data):", f"    return json.dumps(data, indent={rng.randint(1, 4)})", '']
+    return '\n'.join(lines)
+
+
+def _javascript_source(rng, i):
+    lines = [f"// Component {i}: {_sentence(rng)}", "import React from 'react';", '']
+    for f in range(rng.randint(1, 5)):
+        lines += [f"export function {rng.choice(WORDS)}{f}_{i}(props) {{",
+                  f"  const {rng.choice(WORDS)} = props.{rng.choice(WORDS)} || {rng.randint(0, 9)};",
+                  f"  return <div className=\"{rng.choice(WORDS)}\">{{props.children}}</div>;", '}', '']
+    return '\n'.join(lines)
+
+
+def _content(kind, path, rng, i):
+    if kind == 'python':
+        return _python_source(rng, i)
+    if kind == 'javascript':
+        return _javascript_source(rng, i)
+    if kind == 'markdown':
+        return f"# Page {i}\n\n" + '\n\n'.join(_sentence(rng, 20) for _ in range(rng.randint(2, 8))) + '\n'
+    if kind == 'config':
+        return json.dumps({w: rng.randint(0, 1000) for w in rng.sample(WORDS, 6)}, indent=2) + '\n'
+    if kind == 'binary':
+        return bytes([0x89, 0x50, 0x4e, 0x47, 0, 0]) + rng.randbytes(rng.randint(256, 16384))
+    if kind == 'generated':
+        if path.endswith('.min.js'):
+            return ';'.join(f"var {rng.choice(WORDS)}{n}={n}" for n in range(rng.randint(200, 2000)))
+        if path.endswith('package-lock.json'):
+            return json.dumps({'lockfileVersion': 3, 'packages': {w: {'version': '1.0.0'} for w in WORDS}}, indent=2)
+        return "# Code generated by schema tool. DO NOT EDIT.\n" + _python_source(rng, i)
+    return _sentence(rng, 30) + '\n'
+
+
+def generate(dest, files=1000, seed=0):
+    """Create (or reuse) a synthetic repository with about `files` files under `dest`."""
+    params = {'files': files, 'seed': seed}
+    marker = os.path.join(dest, MARKER_FILE)
+    try:
+        with open(marker, 'r', encoding='utf-8') as f:
+            if json.load(f) == params:
+                return dest
+    except (OSError, ValueError):
+        pass
+
+    if os.path.exists(dest):
+        shutil.rmtree(dest)
+    os.makedirs(dest)
+    rng = random.Random(seed)
+    with open(os.path.join(dest, '.gitignore'), 'w', encoding='utf-8') as f:
+        f.write(ROOT_GITIGNORE)
+    nested = set()
+    for i, (path, kind) in enumerate(layout(files, seed)):
+        full_path = os.path.join(dest, path)
+        directory = os.path.dirname(full_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        package = path.split('/')[:2]
+        if package[0] == 'src' and tuple(package) not in nested:
+            nested.add(tuple(package))
+            if len(nested) % 4 == 0:
+                with open(os.path.join(dest, *package, '.gitignore'), 'w', encoding='utf-8') as f:
+                    f.write(NESTED_GITIGNORE)
+        content = _content(kind, path, rng, i)
+        with open(full_path, 'wb' if isinstance(content, bytes) else 'w') as f:
+            f.write(content)
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(params, f)
+    return dest
+
+
+def python_files(files, seed=0):
+    return [path for path, kind in layout(files, seed) if kind == 'python']
+
+
+def issue_bodies(files, count, seed=0):
+    """Issue bodies in the format extract_issue_content expects, each naming existing modules."""
+    rng = random.Random(seed + 1)
+    candidates = python_files(files, seed)
+    bodies = []
+    for _ in range(count):
+        affected = rng.sample(candidates, min(len(candidates), rng.randint(1, 3)))
+        bodies.append(
+            "## Problem Description\n"
+            f"The {rng.choice(WORDS)} helper returns the wrong {rng.choice(WORDS)} value when the cache is cold.\n\n"
+            "## Desired Outcome\n"
+            f"Return the {rng.choice(WORDS)} value unchanged and keep the {rng.choice(WORDS)} behaviour.\n\n"
+            "## Affected Files\n" + '\n'.join(affected) + '\n'
+        )
+    return bodies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic repository for benchmarks")
+    parser.add_argument('dest')
+    parser.add_argument('--files', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.dest, args.files, args.seed)
+    print(f"Generated {args.files} files in {args.dest}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,17 @@
 import argparse
 import os
 import logging
-from .commands import list_issues, resolve_issue, generate_codebase_context
-from .utils.github_utils import get_repo_info, github_client
-from .utils.config_utils import setup_tokens
+from .commands import list_issues, resolve_issue
+from .utils.github_utils import get_repo_info, get_repo, scan_codebase, log_github_transport_stats, DEFAULT_SCAN_WORKERS
 from .utils.codebase_utils import summarize_codebase
+from .utils.manifest_utils import invalidate_cache
+from .utils.context_utils import DEFAULT_CONTEXT_BUDGET
+from .utils.ai_utils import response_cache
+from .utils.response_cache import log_cache_stats
+from .utils.content_utils import content_classifier, DEFAULT_MAX_FILE_SIZE
+from .utils.trace_utils import tracer
+from .utils.fanout_utils import DEFAULT_FILE_CONCURRENCY
+from .utils.config_utils import SERVE_HOST, SERVE_PORT, SERVE_QUEUE_SIZE, WATCH_INTERVAL
 
 __version__ = "0.3.2"
 
@@ -13,17 +20,46 @@ def setup_logging(debug):
     logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def main():
-    # Setup tokens before parsing arguments
-    github_token, anthropic_token = setup_tokens()
-
+    # Tokens, SDK imports and the repository lookup are deferred until a command
+    # actually needs them, so -v, -s, --find and the cache commands start instantly.
     parser = argparse.ArgumentParser(description="GitHub Claude Bot CLI Tool")
     parser.add_argument("-l", "--list", action="store_true", help="List all open issues")
-    parser.add_argument("-r", "--resolve", type=int, help="Resolve a specific issue by number")
+    parser.add_argument("-r", "--resolve", type=int, nargs='+', metavar="ISSUE", help="Resolve one or more issues by number")
+    parser.add_argument("--marked", action="store_true", help=f"With -l, list only issues marked with '{resolve_issue.AI_MARKER}' (filtered by GitHub)")
+    parser.add_argument("--label", action="append", default=[], metavar="LABEL", help="With -l or -a, only issues with this label; repeat to require several")
+    parser.add_argument("-a", "--resolve-all", action="store_true", help=f"Resolve every open issue marked with '{resolve_issue.AI_MARKER}'")
+    parser.add_argument("--concurrency", type=int, default=resolve_issue.DEFAULT_CONCURRENCY, help=f"Maximum number of issues resolved at once (default: {resolve_issue.DEFAULT_CONCURRENCY})")
     parser.add_argument("-b", "--branch", default=None, help="Specify the branch to read code from (default: current branch)")
     parser.add_argument("-d", "--debug", action="store_true", help="Enable debug mode")
     parser.add_argument("-c", "--codebase-context", action="store_true", help="Generate codebase context")
     parser.add_argument("-v", "--version", action="store_true", help="Show the current version of issol")
     parser.add_argument("-s", "--summarize", action="store_true", help="Summarize the codebase")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON (with -s: include per-extension and per-directory breakdowns; with -l: one object per issue per line)")
+    parser.add_argument("--no-cache", action="store_true", help="Read every file instead of reusing the scan manifest")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_SCAN_WORKERS, help=f"Number of threads used to read files (default: {DEFAULT_SCAN_WORKERS})")
+    parser.add_argument("--max-file-size", type=int, default=DEFAULT_MAX_FILE_SIZE // 1024, metavar="KB", help=f"Files larger than this are summarized as a stub instead of sent in full, 0 for no limit (default: {DEFAULT_MAX_FILE_SIZE // 1024})")
+    parser.add_argument("--context-budget", type=int, default=DEFAULT_CONTEXT_BUDGET, help=f"Approximate token budget for codebase context sent with an issue, 0 for no limit (default: {DEFAULT_CONTEXT_BUDGET})")
+    parser.add_argument("--edit-format", choices=resolve_issue.EDIT_FORMATS, default='full', help="Ask the model for whole files (full) or SEARCH/REPLACE edits applied locally, with a per-file fallback to whole files (patch)")
+    parser.add_argument("--fan-out", action="store_true", help="Generate each group of related affected files in its own concurrent model call, after a short shared plan")
+    parser.add_argument("--file-concurrency", type=int, default=DEFAULT_FILE_CONCURRENCY, help=f"With --fan-out, maximum number of concurrent model calls per issue (default: {DEFAULT_FILE_CONCURRENCY})")
+    parser.add_argument("--no-compact", action="store_true", help="Send other files in full instead of as signature skeletons")
+    parser.add_argument("--find", metavar="SYMBOL", help="Show where a function or class is defined and referenced (uses the index built by -c)")
+    parser.add_argument("--no-refresh", action="store_true", help="With --find, query the index as last built instead of first updating it from the working tree")
+    parser.add_argument("--no-llm-cache", action="store_true", help="Always call the model instead of reusing cached responses")
+    parser.add_argument("--clear-llm-cache", action="store_true", help="Delete all cached model responses")
+    parser.add_argument("--rebuild-cache", action="store_true", help="Discard the scan manifest, symbol index and skeletons, then rescan the working tree")
+    parser.add_argument("--profile", action="store_true", help="Print how long each phase took, with file, token and HTTP counts")
+    parser.add_argument("--trace-json", metavar="FILE", help="Write per-phase timings as a Chrome trace-event file (chrome://tracing, Perfetto)")
+    parser.add_argument("--serve", action="store_true", help="Run as a daemon that resolves marked issues from GitHub webhooks or polling, keeping clients and the codebase warm")
+    parser.add_argument("--host", default=SERVE_HOST, help=f"With --serve, address to listen on (default: {SERVE_HOST})")
+    parser.add_argument("--port", type=int, default=SERVE_PORT, help=f"With --serve, port for /webhook and /metrics (default: {SERVE_PORT})")
+    parser.add_argument("--poll", type=float, default=0, metavar="SECONDS", help="With --serve, also poll open issues every SECONDS (default: 0, webhooks only)")
+    parser.add_argument("--queue-size", type=int, default=SERVE_QUEUE_SIZE, help=f"With --serve, maximum number of waiting issues (default: {SERVE_QUEUE_SIZE})")
+    parser.add_argument("--watch-interval", type=float, default=WATCH_INTERVAL, metavar="SECONDS", help=f"With --serve, how often to check the codebase for changes (default: {WATCH_INTERVAL:g})")
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument("--record", metavar="CASSETTE", help="Record every GitHub and Anthropic request and response to a cassette file (*.gz to compress)")
+    cassette_group.add_argument("--replay", metavar="CASSETTE", help="Serve GitHub and Anthropic responses from a recorded cassette instead of the network")
+    parser.add_argument("--replay-latency", type=float, default=0.0, metavar="FACTOR", help="With --replay, delay responses by FACTOR times their recorded timings (default: 0, no delay)")
     
     args = parser.parse_args()
 
@@ -33,12 +69,63 @@ def main():
         print(f"issol version {__version__}")
         return
 
+    tracer.enabled = args.profile or bool(args.trace_json)
+    cassette = None
+    if args.record or args.replay:
+        from .utils.cassette_utils import start_cassette
+        cassette = start_cassette(record=args.record, replay=args.replay, latency=args.replay_latency)
+    try:
+        with tracer.span('main'):
+            run_command(parser, args)
+    finally:
+        if cassette is not None:
+            cassette.stop()
+            if args.record:
+                print(f"Recorded {len(cassette.cassette.interactions)} HTTP interactions to {args.record}")
+            elif cassette.misses:
+                print(f"Warning: {cassette.misses} request(s) had no recorded response in {args.replay}")
+        if args.profile:
+            print(tracer.summary())
+        if args.trace_json:
+            tracer.write_chrome_trace(args.trace_json)
+            print(f"Trace written to {args.trace_json}")
+
+def run_command(parser, args):
+    # A recording should capture every model call, so it never answers from the response cache.
+    response_cache.enabled = not (args.no_llm_cache or args.record)
+    content_classifier.max_file_size = args.max_file_size * 1024
+    if args.clear_llm_cache:
+        response_cache.clear()
+        print(f"Cleared cached model responses in {response_cache.directory}")
+        return
+
+    if args.find:
+        from .utils.index_utils import print_symbol_lookup
+        print_symbol_lookup(args.find, refresh=not args.no_refresh)
+        return
+
+    if args.rebuild_cache:
+        invalidate_cache()
+        scan_codebase(None, args.branch or "working tree", workers=args.workers, working_tree=True)
+        return
+
+    needs_repo = args.list or args.resolve or args.resolve_all or args.serve
+    if args.summarize and not (needs_repo or args.codebase_context):
+        with tracer.span('summarize'):
+            summary = summarize_codebase(as_json=args.json)
+        print(summary)
+        return
+
+    if not (needs_repo or args.codebase_context):
+        parser.print_help()
+        return
+
     try:
-        repo_name, current_branch = get_repo_info()
+        with tracer.span('get_repo_info'):
+            # Keep stdout parseable for `-l --json`.
+            repo_name, current_branch = get_repo_info(quiet=args.list and args.json)
         logging.debug(f"Repository: {repo_name}")
         logging.debug(f"Current branch: {current_branch}")
-        logging.debug(f"GitHub token: {'Set' if github_token else 'Not set'}")
-        logging.debug(f"Anthropic API key: {'Set' if anthropic_token else 'Not set'}")
         
         # Use the specified branch if provided, otherwise use the current branch
         branch = args.branch if args.branch else current_branch
@@ -47,25 +134,48 @@ def main():
         logging.error(f"Error getting repository info: {str(e)}")
         return
 
+    if args.codebase_context and not needs_repo:
+        # Imported only here: the tech-stack detector and the index pull in XML, TOML and SQLite.
+        from .commands import generate_codebase_context
+        with tracer.span('generate_codebase_context'):
+            generate_codebase_context.run(None, branch, use_cache=not args.no_cache, workers=args.workers)
+        log_cache_stats(response_cache)
+        return
+
     try:
-        repo = github_client.get_repo(repo_name)
-        logging.debug(f"Successfully accessed repository: {repo.full_name}")
+        with tracer.span('get_repo'):
+            repo = get_repo(repo_name)
+        logging.debug(f"Successfully accessed repository: {repo_name}")
     except Exception as e:
         logging.error(f"Error accessing repository: {str(e)}")
         logging.debug(f"Full error: {repr(e)}")
         return
 
+    resolve_options = dict(use_cache=not args.no_cache, workers=args.workers,
+                           context_budget=args.context_budget, compact=not args.no_compact,
+                           edit_format=args.edit_format, fan_out=args.fan_out,
+                           file_concurrency=args.file_concurrency)
     if args.list:
-        list_issues.run(repo)
-    elif args.resolve:
-        resolve_issue.run(repo, args.resolve, branch)
-    elif args.codebase_context:
-        generate_codebase_context.run(repo, branch)
-    elif args.summarize:
-        summary = summarize_codebase()
-        print(summary)
-    else:
-        parser.print_help()
+        with tracer.span('list_issues'):
+            list_issues.run(repo, marker=resolve_issue.AI_MARKER if args.marked else None,
+                            labels=args.label, as_json=args.json)
+    elif args.serve:
+        # http.server is imported only when the daemon is started.
+        from .commands import serve
+        serve.run(repo, branch, resolve_options, host=args.host, port=args.port, concurrency=args.concurrency, queue_size=args.queue_size,
+                  poll_interval=args.poll, watch_interval=args.watch_interval,
+                  webhook_secret=os.environ.get('ISSOL_WEBHOOK_SECRET'),
+                  use_cache=not args.no_cache, workers=args.workers)
+    elif args.resolve or args.resolve_all:
+        resolve_options['concurrency'] = args.concurrency
+        with tracer.span('resolve_issues'):
+            if args.resolve_all:
+                resolve_issue.run_marked(repo, branch, labels=args.label, **resolve_options)
+            else:
+                resolve_issue.run(repo, args.resolve, branch, **resolve_options)
+
+    log_cache_stats(response_cache)
+    log_github_transport_stats()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1 +1 @@
-from . import list_issues, resolve_issue, generate_codebase_context
\ No newline at end of file
+from . import list_issues, resolve_issue
\ No newline at end of file
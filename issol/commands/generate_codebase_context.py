@@ -1,52 +1,55 @@
 import os
 import logging
 import json
-from collections import Counter
 import re
 from ..utils.ai_utils import generate_code
+from ..utils.config_utils import CODEBASE_CONTEXT_DIR, TECH_STACK_FILE
+from ..utils.index_utils import update_codebase_index
+from ..utils.snapshot_utils import get_codebase_snapshot
+from ..utils.stack_utils import detect_tech_stack, render_report, load_cached_stack, save_cached_stack
 
-CODEBASE_CONTEXT_DIR = '.codebase_context'
-
-def run():
+def run(repo=None, branch=None, use_cache=True, workers=None):
     logging.info("Starting codebase context generation...")
     os.makedirs(CODEBASE_CONTEXT_DIR, exist_ok=True)
     
-    project_info = gather_project_info()
-    tech_stack_info = identify_tech_stack(project_info)
-    
-    generate_tech_stack_file(tech_stack_info)
-    
+    update_codebase_index(branch, use_cache=use_cache, workers=workers)
+
+    # The stack is detected locally from manifests, CI configs and file
+    # extensions; the model only adds notes on top, and only when that
+    # detection changed since the last run.
+    snapshot = get_codebase_snapshot()
+    report, fingerprint = detect_tech_stack(snapshot)
+    cached = load_cached_stack(fingerprint) if use_cache else None
+    if cached is not None and os.path.exists(TECH_STACK_FILE):
+        print(f"Tech stack unchanged (fingerprint {fingerprint[:12]}), keeping {TECH_STACK_FILE}")
+    else:
+        enrichment = cached['enrichment'] if cached is not None else identify_tech_stack(report, gather_project_info(snapshot))
+        generate_tech_stack_file(report, enrichment)
+        if enrichment:
+            save_cached_stack(fingerprint, report, enrichment)
+
     logging.info("Codebase context generation complete.")
 
-def gather_project_info():
+def gather_project_info(snapshot):
+    # All tree-based facts come from one shared, ignore-aware snapshot.
     project_info = {
-        'structure': get_project_structure(),
-        'config_files': parse_config_files(),
+        'structure': get_project_structure(snapshot),
         'readme_content': get_readme_content(),
-        'file_extensions': count_file_extensions(),
-        'import_statements': gather_import_statements()
+        'import_statements': gather_import_statements(snapshot)
     }
     return project_info
 
-def get_project_structure():
+def get_project_structure(snapshot):
     structure = []
-    for root, dirs, files in os.walk('.'):
-        level = root.replace('.', '').count(os.sep)
+    for root, files in snapshot.directories:
+        level = 0 if root == snapshot.root else os.path.relpath(root, snapshot.root).count(os.sep) + 1
         indent = ' ' * 4 * level
         subindent = ' ' * 4 * (level + 1)
         structure.append(f'{indent}{os.path.basename(root)}/')
-        for f in files:
-            structure.append(f'{subindent}{f}')
+        for entry in files:
+            structure.append(f'{subindent}{os.path.basename(entry.path)}')
     return '\n'.join(structure)
 
-def parse_config_files():
-    config_files = {}
-    for file in ['package.json', 'requirements.txt', 'Gemfile', 'Dockerfile']:
-        if os.path.exists(file):
-            with open(file, 'r') as f:
-                config_files[file] = f.read()
-    return config_files
-
 def get_readme_content():
     readme_files = ['README.md', 'README.txt', 'README']
     for file in readme_files:
@@ -55,61 +58,57 @@ def get_readme_content():
                 return f.read()
     return ""
 
-def count_file_extensions():
-    extensions = Counter()
-    for root, _, files in os.walk('.'):
-        for file in files:
-            _, ext = os.path.splitext(file)
-            if ext:
-                extensions[ext] += 1
-    return dict(extensions)
-
-def gather_import_statements(sample_size=10):
+def gather_import_statements(snapshot, sample_size=10):
     import_statements = []
-    for root, _, files in os.walk('.'):
-        for file in files:
-            if len(import_statements) >= sample_size:
-                break
-            if file.endswith(('.js', '.ts', '.py', '.rb')):
-                with open(os.path.join(root, file), 'r') as f:
-                    content = f.read()
-                    imports = re.findall(r'^(import|require|from).*', content, re.MULTILINE)
-                    import_statements.extend(imports[:5])  # Limit to 5 imports per file
+    for entry in snapshot.files:
+        if len(import_statements) >= sample_size:
+            break
+        if entry.ext in ('.js', '.ts', '.py', '.rb'):
+            imports = re.findall(r'^(?:import|require|from).*', entry.read(), re.MULTILINE)
+            import_statements.extend(imports[:5])  # Limit to 5 imports per file
     return import_statements
 
-def identify_tech_stack(project_info):
+def identify_tech_stack(report, project_info):
+    # Returns notes that add to the detected report, or None if the model could not be reached
+    # (generate_code reports failures by returning an empty string).
     system_prompt = """You are an AI assistant tasked with identifying the tech stack of a software project. 
-    Analyze the provided project information and determine the technologies used."""
-    
-    human_prompt = f"""Based on the following project information, identify the tech stack including:
-    - Programming languages
-    - Frameworks and libraries
-    - Databases
-    - DevOps tools
-    - Any other relevant technologies
+    A structured report has already been detected from the project's manifests; you add what manifests cannot show."""
+
+    detected = {key: value for key, value in report.items() if key != 'manifests'}
+    human_prompt = f"""The following tech stack was detected from the project's manifests, container and CI
+    configuration and file extensions:
+
+    {json.dumps(detected, indent=2)}
 
     Project Structure:
     {project_info['structure'][:500]}...
 
-    Configuration Files:
-    {json.dumps(project_info['config_files'], indent=2)}
-
     README Content:
     {project_info['readme_content'][:500]}...
 
-    File Extensions:
-    {json.dumps(project_info['file_extensions'], indent=2)}
-
     Sample Import Statements:
     {json.dumps(project_info['import_statements'], indent=2)}
 
-    Please provide a detailed tech stack identification, explaining your reasoning for each technology identified."""
-
-    return generate_code(system_prompt, human_prompt)
-
-def generate_tech_stack_file(tech_stack_info):
-    file_path = os.path.join(CODEBASE_CONTEXT_DIR, "tech_stack.md")
+    In a few short bullet points, describe what the project is and how these technologies fit together
+    (architecture, entry points, how it is built, tested and deployed), and name any technology the report
+    missed or got wrong, explaining your reasoning. Do not repeat the lists from the report."""
+
+    try:
+        notes = generate_code(system_prompt, human_prompt)
+    except Exception as e:
+        logging.warning(f"Could not enrich the tech stack with the model: {str(e)}")
+        notes = None
+    if not notes or not notes.strip():
+        logging.warning("No tech stack notes from the model, writing the detected stack only")
+        return None
+    return notes
+
+def generate_tech_stack_file(report, notes=None):
+    file_path = TECH_STACK_FILE
     with open(file_path, 'w') as f:
         f.write("# Tech Stack Identification\n\n")
-        f.write(tech_stack_info)
-    logging.info(f"Tech stack information written to {file_path}")
\ No newline at end of file
+        f.write(render_report(report))
+        if notes:
+            f.write("\n## Notes\n\n")
+            f.write(notes.strip() + "\n")
+    logging.info(f"Tech stack information written to {file_path}")
@@ -1,4 +1,18 @@
-def run(repo):
-    print("Open issues:")
-    for issue in repo.get_issues(state='open'):
-        print(f"#{issue.number}: {issue.title}")
\ No newline at end of file
+import json
+from ..utils.issue_utils import iter_open_issues
+
+def run(repo, marker=None, labels=(), as_json=False):
+    # Issues are printed as each page arrives rather than after the last one.
+    # With as_json, one JSON object per line, for piping into jq and friends.
+    if not as_json:
+        print("Open issues:")
+    count = 0
+    for issue in iter_open_issues(repo, marker=marker, labels=labels):
+        count += 1
+        if as_json:
+            print(json.dumps(issue.to_dict()), flush=True)
+        else:
+            labels_note = f" [{', '.join(issue.labels)}]" if issue.labels else ""
+            print(f"#{issue.number}: {issue.title}{labels_note}", flush=True)
+    if not as_json and not count:
+        print("No matching open issues." if marker or labels else "No open issues.")
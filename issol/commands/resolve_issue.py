@@ -1,64 +1,260 @@
-from ..utils.github_utils import extract_issue_content, create_pull_request, scan_codebase, get_repo_info
-from ..utils.ai_utils import generate_code
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ..utils.github_utils import extract_issue_content, create_pull_request, format_codebase_context, DEFAULT_SCAN_WORKERS, iter_file_sections, clean_generated_code, get_file_content
+from ..utils.ai_utils import stream_code, generate_code, text_block, prompt_text
+from ..utils.context_utils import select_context, shared_context, load_tech_stack, estimate_tokens, normalize_path, DEFAULT_CONTEXT_BUDGET
+from ..utils.content_utils import is_omitted, is_omitted_binary
+from ..utils.fanout_utils import group_related_files, generate_concurrently, merge_sections, DEFAULT_FILE_CONCURRENCY
+from ..utils.issue_utils import iter_open_issues, fetch_issues
+from ..utils.trace_utils import tracer
 
-def run(repo, issue_number, branch):
-    try:
-        issue = repo.get_issue(number=issue_number)
-        process_issue(repo, issue, branch)
-    except Exception as e:
-        print(f"Error processing issue: {str(e)}")
+AI_MARKER = "AI: Generate Code"
+DEFAULT_CONCURRENCY = 4
+EDIT_FORMATS = ('full', 'patch')
 
-def process_issue(repo, issue, branch):
+SYSTEM_PROMPT = """You are an AI assistant tasked with generating code solutions based on GitHub issues. 
+    Provide only the code changes required, without any explanations or comments.
+    Your response should contain only valid code that can be directly inserted into the relevant files."""
+
+FULL_FILE_INSTRUCTIONS = """Please provide only the code changes for each affected file. 
+    Start each file's code with a line containing the file path, like this:
+    # File: path/to/file.py
+    [Only the code changes for this file]
+
+    # File: path/to/another_file.py
+    [Only the code changes for this file]
+
+    Do not include any explanations, comments, or markdown formatting. 
+    Provide only the actual code changes that should be applied to each file."""
+
+PATCH_INSTRUCTIONS = """Start each file you change with a line containing the file path, like this:
+    # File: path/to/file.py
+
+    For an existing file, follow the path line with one or more edit blocks:
+    <<<<<<< SEARCH
+    [lines copied exactly from the current file, including indentation]
+    =======
+    [the lines that replace them]
+    >>>>>>> REPLACE
+
+    Include just enough lines in each SEARCH block to identify the location uniquely,
+    and list the blocks in file order. For a new file, give its complete content instead.
+    Do not include any explanations or markdown formatting."""
+
+# Fan-out mode: one short planning call, then one call per group of related files.
+PLAN_MAX_TOKENS = 1000
+PLAN_REQUEST = """
+    Before any code is written, outline a short plan for this change. For each affected file,
+    state in one or two lines what changes in it, including any names, signatures or data
+    formats that other files must agree on. Do not write any code."""
+
+def run(repo, issues, branch, use_cache=True, workers=DEFAULT_SCAN_WORKERS, context_budget=DEFAULT_CONTEXT_BUDGET,
+        concurrency=DEFAULT_CONCURRENCY, compact=True, edit_format='full', fan_out=False,
+        file_concurrency=DEFAULT_FILE_CONCURRENCY):
+    # `issues` holds issue numbers, or issues already fetched in bulk (see run_marked).
+    if isinstance(issues, int):
+        issues = [issues]
+
+    # A single issue loads the codebase lazily, after its marker and body are checked;
+    # a batch loads it once and shares the snapshot between issues, and fetches
+    # the issues with one request instead of one each.
+    codebase_files = None
+    if len(issues) > 1:
+        numbers = [issue for issue in issues if isinstance(issue, int)]
+        if numbers:
+            with tracer.span('fetch_issues', issues=len(numbers)):
+                fetched = fetch_issues(repo, numbers) or {}
+            issues = [fetched.get(issue, issue) if isinstance(issue, int) else issue for issue in issues]
+        from ..utils.index_utils import load_codebase_files
+        codebase_files = load_codebase_files(branch, use_cache=use_cache, workers=workers)
+    parent_span = tracer.current()
+
+    def resolve_one(issue):
+        issue_number = issue if isinstance(issue, int) else issue.number
+        start = time.perf_counter()
+        try:
+            with tracer.adopt(parent_span):
+                if isinstance(issue, int):
+                    with tracer.span('get_issue'):
+                        issue = repo.get_issue(number=issue_number)
+                status = process_issue(repo, issue, branch, use_cache=use_cache, workers=workers,
+                                       context_budget=context_budget, codebase_files=codebase_files,
+                                       compact=compact, edit_format=edit_format, fan_out=fan_out,
+                                       file_concurrency=file_concurrency)
+        except Exception as e:
+            print(f"Error processing issue #{issue_number}: {str(e)}")
+            status = f"error: {str(e)}"
+        return issue_number, status, time.perf_counter() - start
+
+    if len(issues) == 1:
+        resolve_one(issues[0])
+        return
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        results = list(executor.map(resolve_one, issues))
+    print_summary(results)
+
+def run_marked(repo, branch, labels=(), **kwargs):
+    # Marked issues come back from one search with their bodies, so none is fetched again.
+    with tracer.span('list_issues'):
+        issues = list(iter_open_issues(repo, marker=AI_MARKER, labels=labels, with_body=True))
+    if not issues:
+        print(f"No open issues marked with '{AI_MARKER}'.")
+        return
+    print(f"Resolving {len(issues)} marked issues: {', '.join(f'#{issue.number}' for issue in issues)}")
+    run(repo, issues, branch, **kwargs)
+
+def unstub_affected_files(codebase_files, affected_files, branch):
+    # The scan stubs generated, minified and oversized files, but an issue that
+    # names one needs its real content. Only the affected copies are replaced;
+    # the compacted, shared view keeps the stub.
+    affected = {normalize_path(p) for p in affected_files if p.strip()}
+    stubbed = [file_path for file_path, content in codebase_files
+               if normalize_path(file_path) in affected and is_omitted(content) and not is_omitted_binary(content)]
+    if not stubbed:
+        return codebase_files
+    from ..utils.git_object_utils import branch_commit, read_file_at
+    commit = branch_commit(branch)
+    full = {}
+    for file_path in stubbed:
+        full[file_path] = read_file_at(commit, file_path)[0] if commit is not None else get_file_content(file_path)
+        print(f"Sending {file_path} in full: the issue names it")
+    return [(file_path, full.get(file_path) or content) for file_path, content in codebase_files]
+
+def print_summary(results):
+    print("\nBatch summary:")
+    print(f"{'Issue':<8} {'Time (s)':>9}  Status")
+    for issue_number, status, elapsed in results:
+        print(f"{'#' + str(issue_number):<8} {elapsed:>9.1f}  {status}")
+
+def process_issue(repo, issue, branch, use_cache=True, workers=DEFAULT_SCAN_WORKERS, context_budget=DEFAULT_CONTEXT_BUDGET,
+                  codebase_files=None, compact=True, edit_format='full', fan_out=False,
+                  file_concurrency=DEFAULT_FILE_CONCURRENCY):
+    with tracer.span('process_issue', issue=f"#{issue.number}") as span:
+        status = _process_issue(repo, issue, branch, use_cache, workers, context_budget, codebase_files, compact,
+                                edit_format, fan_out, file_concurrency)
+        span.set(status=status)
+        return status
+
+def _process_issue(repo, issue, branch, use_cache, workers, context_budget, codebase_files, compact, edit_format,
+                   fan_out, file_concurrency):
     print(f"Processing issue #{issue.number}: {issue.title}")
     print(f"Issue body:\n{issue.body}")
     
-    if "AI: Generate Code" not in issue.title:
+    if AI_MARKER not in issue.title:
         print(f"Skipping issue #{issue.number}: Not marked for AI code generation")
-        return
+        return "skipped: not marked for AI code generation"
 
-    issue_content = extract_issue_content(issue.body)
+    with tracer.span('extract_issue_content'):
+        issue_content = extract_issue_content(issue.body)
     
     if not issue_content['problem_description'] and not issue_content['desired_outcome']:
         print("Error: Could not extract problem description or desired outcome from the issue.")
         print("Please ensure the issue contains sections for 'Problem Description' and 'Desired Outcome'.")
-        return
+        return "error: missing problem description and desired outcome"
 
-    codebase_context = scan_codebase(repo, branch)
-    
-    system_prompt = """You are an AI assistant tasked with generating code solutions based on GitHub issues. 
-    Provide only the code changes required, without any explanations or comments.
-    Your response should contain only valid code that can be directly inserted into the relevant files."""
-    
-    human_prompt = f"""Given the following context and requirements, generate the necessary code changes:
+    if codebase_files is None:
+        from ..utils.index_utils import load_codebase_files
+        codebase_files = load_codebase_files(branch, use_cache=use_cache, workers=workers)
+    from ..utils.compaction_utils import compact_files
+    # Compacted without regard to the issue, so the same snapshot always yields the same context.
+    compacted = compact_files(codebase_files, (), use_cache) if compact else None
+    codebase_files = unstub_affected_files(codebase_files, issue_content['affected_files'], branch)
+    with tracer.span('select_context') as span:
+        shared, affected = shared_context(codebase_files, issue_content, context_budget, compacted)
+        span.set(shared=shared is not None)
+        if shared is None:
+            # Too large to send whole: select per issue, with the affected files in full.
+            selection = select_context(codebase_files, issue_content, context_budget, compacted)
+            shared, affected = [(c['path'], c['content']) for c in selection if c['selected']], []
+        codebase_context = format_codebase_context(shared, branch)
+        affected_context = format_codebase_context(affected, branch)
+        span.set(candidates=len(codebase_files), selected_files=len(shared),
+                 context_tokens=estimate_tokens(codebase_context) + estimate_tokens(affected_context))
+
+    # Stable parts first, each ending in a cache breakpoint: instructions and tech
+    # stack, then the codebase. Issues resolved against the same snapshot share
+    # that prefix and only pay full price for the issue-specific part after it.
+    tech_stack = load_tech_stack()
+    system_prompt = [text_block(SYSTEM_PROMPT, cache=not tech_stack)]
+    if tech_stack:
+        system_prompt.append(text_block(f"\n\nTech stack of this repository:\n{tech_stack}", cache=True))
+    context_block = text_block(f"""Codebase Context (from branch '{branch}'):
+    {codebase_context}""", cache=True)
+
+    affected_section = f"""
+    Current Content of Affected Files:
+    {affected_context}""" if affected else ""
+    groups = group_related_files(issue_content['affected_files']) if fan_out else []
+    # In fan-out mode the issue block is shared by every call, so it gets its own breakpoint.
+    issue_block = text_block(f"""
+
+    Given the codebase context above and the following requirements, generate the necessary code changes:
 
     Problem Description: {issue_content['problem_description']}
     Desired Outcome: {issue_content['desired_outcome']}
     Affected Files: {', '.join(issue_content['affected_files'])}
+    {affected_section}""", cache=len(groups) > 1)
+    instructions = PATCH_INSTRUCTIONS if edit_format == 'patch' else FULL_FILE_INSTRUCTIONS
+    human_prompt = [context_block, issue_block, text_block(f"""
+    {instructions}""")]
 
-    Codebase Context (from branch '{branch}'):
-    {codebase_context}
+    print("Sending prompt to AI:")
+    print(prompt_text(human_prompt))
+    tracer.count('prompt_bytes', len(prompt_text(system_prompt).encode('utf-8')) + len(prompt_text(human_prompt).encode('utf-8')))
 
-    Please provide only the code changes for each affected file. 
-    Start each file's code with a line containing the file path, like this:
-    # File: path/to/file.py
-    [Only the code changes for this file]
+    def echo(chunks):
+        print("Generated code:")
+        for chunk in chunks:
+            print(chunk, end='', flush=True)
+            yield chunk
+        print()
 
-    # File: path/to/another_file.py
-    [Only the code changes for this file]
+    def regenerate(file_path, original_content):
+        # Per-file fallback when edits in patch mode cannot be applied.
+        prompt = [context_block, text_block(f"""
 
-    Do not include any explanations, comments, or markdown formatting. 
-    Provide only the actual code changes that should be applied to each file."""
+    Given the codebase context above and the following requirements, rewrite {file_path}:
 
-    print("Sending prompt to AI:")
-    print(human_prompt)
+    Problem Description: {issue_content['problem_description']}
+    Desired Outcome: {issue_content['desired_outcome']}
 
-    generated_code = generate_code(system_prompt, human_prompt)
-    
-    print("Generated code:")
-    print(generated_code)
+    Current content of {file_path}:
+    {original_content}
 
-    if not generated_code.strip():
-        print("Error: No code was generated by the AI.")
-        return
+    Provide the complete updated content of this file, starting with a line
+    # File: {file_path}
+    Do not include any explanations, comments, or markdown formatting.""")]
+        response = generate_code(system_prompt, prompt)
+        for _, raw_content in iter_file_sections([response]):
+            return clean_generated_code(raw_content)
+        return clean_generated_code(response) if response.strip() else None
+
+    def fan_out_generation():
+        # The plan call also writes the shared prefix to the prompt cache, so the
+        # concurrent per-group calls that follow all read it.
+        with tracer.span('plan'):
+            plan = generate_code(system_prompt, [context_block, issue_block, text_block(PLAN_REQUEST)],
+                                 max_tokens=PLAN_MAX_TOKENS)
+        print(f"Plan:\n{plan}")
+        prompts = [[context_block, issue_block, text_block(f"""
+
+    Plan for the whole change:
+    {plan}
+
+    The other affected files are being changed separately, following the same plan.
+    Generate the changes for these files only: {', '.join(group)}
+    {instructions}""")] for group in groups]
+        print(f"Generating {len(groups)} groups of files with up to {file_concurrency} concurrent calls")
+        with tracer.span('fan_out', groups=len(groups)):
+            for index, text, elapsed in generate_concurrently(system_prompt, prompts, file_concurrency):
+                print(f"Generated code for {', '.join(groups[index])} ({elapsed:.1f}s):")
+                print(text)
+                if not text.strip():
+                    print(f"Warning: no code was generated for {', '.join(groups[index])}")
+                yield text
 
-    create_pull_request(repo, issue, generated_code, branch, issue_content)
\ No newline at end of file
+    generated = merge_sections(fan_out_generation()) if len(groups) > 1 else echo(stream_code(system_prompt, human_prompt))
+    pr = create_pull_request(repo, issue, generated, branch, issue_content,
+                             regenerate=regenerate if edit_format == 'patch' else None)
+    return f"PR created: {pr.html_url}" if pr else "no pull request created"
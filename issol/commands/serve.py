@@ -0,0 +1,294 @@
+import json
+import hmac
+import time
+import queue
+import hashlib
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .resolve_issue import process_issue, AI_MARKER, DEFAULT_CONCURRENCY
+from ..utils.issue_utils import iter_open_issues
+from ..utils.ai_utils import get_anthropic_client
+from ..utils.watch_utils import CodebaseWatcher, DEFAULT_WATCH_INTERVAL
+from ..utils.github_utils import DEFAULT_SCAN_WORKERS
+from ..utils.config_utils import SERVE_HOST as DEFAULT_HOST, SERVE_PORT as DEFAULT_PORT, SERVE_QUEUE_SIZE as DEFAULT_QUEUE_SIZE
+# Latency percentiles are computed over this many most recent jobs.
+LATENCY_SAMPLES = 500
+WEBHOOK_ACTIONS = {'opened', 'edited', 'reopened'}
+
+
+def issue_fingerprint(title, body):
+    # An issue is resolved again only when its title or body changed.
+    return hashlib.sha256(f"{title}\0{body or ''}".encode('utf-8')).hexdigest()
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.counters = {'received': 0, 'queued': 0, 'duplicate': 0, 'ignored': 0, 'rejected': 0,
+                         'succeeded': 0, 'failed': 0}
+        self.waits = deque(maxlen=LATENCY_SAMPLES)
+        self.runs = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    def count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def record_job(self, waited, ran, succeeded):
+        with self._lock:
+            self.counters['succeeded' if succeeded else 'failed'] += 1
+            self.waits.append(waited)
+            self.runs.append(ran)
+
+    def snapshot(self, queue_depth, running, watcher):
+        with self._lock:
+            waits, runs = list(self.waits), list(self.runs)
+            counters = dict(self.counters)
+
+        def summary(values):
+            stats = {'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95),
+                     'max': max(values) if values else None}
+            return {key: round(value, 3) if value is not None else None for key, value in stats.items()}
+
+        return {
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'queue_depth': queue_depth,
+            'running': running,
+            'jobs': counters,
+            'wait_seconds': summary(waits),
+            'run_seconds': summary(runs),
+            'codebase': {'files': len(watcher.files()), 'scans': watcher.scans,
+                         'last_scan_seconds': round(watcher.last_scan_seconds, 3)},
+        }
+
+
+class IssueQueue:
+    """Bounded FIFO of issue numbers; an issue already waiting or running is not queued twice."""
+
+    def __init__(self, maxsize):
+        self._queue = queue.Queue(maxsize)
+        self._pending = set()
+        self.running = 0
+        self._lock = threading.Lock()
+
+    def put(self, number, source):
+        with self._lock:
+            if number in self._pending:
+                return 'duplicate'
+            try:
+                self._queue.put_nowait((number, source, time.perf_counter()))
+            except queue.Full:
+                return 'rejected'
+            self._pending.add(number)
+            return 'queued'
+
+    def get(self):
+        job = self._queue.get()
+        if job is not None:
+            with self._lock:
+                self.running += 1
+        return job
+
+    def done(self, number):
+        with self._lock:
+            self._pending.discard(number)
+            self.running -= 1
+
+    def close(self, workers):
+        for _ in range(workers):
+            self._queue.put(None)
+
+    def depth(self):
+        return self._queue.qsize()
+
+
+class IssueServer:
+    """Resolves issues as they arrive, without paying for startup per issue.
+
+    Issues come from GitHub webhooks (POST /webhook) and, optionally, from
+    polling the open issues. They pass through a bounded queue to
+    `concurrency` workers that run resolve_issue.process_issue against the
+    codebase kept current by a CodebaseWatcher. GET /metrics reports queue
+    depth, job counts and wait/run latency percentiles.
+    """
+
+    def __init__(self, repo, branch, watcher, resolve_options, concurrency=DEFAULT_CONCURRENCY,
+                 queue_size=DEFAULT_QUEUE_SIZE, poll_interval=0, webhook_secret=None):
+        self.repo = repo
+        self.branch = branch
+        self.watcher = watcher
+        self.resolve_options = resolve_options
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.webhook_secret = webhook_secret
+        self.queue = IssueQueue(queue_size)
+        self.metrics = Metrics()
+        self.resolved = {}
+        self._fingerprints = {}
+        self._stop = threading.Event()
+        self._threads = []
+
+    def submit(self, number, source, fingerprint=None):
+        self.metrics.count('received')
+        if fingerprint is not None and self.resolved.get(number) == fingerprint:
+            result = 'duplicate'
+        else:
+            result = self.queue.put(number, source)
+        if fingerprint is not None and result == 'queued':
+            self._fingerprints[number] = fingerprint
+        self.metrics.count(result)
+        if result == 'queued':
+            print(f"Queued issue #{number} from {source} (queue depth {self.queue.depth()})")
+        elif result == 'rejected':
+            logging.warning(f"Queue full, rejected issue #{number} from {source}")
+        return result
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            number, source, enqueued = job
+            started = time.perf_counter()
+            try:
+                issue = self.repo.get_issue(number=number)
+                status = process_issue(self.repo, issue, self.branch, codebase_files=self.watcher.files(),
+                                       **self.resolve_options)
+            except Exception as e:
+                logging.error(f"Error processing issue #{number}: {str(e)}")
+                status = f"error: {str(e)}"
+            finished = time.perf_counter()
+            succeeded = status.startswith('PR created')
+            if succeeded and number in self._fingerprints:
+                self.resolved[number] = self._fingerprints[number]
+            self.metrics.record_job(started - enqueued, finished - started, succeeded)
+            self.queue.done(number)
+            print(f"Issue #{number} ({source}): {status} (waited {started - enqueued:.1f}s, "
+                  f"ran {finished - started:.1f}s, queue depth {self.queue.depth()})")
+
+    def _poll(self):
+        # Only issues updated after startup; earlier ones are left to `issol -a`.
+        since = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        while not self._stop.wait(self.poll_interval):
+            try:
+                for issue in iter_open_issues(self.repo, marker=AI_MARKER, since=since, with_body=True):
+                    fingerprint = issue_fingerprint(issue.title, issue.body)
+                    if self._fingerprints.get(issue.number) != fingerprint:
+                        self.submit(issue.number, 'poll', fingerprint)
+            except Exception as e:
+                logging.warning(f"Polling issues failed: {str(e)}")
+
+    def handle_webhook(self, event, payload):
+        if event == 'ping':
+            return 200, {'status': 'pong'}
+        issue = payload.get('issue') or {}
+        if event != 'issues' or payload.get('action') not in WEBHOOK_ACTIONS or 'pull_request' in issue:
+            self.metrics.count('ignored')
+            return 202, {'status': 'ignored'}
+        if AI_MARKER not in issue.get('title', ''):
+            self.metrics.count('ignored')
+            return 202, {'status': 'ignored', 'reason': f"title lacks '{AI_MARKER}'"}
+        result = self.submit(issue['number'], f"webhook:{payload['action']}",
+                             issue_fingerprint(issue['title'], issue.get('body')))
+        return (503 if result == 'rejected' else 202), {'status': result, 'queue_depth': self.queue.depth()}
+
+    def verify_signature(self, body, signature):
+        if not self.webhook_secret:
+            return True
+        expected = 'sha256=' + hmac.new(self.webhook_secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature or '')
+
+    def metrics_snapshot(self):
+        return self.metrics.snapshot(self.queue.depth(), self.queue.running, self.watcher)
+
+    def start(self):
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._work, name=f"issue-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.poll_interval > 0:
+            threading.Thread(target=self._poll, name='issue-poller', daemon=True).start()
+        return self
+
+    def stop(self):
+        # Lets queued and running jobs finish.
+        self._stop.set()
+        self.queue.close(len(self._threads))
+        for thread in self._threads:
+            thread.join()
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logging.debug(f"serve: {format % args}")
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            return self._send_json(200, self.server.issue_server.metrics_snapshot())
+        if self.path == '/healthz':
+            return self._send_json(200, {'status': 'ok'})
+        self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/webhook':
+            return self._send_json(404, {'error': 'not found'})
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        issue_server = self.server.issue_server
+        if not issue_server.verify_signature(body, self.headers.get('X-Hub-Signature-256')):
+            return self._send_json(401, {'error': 'invalid signature'})
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return self._send_json(400, {'error': 'invalid JSON'})
+        status, response = issue_server.handle_webhook(self.headers.get('X-GitHub-Event', ''), payload)
+        self._send_json(status, response)
+
+
+def run(repo, branch, resolve_options, host=DEFAULT_HOST, port=DEFAULT_PORT, concurrency=DEFAULT_CONCURRENCY,
+        queue_size=DEFAULT_QUEUE_SIZE, poll_interval=0, watch_interval=DEFAULT_WATCH_INTERVAL,
+        webhook_secret=None, use_cache=True, workers=DEFAULT_SCAN_WORKERS):
+    start = time.perf_counter()
+    watcher = CodebaseWatcher(branch, use_cache=use_cache, workers=workers, interval=watch_interval).start()
+    # Create the model client now rather than on the first job.
+    get_anthropic_client()
+    issue_server = IssueServer(repo, branch, watcher, resolve_options, concurrency, queue_size,
+                               poll_interval, webhook_secret).start()
+    httpd = ThreadingHTTPServer((host, port), _WebhookHandler)
+    httpd.daemon_threads = True
+    httpd.issue_server = issue_server
+
+    print(f"Ready in {time.perf_counter() - start:.1f}s: {len(watcher.files())} files from branch {branch}, "
+          f"{issue_server.concurrency} workers, queue size {queue_size}")
+    print(f"Webhook: http://{host}:{httpd.server_address[1]}/webhook"
+          + (" (signature required)" if webhook_secret else "")
+          + (f", polling every {poll_interval:g}s" if poll_interval > 0 else ""))
+    print(f"Metrics: http://{host}:{httpd.server_address[1]}/metrics")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down, waiting for running jobs...")
+    finally:
+        httpd.server_close()
+        issue_server.stop()
+        watcher.stop()
+        print(json.dumps(issue_server.metrics_snapshot(), indent=2))
@@ -1,30 +1,118 @@
-import os
 import sys
-from anthropic import Anthropic
+import time
+import threading
 from .config_utils import get_or_prompt_token
+from .response_cache import ResponseCache, response_cache_key
+from .trace_utils import tracer
+
+MODEL = "claude-3-5-sonnet-20240620"
+MAX_TOKENS = 4000
+TEMPERATURE = 0.1
+
+_anthropic_client = None
+_anthropic_client_lock = threading.Lock()
 
 def get_anthropic_client():
-    anthropic_api_key = get_or_prompt_token('ANTHROPIC_API_KEY', "Please enter your Anthropic API Key")
-    if anthropic_api_key:
-        return Anthropic(api_key=anthropic_api_key)
-    else:
-        print("Failed to obtain Anthropic API Key. Exiting.")
-        sys.exit(1)
+    # Created on first use so that importing this module stays cheap.
+    global _anthropic_client
+    with _anthropic_client_lock:
+        if _anthropic_client is None:
+            anthropic_api_key = get_or_prompt_token('ANTHROPIC_API_KEY', "Please enter your Anthropic API Key")
+            if not anthropic_api_key:
+                print("Failed to obtain Anthropic API Key. Exiting.")
+                sys.exit(1)
+            from anthropic import Anthropic
+            _anthropic_client = Anthropic(api_key=anthropic_api_key)
+    return _anthropic_client
+
+response_cache = ResponseCache()
+
+def text_block(text, cache=False):
+    # Prompts may be plain strings or lists of text blocks. A cached block ends a
+    # prompt prefix that Anthropic's prompt caching can reuse across requests.
+    block = {"type": "text", "text": text}
+    if cache:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
 
-anthropic_client = get_anthropic_client()
+def prompt_text(prompt):
+    return prompt if isinstance(prompt, str) else ''.join(block['text'] for block in prompt)
 
-def generate_code(system_prompt, human_prompt):
+def record_usage(span, usage):
+    if usage is None:
+        return
+    tracer.count('input_tokens', usage.input_tokens, span)
+    tracer.count('output_tokens', usage.output_tokens, span)
+    cache_read = getattr(usage, 'cache_read_input_tokens', None) or 0
+    cache_write = getattr(usage, 'cache_creation_input_tokens', None) or 0
+    if cache_read or cache_write:
+        tracer.count('cache_read_tokens', cache_read, span)
+        tracer.count('cache_write_tokens', cache_write, span)
+        print(f"Prompt cache: {cache_read} tokens read, {cache_write} written, {usage.input_tokens} uncached")
+
+def generate_code(system_prompt, human_prompt, max_tokens=MAX_TOKENS):
+    with tracer.span('generate_code', model=MODEL) as span:
+        return _generate_code(system_prompt, human_prompt, max_tokens, span)
+
+def _generate_code(system_prompt, human_prompt, max_tokens, span):
+    cache_key = response_cache_key(MODEL, TEMPERATURE, max_tokens, system_prompt, human_prompt)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        print("Using cached AI response (identical prompt seen before).")
+        span.set(cached=True)
+        return cached
+    tracer.count('model_requests', span=span)
     try:
-        response = anthropic_client.messages.create(
-            model="claude-3-5-sonnet-20240620",
-            max_tokens=4000,
-            temperature=0.1,
+        response = get_anthropic_client().messages.create(
+            model=MODEL,
+            max_tokens=max_tokens,
+            temperature=TEMPERATURE,
             system=system_prompt,
             messages=[
                 {"role": "user", "content": human_prompt}
             ]
         )
-        return response.content[0].text
+        record_usage(span, getattr(response, 'usage', None))
+        text = response.content[0].text
+        if text.strip():
+            response_cache.put(cache_key, text)
+        return text
     except Exception as e:
         print(f"Error generating code: {str(e)}")
-        return ""
\ No newline at end of file
+        return ""
+
+def stream_code(system_prompt, human_prompt):
+    # Yields the response text as it is generated. A cached response is yielded
+    # in one piece; a stream that breaks part-way raises after the text received so far.
+    with tracer.span('generate_code', detached=True, model=MODEL, stream=True) as span:
+        yield from _stream_code(system_prompt, human_prompt, span)
+
+def _stream_code(system_prompt, human_prompt, span):
+    cache_key = response_cache_key(MODEL, TEMPERATURE, MAX_TOKENS, system_prompt, human_prompt)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        print("Using cached AI response (identical prompt seen before).")
+        span.set(cached=True)
+        yield cached
+        return
+    chunks = []
+    tracer.count('model_requests', span=span)
+    start = time.perf_counter()
+    with get_anthropic_client().messages.stream(
+        model=MODEL,
+        max_tokens=MAX_TOKENS,
+        temperature=TEMPERATURE,
+        system=system_prompt,
+        messages=[
+            {"role": "user", "content": human_prompt}
+        ]
+    ) as stream:
+        for text in stream.text_stream:
+            if not chunks:
+                span.set(first_token_seconds=time.perf_counter() - start)
+            chunks.append(text)
+            yield text
+        record_usage(span, stream.get_final_message().usage)
+    text = ''.join(chunks)
+    if text.strip():
+        response_cache.put(cache_key, text)
@@ -0,0 +1,260 @@
+import os
+import gzip
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CASSETTE_VERSION = 1
+# Stands in for the proxy's address inside recorded bodies, which differs between runs.
+PLACEHOLDER_URL = 'http://issol-cassette'
+DEFAULT_UPSTREAMS = {
+    'github': 'https://api.github.com',
+    'anthropic': 'https://api.anthropic.com',
+}
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Link', 'Retry-After',
+                    'X-RateLimit-Remaining', 'X-RateLimit-Reset', 'X-RateLimit-Limit')
+# Never forwarded: hop-by-hop headers, and validators so that every recorded GET holds a full body.
+DROPPED_REQUEST_HEADERS = {'host', 'content-length', 'connection', 'accept-encoding',
+                           'if-none-match', 'if-modified-since'}
+
+
+def body_hash(body):
+    return hashlib.sha256(body or b'').hexdigest()
+
+
+class Cassette:
+    """Recorded HTTP interactions, stored as JSON (gzip-compressed for *.gz paths).
+
+    Requests are matched on service, method, path and a hash of the request
+    body. When nothing matches exactly, the next unused interaction with the
+    same method and path is served, so a replay survives small prompt changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.interactions = []
+        self._used = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        cassette = cls(path)
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version in {path}")
+        cassette.interactions = data['interactions']
+        return cassette
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        opener = gzip.open if self.path.endswith('.gz') else open
+        with opener(self.path, 'wt', encoding='utf-8') as f:
+            json.dump({'version': CASSETTE_VERSION, 'interactions': self.interactions}, f, separators=(',', ':'))
+
+    def record(self, service, method, path, request_body, status, headers, body, first_byte, elapsed):
+        try:
+            encoded = {'body': body.decode('utf-8')}
+        except UnicodeDecodeError:
+            encoded = {'body_base64': base64.b64encode(body).decode('ascii')}
+        with self._lock:
+            self.interactions.append(dict({
+                'service': service,
+                'method': method,
+                'path': path,
+                'request_sha256': body_hash(request_body),
+                'status': status,
+                'headers': headers,
+                'first_byte': round(first_byte, 4),
+                'elapsed': round(elapsed, 4),
+            }, **encoded))
+
+    def match(self, service, method, path, request_body):
+        digest = body_hash(request_body)
+        with self._lock:
+            candidates = [i for i, interaction in enumerate(self.interactions)
+                          if (interaction['service'], interaction['method'], interaction['path']) == (service, method, path)]
+            if not candidates:
+                return None
+            unused = [i for i in candidates if i not in self._used]
+            exact = [i for i in unused if self.interactions[i]['request_sha256'] == digest]
+            # Repeated identical requests replay in recorded order, then keep getting the last answer.
+            pool = exact or unused
+            index = pool[0] if pool else candidates[-1]
+            self._used.add(index)
+            return self.interactions[index]
+
+    @staticmethod
+    def body(interaction):
+        if 'body_base64' in interaction:
+            return base64.b64decode(interaction['body_base64'])
+        return interaction['body'].encode('utf-8')
+
+
+class _CassetteHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logging.debug(f"cassette: {format % args}")
+
+    def _dispatch(self):
+        server = self.server.cassette_server
+        service, _, path = self.path.lstrip('/').partition('/')
+        path = '/' + path
+        length = int(self.headers.get('Content-Length') or 0)
+        request_body = self.rfile.read(length) if length else b''
+        self.close_connection = True
+        if service not in DEFAULT_UPSTREAMS:
+            return self._send(404, {'Content-Type': 'text/plain'}, b'Unknown service')
+        if server.mode == 'record':
+            server.forward(self, service, path, request_body)
+        else:
+            server.replay(self, service, path, request_body)
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _dispatch
+
+    def _send(self, status, headers, body=None):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header('Content-Length', str(len(body)))
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        if body is not None:
+            self.wfile.write(body)
+
+
+class CassetteServer:
+    """Local HTTP endpoint that sits between issol and GitHub / Anthropic.
+
+    In record mode every request is forwarded upstream and the response is
+    stored in the cassette; in replay mode responses come from the cassette
+    only, optionally delayed by `latency` times the recorded timings. Clients
+    reach it through GITHUB_API_URL and ANTHROPIC_BASE_URL (see activate()).
+    """
+
+    def __init__(self, cassette, mode, latency=0.0, upstreams=None):
+        self.cassette = cassette
+        self.mode = mode
+        self.latency = latency
+        self.upstreams = dict(DEFAULT_UPSTREAMS, **(upstreams or {}))
+        self.misses = 0
+        self._httpd = None
+        self._session = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), _CassetteHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.cassette_server = self
+        threading.Thread(target=self._httpd.serve_forever, name='cassette', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        if self.mode == 'record':
+            self.cassette.save()
+
+    def _to_local(self, data):
+        return data.replace(PLACEHOLDER_URL.encode('utf-8'), self.url.encode('utf-8'))
+
+    def forward(self, handler, service, path, request_body):
+        import requests
+        if self._session is None:
+            self._session = requests.Session()
+        headers = {name: value for name, value in handler.headers.items()
+                   if name.lower() not in DROPPED_REQUEST_HEADERS}
+        start = time.perf_counter()
+        response = self._session.request(handler.command, self.upstreams[service] + path, headers=headers,
+                                         data=request_body or None, stream=True, allow_redirects=False)
+        first_byte = time.perf_counter() - start
+        recorded_headers = {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers}
+        upstream = self.upstreams[service].encode('utf-8')
+        placeholder = f"{PLACEHOLDER_URL}/{service}".encode('utf-8')
+
+        if 'text/event-stream' in response.headers.get('Content-Type', ''):
+            # Pass streamed responses through as they arrive.
+            handler._send(response.status_code, recorded_headers)
+            chunks = []
+            for chunk in response.iter_content(chunk_size=None):
+                chunks.append(chunk)
+                handler.wfile.write(chunk)
+                handler.wfile.flush()
+            body = b''.join(chunks)
+        else:
+            body = response.content.replace(upstream, placeholder)
+            recorded_headers = {name: value.replace(upstream.decode(), placeholder.decode())
+                                for name, value in recorded_headers.items()}
+            local = {name: self._to_local(value.encode('utf-8')).decode('utf-8') for name, value in recorded_headers.items()}
+            handler._send(response.status_code, local, self._to_local(body))
+        self.cassette.record(service, handler.command, path, request_body, response.status_code,
+                             recorded_headers, body, first_byte, time.perf_counter() - start)
+
+    def replay(self, handler, service, path, request_body):
+        interaction = self.cassette.match(service, handler.command, path, request_body)
+        if interaction is None:
+            self.misses += 1
+            logging.warning(f"No recorded response for {handler.command} {service}{path}")
+            message = json.dumps({'message': f"No recorded response for {handler.command} {path}"}).encode('utf-8')
+            return handler._send(599, {'Content-Type': 'application/json'}, message)
+
+        if self.latency:
+            time.sleep(interaction['first_byte'] * self.latency)
+        body = self._to_local(Cassette.body(interaction))
+        headers = {name: self._to_local(value.encode('utf-8')).decode('utf-8')
+                   for name, value in interaction['headers'].items()}
+        if 'text/event-stream' not in headers.get('Content-Type', '') or not self.latency:
+            if self.latency:
+                time.sleep(max(0.0, interaction['elapsed'] - interaction['first_byte']) * self.latency)
+            return handler._send(interaction['status'], headers, body)
+
+        # Spread the recorded streaming time evenly over the events.
+        events = body.split(b'\n\n')
+        delay = max(0.0, interaction['elapsed'] - interaction['first_byte']) * self.latency / max(1, len(events))
+        handler._send(interaction['status'], headers)
+        for i, event in enumerate(events):
+            if i:
+                time.sleep(delay)
+            handler.wfile.write(event + (b'\n\n' if i < len(events) - 1 else b''))
+            handler.wfile.flush()
+
+    def activate(self):
+        # Point both clients at this server. Must run before the clients are created.
+        for service, variable in (('github', 'GITHUB_API_URL'), ('anthropic', 'ANTHROPIC_BASE_URL')):
+            os.environ[variable] = f"{self.url}/{service}"
+        if self.mode == 'replay':
+            # Replays need no credentials and no pacing against rate limits.
+            from . import github_utils
+            github_utils.github_request_pacing = False
+            os.environ.setdefault('GITHUB_TOKEN', 'replay')
+            os.environ.setdefault('ANTHROPIC_API_KEY', 'replay')
+
+
+def start_cassette(record=None, replay=None, latency=0.0):
+    """Start recording to `record` or replaying from `replay` and return the server."""
+    upstreams = {}
+    if os.environ.get('GITHUB_API_URL'):
+        upstreams['github'] = os.environ['GITHUB_API_URL'].rstrip('/')
+    if os.environ.get('ANTHROPIC_BASE_URL'):
+        upstreams['anthropic'] = os.environ['ANTHROPIC_BASE_URL'].rstrip('/')
+    if record:
+        server = CassetteServer(Cassette(record), 'record', upstreams=upstreams)
+    else:
+        server = CassetteServer(Cassette.load(replay), 'replay', latency=latency)
+    server.start()
+    server.activate()
+    return server
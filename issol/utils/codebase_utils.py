@@ -1,32 +1,98 @@
 import os
+import json
 import logging
+from .snapshot_utils import get_codebase_snapshot
+from .content_utils import content_classifier
 
-def summarize_codebase():
-    logging.info("Summarizing codebase...")
+LINE_COUNT_BUFFER_SIZE = 1024 * 1024
+BINARY_SNIFF_BYTES = 8192
+# Below this many files a process pool costs more than it saves.
+PARALLEL_SUMMARY_MIN_FILES = 2000
+SUMMARY_SHARD_SIZE = 500
+
+def count_file_lines(file_path):
+    # Counts newlines from fixed-size binary buffers, so memory stays flat whatever
+    # the file size. Returns None for files that look binary (NUL in the first bytes).
+    try:
+        with open(file_path, 'rb') as f:
+            buffer = f.read(LINE_COUNT_BUFFER_SIZE)
+            if b'\0' in buffer[:BINARY_SNIFF_BYTES]:
+                return None
+            lines = 0
+            last = b''
+            while buffer:
+                lines += buffer.count(b'\n')
+                last = buffer[-1:]
+                buffer = f.read(LINE_COUNT_BUFFER_SIZE)
+    except OSError as e:
+        logging.warning(f"Could not read file {file_path}: {str(e)}")
+        return None
+    if last and last != b'\n':
+        lines += 1
+    return lines
+
+def _count_shard(paths):
+    return [count_file_lines(path) for path in paths]
+
+def count_lines_parallel(paths, processes=None):
+    if len(paths) < PARALLEL_SUMMARY_MIN_FILES:
+        return _count_shard(paths)
+    # Imported here: the process pool pulls in socket/multiprocessing, too slow for CLI startup.
+    from concurrent.futures import ProcessPoolExecutor
+    shards = [paths[i:i + SUMMARY_SHARD_SIZE] for i in range(0, len(paths), SUMMARY_SHARD_SIZE)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return [lines for shard in executor.map(_count_shard, shards) for lines in shard]
+
+def top_level_directory(file_path):
+    parts = os.path.normpath(file_path).split(os.sep)
+    return parts[0] if len(parts) > 1 else '.'
+
+def aggregate_summary(rows):
+    # rows: (path, extension, lines or None for binary/omitted files, size in bytes)
     summary = {
         "total_files": 0,
         "total_lines": 0,
-        "file_types": {}
+        "skipped_files": 0,
+        "file_types": {},
+        "by_extension": {},
+        "by_directory": {},
     }
+    for file_path, extension, lines, size in rows:
+        summary["total_files"] += 1
+        summary["file_types"][extension] = summary["file_types"].get(extension, 0) + 1
+        if lines is None:
+            summary["skipped_files"] += 1
+        else:
+            summary["total_lines"] += lines
+        for key, group in ((extension or '(none)', "by_extension"), (top_level_directory(file_path), "by_directory")):
+            bucket = summary[group].setdefault(key, {"files": 0, "lines": 0, "bytes": 0})
+            bucket["files"] += 1
+            bucket["lines"] += lines or 0
+            bucket["bytes"] += size
+    return summary
 
-    for root, _, files in os.walk('.'):
-        for file in files:
-            if file.startswith('.') or 'venv' in root:
-                continue
-
-            file_path = os.path.join(root, file)
-            _, extension = os.path.splitext(file)
-            
-            summary["total_files"] += 1
-            summary["file_types"][extension] = summary["file_types"].get(extension, 0) + 1
+def summarize_codebase(as_json=False):
+    from .index_utils import CodebaseIndex
+    logging.info("Summarizing codebase...")
+    index = CodebaseIndex.open_existing()
+    if index is not None:
+        try:
+            index.refresh(content_classifier.read)
+            summary = aggregate_summary(index.file_stats())
+        finally:
+            index.close()
+    else:
+        snapshot = get_codebase_snapshot()
+        paths = [entry.path for entry in snapshot.files]
+        line_counts = count_lines_parallel(paths)
+        summary = aggregate_summary(
+            (entry.path, entry.ext, lines, entry.size) for entry, lines in zip(snapshot.files, line_counts))
 
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    summary["total_lines"] += len(lines)
-            except Exception as e:
-                logging.warning(f"Could not read file {file_path}: {str(e)}")
+    if as_json:
+        return json.dumps(summary, indent=2, sort_keys=True)
+    return format_summary(summary)
 
+def format_summary(summary):
     return f"""Codebase Summary:
 Total Files: {summary['total_files']}
 Total Lines of Code: {summary['total_lines']}
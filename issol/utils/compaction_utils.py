@@ -0,0 +1,249 @@
+import os
+import re
+import ast
+import json
+import logging
+import threading
+from .config_utils import CODEBASE_CACHE_DIR
+from .manifest_utils import content_hash, write_json_atomic
+from .index_utils import SYMBOL_PATTERNS
+from .context_utils import normalize_path, estimate_tokens
+from .content_utils import is_omitted
+from .trace_utils import tracer
+
+# Files shorter than this gain little from a skeleton and are sent whole.
+SKELETON_MIN_CHARS = 1200
+MAX_ASSIGNMENT_LINES = 3
+SKELETON_PREFIX = "[Skeleton: imports, signatures and docstrings only]\n"
+# Bump when the skeleton format changes so cached skeletons are rebuilt.
+SKELETON_CACHE_KEY = 'skeleton-v1'
+SKELETON_CACHE_FILE = os.path.join(CODEBASE_CACHE_DIR, 'skeletons.json')
+
+IMPORT_RE = re.compile(
+    r'^\s*(?:import\s|from\s+\S+\s+import\s|export\s+.*\s+from\s|(?:const|let|var)\s+.*=\s*require\(|'
+    r'#include\s|using\s+[\w.]+\s*;|package\s|use\s)'
+)
+BLANK_RUN_RE = re.compile(r'\n{3,}')
+TRAILING_SPACE_RE = re.compile(r'[ \t]+$', re.MULTILINE)
+
+
+def normalize_whitespace(content):
+    # Trailing spaces and runs of blank lines; indentation is left alone.
+    content = TRAILING_SPACE_RE.sub('', content)
+    return BLANK_RUN_RE.sub('\n\n', content).strip('\n') + '\n'
+
+
+def _lines(node, lines):
+    end = getattr(node, 'end_lineno', None) or node.lineno
+    return lines[node.lineno - 1:end]
+
+
+def _indent_of(line):
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _docstring_node(body):
+    if body and isinstance(body[0], ast.Expr) and isinstance(getattr(body[0], 'value', None), ast.Constant) \
+            and isinstance(body[0].value.value, str):
+        return body[0]
+    return None
+
+
+def _python_definition(node, lines, out):
+    start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+    first = node.body[0]
+    if first.lineno == node.lineno:
+        # One-line definitions are already as short as they get.
+        out.extend(_lines(node, lines) if not node.decorator_list else lines[start - 1:node.lineno])
+        return
+    out.extend(lines[start - 1:first.lineno - 1])
+    body_indent = _indent_of(lines[first.lineno - 1])
+    docstring = _docstring_node(node.body)
+    if docstring is not None:
+        out.extend(_lines(docstring, lines))
+    if isinstance(node, ast.ClassDef):
+        before = len(out)
+        _python_body(node.body[1:] if docstring is not None else node.body, lines, out)
+        if len(out) == before and docstring is None:
+            out.append(body_indent + '...')
+    else:
+        out.append(body_indent + '...')
+
+
+def _python_body(body, lines, out):
+    previous = None
+    for node in body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            kind, node_lines = 'import', _lines(node, lines)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            kind, node_lines = 'assign', _lines(node, lines)
+            if len(node_lines) > MAX_ASSIGNMENT_LINES:
+                continue
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            kind, node_lines = 'definition', None
+        else:
+            continue
+        # Keep a blank line between groups and around every definition, as in the source.
+        if out and out[-1].strip() and previous is not None and (kind != previous or kind == 'definition'):
+            out.append('')
+        if node_lines is None:
+            _python_definition(node, lines, out)
+        else:
+            out.extend(node_lines)
+        previous = kind
+
+
+def python_skeleton(content):
+    """Imports, module constants, class and function signatures and docstrings of a Python file."""
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+    lines = content.splitlines()
+    out = []
+    docstring = _docstring_node(tree.body)
+    if docstring is not None:
+        out.extend(_lines(docstring, lines))
+    _python_body(tree.body[1:] if docstring is not None else tree.body, lines, out)
+    return '\n'.join(out) + '\n'
+
+
+def pattern_skeleton(file_path, content):
+    # Languages without a standard-library parser: keep imports and the lines
+    # that the index recognises as definitions, with their bodies elided.
+    ext = os.path.splitext(file_path)[1].lower()
+    for extensions, patterns in SYMBOL_PATTERNS.items():
+        if ext in extensions:
+            break
+    else:
+        return None
+    out = []
+    definitions = 0
+    for line in content.splitlines():
+        if IMPORT_RE.match(line):
+            out.append(line)
+        elif any(pattern.match(line) for _, pattern in patterns):
+            definitions += 1
+            if out and out[-1].strip():
+                out.append('')
+            out.extend([line, _indent_of(line) + '    ...'])
+    if not definitions:
+        return None
+    return '\n'.join(out) + '\n'
+
+
+def skeleton(file_path, content):
+    if file_path.endswith('.py'):
+        return python_skeleton(content)
+    return pattern_skeleton(file_path, content)
+
+
+class SkeletonCache:
+    """Skeletons keyed by content hash, in their own file.
+
+    manifest.json belongs to the scan (or to the --serve watcher, which keeps
+    it in memory), so skeletons are not written into it. On save, skeletons
+    of contents that the last compaction did not use are dropped.
+    """
+
+    def __init__(self, path=SKELETON_CACHE_FILE):
+        self.path = path
+        self._skeletons = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._skeletons is None:
+            self._skeletons = {}
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                return self._skeletons
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable skeleton cache {self.path}: {str(e)}")
+                return self._skeletons
+            if data.get('version') == SKELETON_CACHE_KEY:
+                self._skeletons = data.get('skeletons', {})
+        return self._skeletons
+
+    def get(self, digest):
+        with self._lock:
+            return self._load().get(digest)
+
+    def put(self, digest, value):
+        with self._lock:
+            self._load()[digest] = value
+            self._dirty = True
+
+    def save(self, keep):
+        with self._lock:
+            if self._skeletons is None:
+                return
+            stale = set(self._skeletons) - set(keep)
+            for digest in stale:
+                del self._skeletons[digest]
+            if self._dirty or stale:
+                write_json_atomic(self.path, {'version': SKELETON_CACHE_KEY, 'skeletons': self._skeletons})
+                self._dirty = False
+
+
+skeleton_cache = SkeletonCache()
+
+
+def compact_file(file_path, content, digest, use_cache=True):
+    cached = skeleton_cache.get(digest) if use_cache else None
+    if cached is not None:
+        # An empty string records that no shorter skeleton exists.
+        return SKELETON_PREFIX + cached if cached else None
+    result = skeleton(file_path, content)
+    if result is not None:
+        result = normalize_whitespace(result)
+        if len(result) + len(SKELETON_PREFIX) >= len(content):
+            result = None
+    if use_cache:
+        skeleton_cache.put(digest, result or '')
+    return SKELETON_PREFIX + result if result else None
+
+
+def compact_files(files, affected_files, use_cache=True):
+    """Shrink the codebase context for one issue.
+
+    Affected files are kept verbatim. Every other file has its whitespace
+    normalized, is replaced by a short stub if its content duplicates an
+    earlier file, and is reduced to a skeleton when it is long enough and a
+    parser or definition patterns exist for its language.
+
+    Returns a dict mapping each path to the content to send.
+    """
+    affected = {normalize_path(p) for p in affected_files if p.strip()}
+    compacted = {}
+    first_path = {}
+    stats = {'skeletons': 0, 'duplicates': 0}
+    with tracer.span('compact_context') as span:
+        for file_path, content in files:
+            if normalize_path(file_path) in affected or is_omitted(content):
+                compacted[file_path] = content
+                continue
+            digest = content_hash(content)
+            if digest in first_path:
+                compacted[file_path] = f"[Duplicate of {first_path[digest]}]"
+                stats['duplicates'] += 1
+                continue
+            first_path[digest] = file_path
+            result = compact_file(file_path, content, digest, use_cache) if len(content) >= SKELETON_MIN_CHARS else None
+            if result is not None:
+                stats['skeletons'] += 1
+                compacted[file_path] = result
+            else:
+                compacted[file_path] = normalize_whitespace(content) if content.strip() else content
+        if use_cache:
+            skeleton_cache.save(keep=first_path)
+
+        before = sum(estimate_tokens(content) for _, content in files)
+        after = sum(estimate_tokens(content) for content in compacted.values())
+        span.set(tokens_before=before, tokens_after=after, **stats)
+    saved = 100 * (before - after) / before if before else 0
+    print(f"Context compaction: ~{before} -> ~{after} tokens ({saved:.0f}% smaller), "
+          f"{stats['skeletons']} files reduced to skeletons, {stats['duplicates']} duplicates")
+    return compacted
@@ -3,6 +3,14 @@ import json
 from pathlib import Path
 
 CONFIG_FILE = Path.home() / '.issol_config.json'
+CODEBASE_CONTEXT_DIR = '.codebase_context'
+CODEBASE_CACHE_DIR = os.path.join(CODEBASE_CONTEXT_DIR, 'cache')
+TECH_STACK_FILE = os.path.join(CODEBASE_CONTEXT_DIR, 'tech_stack.md')
+# `issol --serve` defaults, kept here so the CLI can show them without importing the server.
+SERVE_HOST = '127.0.0.1'
+SERVE_PORT = 8765
+SERVE_QUEUE_SIZE = 32
+WATCH_INTERVAL = 2.0
 
 def load_config():
     if CONFIG_FILE.exists():
@@ -25,18 +33,3 @@ def get_or_prompt_token(token_name, prompt_message):
         print(f"{token_name} has been saved to {CONFIG_FILE}")
     
     return token
-
-def setup_tokens():
-    github_token = get_or_prompt_token(
-        'GITHUB_TOKEN',
-        "Please enter your GitHub Personal Access Token"
-    )
-    anthropic_token = get_or_prompt_token(
-        'ANTHROPIC_API_KEY',
-        "Please enter your Anthropic API Key"
-    )
-    
-    os.environ['GITHUB_TOKEN'] = github_token
-    os.environ['ANTHROPIC_API_KEY'] = anthropic_token
-
-    return github_token, anthropic_token
\ No newline at end of file
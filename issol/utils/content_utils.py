@@ -0,0 +1,138 @@
+import os
+import re
+import mmap
+import fnmatch
+import threading
+from collections import Counter
+
+DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 256 * 1024
+SNIFF_BYTES = 64 * 1024
+BINARY_SNIFF_BYTES = 8192
+MINIFIED_AVG_LINE_LENGTH = 300
+MINIFIED_MAX_LINE_LENGTH = 5000
+
+GENERATED_FILE_PATTERNS = [
+    '*.min.js', '*.min.css', '*.map', '*.bundle.js', '*.chunk.js',
+    '*.lock', '*-lock.json', '*-lock.yaml', 'go.sum', 'npm-shrinkwrap.json',
+    '*_pb2.py', '*_pb2_grpc.py', '*.pb.go', '*.pb.cc', '*.pb.h', '*.g.dart', '*.designer.cs',
+    '*.generated.*', '*_generated.*',
+]
+# Generated-file headers are only recognized in the leading comment lines, in
+# their conventional forms, so source that merely mentions them is kept.
+GENERATED_HEADER_LINES = 5
+GO_GENERATED_HEADER = re.compile(rb'^// Code generated .* DO NOT EDIT\.$')
+AT_GENERATED_HEADER = re.compile(rb'^\s*(?:#|//|/\*|\*|--|;|<!--).*@generated\b')
+GENERATED_FILE_RE = re.compile('|'.join(fnmatch.translate(p) for p in GENERATED_FILE_PATTERNS), re.IGNORECASE)
+
+
+OMITTED_PREFIX = "[Content omitted: "
+
+
+def has_generated_header(head):
+    for line in head.split(b'\n', GENERATED_HEADER_LINES)[:GENERATED_HEADER_LINES]:
+        line = line.rstrip(b'\r')
+        if GO_GENERATED_HEADER.match(line) or AT_GENERATED_HEADER.match(line):
+            return True
+    return False
+
+
+def is_omitted(content):
+    return content.startswith(OMITTED_PREFIX)
+
+
+def is_omitted_binary(content):
+    return content.startswith(OMITTED_PREFIX + 'binary')
+
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class ContentClassifier:
+    """Decides which files are worth sending to the model.
+
+    Binary files, files over `max_file_size` and generated or minified files
+    are replaced by a one-line stub with their size and the reason, so they
+    cost a few tokens instead of megabytes. Large text files are read through
+    mmap to avoid an extra buffered copy.
+    """
+
+    def __init__(self, max_file_size=DEFAULT_MAX_FILE_SIZE):
+        self.max_file_size = max_file_size
+        self.skipped = Counter()
+        self._lock = threading.Lock()
+
+    def classify(self, file_path, size, head):
+        # Returns None for regular text files, or the reason to skip the file.
+        if b'\0' in head[:BINARY_SNIFF_BYTES]:
+            return 'binary'
+        try:
+            head.decode('utf-8')
+        except UnicodeDecodeError as e:
+            # A multi-byte character cut at the sniff boundary is not an error.
+            if e.start < len(head) - 4 or size <= len(head):
+                return 'binary'
+        if self.is_oversized(size):
+            return f"larger than {format_size(self.max_file_size)}"
+        if GENERATED_FILE_RE.match(os.path.basename(file_path)):
+            return 'generated file'
+        if has_generated_header(head):
+            return 'generated file'
+        lines = head.split(b'\n')
+        longest = max(len(line) for line in lines)
+        if longest > MINIFIED_MAX_LINE_LENGTH or (len(head) > 4096 and len(head) / len(lines) > MINIFIED_AVG_LINE_LENGTH):
+            return 'minified'
+        return None
+
+    def read(self, file_path, size=None):
+        # Returns the file's text, or a stub line when the file is skipped.
+        try:
+            if size is None:
+                size = os.path.getsize(file_path)
+            with open(file_path, 'rb') as f:
+                head = f.read(SNIFF_BYTES)
+                reason = self.classify(file_path, size, head)
+                if reason is not None:
+                    return self.omit(reason, size)
+                if size <= len(head):
+                    return head.decode('utf-8')
+                if size >= MMAP_THRESHOLD:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        return str(mapped, 'utf-8')
+                return (head + f.read()).decode('utf-8')
+        except FileNotFoundError:
+            print(f"File not found: {file_path}")
+            return ""
+        except Exception as e:
+            print(f"Error reading file {file_path}: {str(e)}")
+            return ""
+
+    def decode(self, file_path, data):
+        # Same as read() for content that is already in memory, such as a git blob.
+        reason = self.classify(file_path, len(data), data[:SNIFF_BYTES])
+        if reason is None:
+            try:
+                return data.decode('utf-8')
+            except UnicodeDecodeError:
+                reason = 'binary'
+        return self.omit(reason, len(data))
+
+    def is_oversized(self, size):
+        return bool(self.max_file_size) and size > self.max_file_size
+
+    def omit(self, reason, size):
+        with self._lock:
+            self.skipped[reason.split(' ')[0]] += 1
+        return f"{OMITTED_PREFIX}{reason}, {format_size(size)}]"
+
+    def report(self):
+        if not self.skipped:
+            return ""
+        return ', '.join(f"{count} {reason}" for reason, count in sorted(self.skipped.items()))
+
+
+content_classifier = ContentClassifier()
@@ -0,0 +1,191 @@
+import os
+import re
+import math
+import logging
+from collections import Counter
+from .config_utils import TECH_STACK_FILE
+
+DEFAULT_CONTEXT_BUDGET = 100000
+
+# Rough characters-per-token ratio for code and English prose with Claude's tokenizer.
+CHARS_PER_TOKEN = 4
+PATH_WEIGHT = 3
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+IDENTIFIER_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+CAMEL_RE = re.compile(r'[A-Z]+(?=[A-Z][a-z]|\d|\b)|[A-Z]?[a-z]+|[A-Z]+|\d+')
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'can', 'do', 'for', 'from',
+    'has', 'have', 'if', 'in', 'into', 'is', 'it', 'its', 'of', 'on', 'or', 'should',
+    'so', 'that', 'the', 'their', 'then', 'there', 'this', 'to', 'was', 'we', 'when',
+    'which', 'will', 'with', 'would', 'you', 'self', 'none', 'true', 'false', 'return',
+}
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def tokenize(text):
+    # Identifiers are indexed whole and split on snake_case/camelCase boundaries,
+    # so "create_pull_request" also matches a query mentioning "pull request".
+    tokens = []
+    for identifier in IDENTIFIER_RE.findall(text):
+        lowered = identifier.lower()
+        if lowered in STOPWORDS or len(lowered) < 2:
+            continue
+        tokens.append(lowered)
+        parts = [p.lower() for chunk in identifier.split('_') for p in CAMEL_RE.findall(chunk)]
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if len(p) > 1 and p not in STOPWORDS)
+    return tokens
+
+
+def normalize_path(path):
+    path = path.strip().strip('`*-').strip().strip('`')
+    path = os.path.normpath(path).replace(os.sep, '/')
+    if path.startswith('./'):
+        path = path[2:]
+    return path.lower()
+
+
+def build_query(issue_content):
+    return ' '.join([
+        issue_content.get('problem_description', ''),
+        issue_content.get('desired_outcome', ''),
+        ' '.join(issue_content.get('affected_files', [])),
+    ])
+
+
+def rank_files(files, query):
+    # BM25 over identifiers in each file's contents plus its path (weighted).
+    query_terms = set(tokenize(query))
+    doc_terms = []
+    for file_path, content in files:
+        terms = Counter(tokenize(content))
+        for term in tokenize(file_path.replace('/', ' ').replace('.', ' ')):
+            terms[term] += PATH_WEIGHT
+        doc_terms.append(terms)
+
+    doc_count = len(doc_terms) or 1
+    avg_length = sum(sum(t.values()) for t in doc_terms) / doc_count or 1
+    doc_freq = Counter()
+    for terms in doc_terms:
+        doc_freq.update(term for term in query_terms if term in terms)
+
+    scores = []
+    for (file_path, _), terms in zip(files, doc_terms):
+        length = sum(terms.values())
+        score = 0.0
+        matched = []
+        for term in query_terms:
+            tf = terms.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (doc_count - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+            matched.append(term)
+        scores.append((score, sorted(matched)))
+    return scores
+
+
+def load_tech_stack():
+    # Written by `issol -c`; optional.
+    try:
+        with open(TECH_STACK_FILE, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def shared_context(files, issue_content, budget=DEFAULT_CONTEXT_BUDGET, compacted=None):
+    """Send the whole codebase when it fits in `budget`.
+
+    The shared part holds every file in file order, compacted where
+    `compacted` has a shorter form, and does not depend on the issue. It can
+    therefore be a cached prompt prefix for every issue resolved against the
+    same snapshot. The issue's affected files follow it in full, unless
+    nothing was compacted.
+
+    Returns (shared, affected) lists of (path, content), or (None, None) when
+    the codebase does not fit and needs per-issue selection.
+    """
+    affected_paths = {normalize_path(p) for p in issue_content.get('affected_files', []) if p.strip()}
+    shared = [(file_path, compacted.get(file_path, content) if compacted is not None else content)
+              for file_path, content in files]
+    affected = [(file_path, content) for file_path, content in files
+                if compacted is not None and normalize_path(file_path) in affected_paths]
+    tokens = sum(estimate_tokens(content) for _, content in shared + affected)
+    if budget > 0 and tokens > budget:
+        return None, None
+    print(f"Context: all {len(shared)} files shared between issues, plus {len(affected)} affected files in full, "
+          f"~{tokens} tokens" + (f" (budget {budget})" if budget > 0 else " (no budget)"))
+    return shared, affected
+
+
+def select_context(files, issue_content, budget=DEFAULT_CONTEXT_BUDGET, compacted=None):
+    """Pick the files to send to the model for an issue.
+
+    Affected files are always included. The remaining files are ranked with
+    BM25 against the issue text and added greedily, best first, while the
+    estimated token count stays within `budget`. A budget of 0 or less keeps every file.
+    When `compacted` maps paths to shorter contents, other files are still
+    ranked on their full text but costed and sent in compacted form.
+
+    Returns a list of dicts with path, content, tokens, score, reason and a
+    `selected` flag, in the original file order.
+    """
+    affected = {normalize_path(p) for p in issue_content.get('affected_files', []) if p.strip()}
+    scores = rank_files(files, build_query(issue_content))
+
+    candidates = []
+    for (file_path, content), (score, matched) in zip(files, scores):
+        is_affected = normalize_path(file_path) in affected
+        if compacted is not None and not is_affected:
+            content = compacted.get(file_path, content)
+        if is_affected:
+            reason = 'affected file'
+        elif matched:
+            reason = f"bm25 {score:.2f} ({', '.join(matched[:5])})"
+        else:
+            reason = 'no query terms'
+        candidates.append({
+            'path': file_path,
+            'content': content,
+            'tokens': estimate_tokens(content),
+            'score': score,
+            'affected': is_affected,
+            'reason': reason,
+            'selected': budget <= 0,
+        })
+
+    if budget > 0:
+        used = 0
+        for candidate in candidates:
+            if candidate['affected']:
+                candidate['selected'] = True
+                used += candidate['tokens']
+        for candidate in sorted(candidates, key=lambda c: -c['score']):
+            if candidate['selected']:
+                continue
+            if used + candidate['tokens'] > budget:
+                candidate['reason'] += ', over budget'
+                continue
+            candidate['selected'] = True
+            used += candidate['tokens']
+
+    dump_selection(candidates, budget)
+    return candidates
+
+
+def dump_selection(candidates, budget):
+    selected = [c for c in candidates if c['selected']]
+    used = sum(c['tokens'] for c in selected)
+    print(f"Context selection: {len(selected)}/{len(candidates)} files, ~{used} tokens"
+          + (f" (budget {budget})" if budget > 0 else " (no budget)"))
+    if not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return
+    for candidate in sorted(candidates, key=lambda c: (not c['selected'], -c['score'])):
+        mark = '+' if candidate['selected'] else '-'
+        logging.debug(f"  {mark} {candidate['path']} ~{candidate['tokens']} tokens: {candidate['reason']}")
@@ -0,0 +1,66 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .ai_utils import generate_code
+from .github_utils import iter_file_sections
+from .context_utils import normalize_path
+from .trace_utils import tracer
+
+DEFAULT_FILE_CONCURRENCY = 4
+# Stems too common to say two files belong together.
+GENERIC_STEMS = {'', '__init__', '__main__', 'index', 'main', 'mod', 'lib', 'utils', 'types', 'constants'}
+
+
+def related_key(file_path):
+    # Files that share a stem once test markers are removed (user.py,
+    # test_user.py, user_test.go, user.spec.ts) are generated together so
+    # they stay consistent.
+    stem = os.path.basename(normalize_path(file_path)).split('.')[0]
+    if stem.startswith('test_'):
+        stem = stem[len('test_'):]
+    for suffix in ('_tests', '_test'):
+        if stem.endswith(suffix):
+            stem = stem[:-len(suffix)]
+    return normalize_path(file_path) if stem in GENERIC_STEMS else stem
+
+
+def group_related_files(file_paths):
+    groups = {}
+    for file_path in file_paths:
+        if file_path.strip():
+            groups.setdefault(related_key(file_path), []).append(file_path.strip())
+    return list(groups.values())
+
+
+def generate_concurrently(system_prompt, prompts, concurrency=DEFAULT_FILE_CONCURRENCY):
+    """Runs one model call per prompt, at most `concurrency` at a time.
+
+    Yields (index, text, seconds) in completion order, so callers can start
+    on the first finished file while slower ones are still generating.
+    """
+    parent_span = tracer.current()
+
+    def call(index):
+        start = time.perf_counter()
+        with tracer.adopt(parent_span):
+            text = generate_code(system_prompt, prompts[index])
+        return index, text, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [executor.submit(call, index) for index in range(len(prompts))]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def merge_sections(texts):
+    # Re-emits the '# File:' sections of several responses as one stream in the
+    # format create_pull_request consumes. The first section for a path wins.
+    seen = set()
+    for text in texts:
+        for file_path, raw_content in iter_file_sections([text]):
+            key = normalize_path(file_path)
+            if key in seen:
+                print(f"Ignoring a second generated section for {file_path}")
+                continue
+            seen.add(key)
+            yield f"# File: {file_path}\n{raw_content}" + ('' if raw_content.endswith('\n') else '\n')
@@ -0,0 +1,188 @@
+import os
+import time
+import logging
+import threading
+import subprocess
+from .ignore_matcher import IgnoreMatcher
+from .content_utils import content_classifier, format_size
+
+SYMLINK_MODE = b'120000'
+
+
+def run_git(*args):
+    return subprocess.run(['git', *args], capture_output=True, check=True).stdout.decode('utf-8').strip()
+
+
+def is_git_repository():
+    try:
+        return run_git('rev-parse', '--is-inside-work-tree') == 'true'
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+
+def checked_out_branch():
+    try:
+        return run_git('symbolic-ref', '--quiet', '--short', 'HEAD')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def resolve_commit(ref):
+    # Local branches and tags first, then the remote-tracking branch.
+    for candidate in (ref, f"origin/{ref}"):
+        try:
+            return run_git('rev-parse', '--verify', '--quiet', f"{candidate}^{{commit}}")
+        except (OSError, subprocess.CalledProcessError):
+            continue
+    return None
+
+
+def branch_commit(branch):
+    """The commit to read `branch` from, or None to read the working tree.
+
+    The working tree is used when `branch` is checked out, so uncommitted
+    changes are part of the context, and when it is not a ref of this
+    repository.
+    """
+    if not branch or branch == checked_out_branch():
+        return None
+    commit = resolve_commit(branch)
+    if commit is None and is_git_repository():
+        logging.warning(f"Branch {branch} not found in the local repository, reading the working tree instead")
+    return commit
+
+
+def read_file_at(commit, file_path):
+    """Returns (text, mode) of `file_path` in `commit`, or (None, None) if it does not exist there."""
+    git_path = os.path.normpath(file_path).replace(os.sep, '/')
+    try:
+        listing = subprocess.run(['git', 'ls-tree', '-z', commit, '--', git_path],
+                                 capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    meta = listing.split(b'\t', 1)[0].split()
+    if len(meta) != 3 or meta[1] != b'blob':
+        return None, None
+    data = subprocess.run(['git', 'cat-file', 'blob', meta[2].decode('ascii')], capture_output=True, check=True).stdout
+    return data.decode('utf-8', errors='replace'), meta[0].decode('ascii')
+
+
+class BlobEntry:
+    __slots__ = ('path', 'ext', 'sha', 'size')
+
+    def __init__(self, path, sha, size):
+        self.path = path
+        self.ext = os.path.splitext(path)[1]
+        self.sha = sha
+        self.size = size
+
+
+class GitTreeSnapshot:
+    """The files of a commit, listed with `git ls-tree` instead of walking the disk.
+
+    Paths are relative to the current directory and prefixed like those of the
+    working-tree snapshot. Tracked files are filtered by the built-in ignore
+    patterns only, since .gitignore never applies to them. Symlinks and
+    submodules are skipped.
+    """
+
+    def __init__(self, commit, ignore_matcher=None):
+        self.commit = commit
+        self.ignore_matcher = ignore_matcher or IgnoreMatcher('.', read_gitignore=False)
+        self.files = []
+        self.ignored = 0
+        self.elapsed = 0.0
+
+    def build(self):
+        start = time.perf_counter()
+        output = subprocess.run(['git', 'ls-tree', '-r', '-z', '--long', self.commit],
+                                capture_output=True, check=True).stdout
+        for record in output.split(b'\0'):
+            if not record:
+                continue
+            meta, _, path = record.partition(b'\t')
+            mode, kind, sha, size = meta.split()
+            if kind != b'blob' or mode == SYMLINK_MODE:
+                continue
+            path = os.path.join('.', path.decode('utf-8', errors='surrogateescape'))
+            if self.ignore_matcher.is_ignored(path):
+                self.ignored += 1
+                continue
+            self.files.append(BlobEntry(path, sha.decode('ascii'), int(size)))
+        self.elapsed = time.perf_counter() - start
+        logging.info(f"Tree {self.commit[:12]}: {len(self.files)} files ({self.total_bytes() / 1e6:.2f} MB, "
+                     f"{self.ignored} ignored) in {self.elapsed:.3f}s")
+        return self
+
+    def total_bytes(self):
+        return sum(entry.size for entry in self.files)
+
+
+def read_blobs(shas):
+    # Yields (sha, bytes) in order from one `git cat-file --batch` process. Requests
+    # are written from a separate thread so git never waits on us between blobs.
+    process = subprocess.Popen(['git', 'cat-file', '--batch'], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def feed():
+        try:
+            for sha in shas:
+                process.stdin.write(f"{sha}\n".encode('ascii'))
+            process.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    writer = threading.Thread(target=feed, name='cat-file', daemon=True)
+    writer.start()
+    try:
+        for sha in shas:
+            header = process.stdout.readline().split()
+            if len(header) != 3:
+                logging.warning(f"Could not read blob {sha}: {b' '.join(header).decode('utf-8', 'replace')}")
+                yield sha, None
+                continue
+            data = process.stdout.read(int(header[2]))
+            process.stdout.read(1)
+            yield sha, data
+    finally:
+        process.stdout.close()
+        writer.join()
+        process.wait()
+
+
+def iter_git_tree(snapshot, manifest, stats=None):
+    """Yields (path, content) for every file of a GitTreeSnapshot, in order.
+
+    Blobs already in the manifest are served from it; the rest are read in a
+    single pass, classified like files on disk and recorded by blob SHA.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault('files', 0)
+    stats.setdefault('bytes', 0)
+    stats.setdefault('blobs_read', 0)
+    contents = {}
+    missing = {}
+    for entry in snapshot.files:
+        stats['files'] += 1
+        stats['bytes'] += entry.size
+        if entry.sha in contents or entry.sha in missing:
+            continue
+        cached = manifest.lookup_blob(entry.sha)
+        if cached is not None:
+            contents[entry.sha] = cached
+        elif content_classifier.is_oversized(entry.size):
+            # No need to pull the whole blob out of git just to stub it.
+            contents[entry.sha] = content_classifier.omit(f"larger than {format_size(content_classifier.max_file_size)}",
+                                                          entry.size)
+        else:
+            missing[entry.sha] = entry.path
+
+    for sha, data in read_blobs(list(missing)):
+        stats['blobs_read'] += 1
+        if data is None:
+            contents[sha] = ""
+            continue
+        contents[sha] = content_classifier.decode(missing[sha], data)
+        manifest.record_blob(sha, contents[sha])
+
+    for entry in snapshot.files:
+        yield entry.path, contents[entry.sha]
@@ -1,37 +1,72 @@
 import os
 import sys
-import fnmatch
 import re
-from github import Github, GithubException
-from git import Repo
-from git.exc import InvalidGitRepositoryError
+import threading
+import time
+import difflib
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from .config_utils import get_or_prompt_token
-from .ignore_patterns import IGNORE_PATTERNS
+from .ignore_matcher import IgnoreMatcher
+from .manifest_utils import CodebaseManifest
+from .snapshot_utils import get_codebase_snapshot
+from .content_utils import content_classifier
+from .trace_utils import tracer
+from .patch_utils import is_patch, apply_patch
+
+DEFAULT_SCAN_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+SCAN_WINDOW_PER_WORKER = 4
+BLOB_UPLOAD_WORKERS = 8
+
+_github_client = None
+_github_client_lock = threading.Lock()
+# PyGithub spaces out requests (and writes by a full second) to stay clear of
+# secondary rate limits; replays from a cassette have no limits to respect.
+github_request_pacing = True
 
 def get_github_client():
-    github_token = get_or_prompt_token('GITHUB_TOKEN', "Please enter your GitHub Personal Access Token")
-    if github_token:
-        return Github(github_token)
-    else:
-        print("Failed to obtain GitHub token. Exiting.")
-        sys.exit(1)
+    # The client (and the PyGithub import) is created on first use, so commands
+    # that never talk to GitHub do not pay for it.
+    global _github_client
+    with _github_client_lock:
+        if _github_client is None:
+            github_token = get_or_prompt_token('GITHUB_TOKEN', "Please enter your GitHub Personal Access Token")
+            if not github_token:
+                print("Failed to obtain GitHub token. Exiting.")
+                sys.exit(1)
+            from github import Github, Auth
+            from .http_utils import install_github_transport
+            install_github_transport()
+            # GITHUB_API_URL points at GitHub Enterprise (or a local stand-in).
+            pacing = {} if github_request_pacing else {'seconds_between_requests': None, 'seconds_between_writes': None}
+            _github_client = Github(auth=Auth.Token(github_token),
+                                    base_url=os.environ.get('GITHUB_API_URL', 'https://api.github.com'),
+                                    per_page=100, **pacing)
+    return _github_client
+
+def log_github_transport_stats():
+    if _github_client is not None:
+        from .http_utils import log_transport_stats
+        log_transport_stats()
 
-github_client = get_github_client()
+def parse_remote_url(remote_url):
+    path = remote_url.split(':', 1)[-1] if not remote_url.startswith(('https://', 'http://')) else remote_url
+    parts = path.rstrip('/').split('/')
+    name = parts[-1][:-len('.git')] if parts[-1].endswith('.git') else parts[-1]
+    return f"{parts[-2]}/{name}"
 
-def get_repo_info():
+def get_repo_info(quiet=False):
+    from git import Repo
+    from git.exc import InvalidGitRepositoryError
     try:
         repo = Repo(os.getcwd(), search_parent_directories=True)
-        remote_url = repo.remotes.origin.url
-        if remote_url.startswith('https://'):
-            parts = remote_url.split('/')
-            repo_name = f"{parts[-2]}/{parts[-1].rstrip('.git')}"
-        else:
-            parts = remote_url.split(':')
-            repo_name = parts[-1].rstrip('.git')
+        repo_name = parse_remote_url(repo.remotes.origin.url)
         
         current_branch = repo.active_branch.name
-        print(f"Repository: {repo_name}")
-        print(f"Current branch: {current_branch}")
+        if not quiet:
+            print(f"Repository: {repo_name}")
+            print(f"Current branch: {current_branch}")
         
         return repo_name, current_branch
     except InvalidGitRepositoryError:
@@ -41,32 +76,19 @@ def get_repo_info():
         print(f"Error determining repository info: {str(e)}")
         sys.exit(1)
 
-def parse_gitignore():
-    gitignore_patterns = IGNORE_PATTERNS.copy()
-    if os.path.exists('.gitignore'):
-        with open('.gitignore', 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    gitignore_patterns.append(line)
-    return gitignore_patterns
-
-def should_ignore(path, gitignore_patterns):
-    path = os.path.normpath(path)
-    
-    path_parts = path.split(os.sep)
-    for i in range(len(path_parts)):
-        partial_path = os.sep.join(path_parts[:i+1])
-        if any(fnmatch.fnmatch(partial_path, pattern) for pattern in gitignore_patterns):
-            return True
-        
-        if any(fnmatch.fnmatch(path_parts[i], pattern) for pattern in gitignore_patterns):
-            return True
-    
-    return False
+def get_repo(repo_name):
+    # A lazy Repository object costs no request until one of its fields or
+    # methods is used, so commands that only list or fetch issues skip GET /repos.
+    return get_github_client().withLazy(True).get_repo(repo_name)
+
+def parse_gitignore(root='.'):
+    return IgnoreMatcher(root)
 
-def get_file_content(file_path, gitignore_patterns):
-    if should_ignore(file_path, gitignore_patterns):
+def should_ignore(path, ignore_matcher, is_dir=False):
+    return ignore_matcher.is_ignored(path, is_dir)
+
+def get_file_content(file_path, ignore_matcher=None):
+    if ignore_matcher is not None and should_ignore(file_path, ignore_matcher):
         print(f"Ignoring file: {file_path}")
         return ""
     try:
@@ -79,26 +101,117 @@ def get_file_content(file_path, gitignore_patterns):
         print(f"Error reading file {file_path}: {str(e)}")
         return ""
 
-def scan_codebase(repo, branch):
-    context = ""
-    gitignore_patterns = parse_gitignore()
+def iter_codebase(snapshot, manifest, workers=DEFAULT_SCAN_WORKERS, stats=None):
+    # Reads the snapshot's files on a thread pool and yields (path, content) in
+    # snapshot order. At most `workers * SCAN_WINDOW_PER_WORKER` files are held
+    # in memory at once.
+    stats = stats if stats is not None else {}
+    stats.setdefault('files', 0)
+    stats.setdefault('bytes', 0)
+    window = max(1, workers) * SCAN_WINDOW_PER_WORKER
+    pending = deque()
+
+    def read(entry):
+        # The snapshot already applied the ignore rules, so skip the second check.
+        file_content = content_classifier.read(entry.path, entry.size)
+        return file_content, None if manifest.is_racy(entry.stat) else manifest.store_content(file_content)
+
+    def resolve(item):
+        entry, cached, future = item
+        if future is None:
+            manifest.hits += 1
+            return entry.path, cached
+        file_content, digest = future.result()
+        manifest.misses += 1
+        manifest.record(entry.path, entry.stat, digest)
+        return entry.path, file_content
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for entry in snapshot.files:
+            stats['files'] += 1
+            stats['bytes'] += entry.size
+            digest = manifest.lookup(entry.path, entry.stat)
+            # Unchanged files cost a primary-key lookup; only the others go to the pool.
+            cached = manifest.load_content(digest) if digest is not None else None
+            if cached is not None:
+                pending.append((entry, cached, None))
+            else:
+                pending.append((entry, None, executor.submit(read, entry)))
+            while len(pending) > window:
+                yield resolve(pending.popleft())
+        while pending:
+            yield resolve(pending.popleft())
+
+def scan_codebase_files(branch, use_cache=True, workers=DEFAULT_SCAN_WORKERS, manifest=None, working_tree=False):
+    # Reads `branch` from git objects unless it is checked out (see branch_commit);
+    # working_tree=True always reads the files on disk.
+    with tracer.span('scan_codebase') as span:
+        from .git_object_utils import branch_commit
+        commit = None if working_tree else branch_commit(branch)
+        if commit is not None:
+            files = _scan_git_tree(branch, commit, use_cache, manifest, span)
+        else:
+            files = _scan_codebase_files(branch, use_cache, workers, manifest, span)
+    return files
+
+def _scan_git_tree(branch, commit, use_cache, manifest, span):
+    from .git_object_utils import GitTreeSnapshot, iter_git_tree
+    with tracer.span('git_tree'):
+        snapshot = GitTreeSnapshot(commit).build()
+    if manifest is None:
+        manifest = CodebaseManifest.load() if use_cache else CodebaseManifest()
+    stats = {}
+
+    print(f"Scanning branch: {branch} (commit {commit[:12]}, from git objects)")
+    files = [(file_path, file_content)
+             for file_path, file_content in iter_git_tree(snapshot, manifest, stats)
+             if file_content]
+    span.set(files_scanned=stats['files'], bytes_scanned=stats['bytes'], files_with_content=len(files),
+             blobs_read=stats['blobs_read'], manifest_hits=manifest.hits, manifest_misses=manifest.misses)
+    if content_classifier.skipped:
+        print(f"Content omitted for: {content_classifier.report()}")
+    if use_cache:
+        # Working-tree entries were not visited by this scan, so keep them all.
+        manifest.prune(seen_paths=manifest.entries)
+        manifest.save()
+        print(f"Blobs: {manifest.hits} cached, {stats['blobs_read']} read from git")
+    return files
+
+def _scan_codebase_files(branch, use_cache, workers, manifest, span):
+    with tracer.span('snapshot'):
+        snapshot = get_codebase_snapshot()
+    if manifest is None:
+        manifest = CodebaseManifest.load() if use_cache else CodebaseManifest()
+    stats = {}
     
-    print("Gitignore patterns:", gitignore_patterns)
     print(f"Scanning branch: {branch}")
+    start = time.perf_counter()
     
-    for root, dirs, files in os.walk('.', topdown=True):
-        dirs[:] = [d for d in dirs if not should_ignore(os.path.join(root, d), gitignore_patterns)]
-        
-        for file in files:
-            file_path = os.path.join(root, file)
-            if not should_ignore(file_path, gitignore_patterns):
-                file_content = get_file_content(file_path, gitignore_patterns)
-                if file_content:
-                    context += f"File: {file_path} (branch: {branch})\n\n{file_content}\n\n"
-            else:
-                print(f"Ignoring file: {file_path}")
+    files = [(file_path, file_content)
+             for file_path, file_content in iter_codebase(snapshot, manifest, workers, stats)
+             if file_content]
     
-    return context
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    logging.debug(
+        f"Scanned {stats['files']} files ({stats['bytes'] / 1e6:.2f} MB) in {elapsed:.3f}s with {workers} workers: "
+        f"{stats['files'] / elapsed:.0f} files/s, {stats['bytes'] / 1e6 / elapsed:.2f} MB/s"
+    )
+    span.set(files_scanned=stats['files'], bytes_scanned=stats['bytes'], files_with_content=len(files),
+             manifest_hits=manifest.hits, manifest_misses=manifest.misses)
+    print(f"Ignore rules loaded from: {', '.join(snapshot.ignore_matcher.gitignore_files()) or 'built-in patterns only'}")
+    if content_classifier.skipped:
+        print(f"Content omitted for: {content_classifier.report()}")
+    if use_cache:
+        manifest.prune()
+        manifest.save()
+        print(f"Manifest: {manifest.hits} unchanged, {manifest.misses} read from disk")
+    return files
+
+def format_codebase_context(files, branch):
+    return ''.join(f"File: {file_path} (branch: {branch})\n\n{file_content}\n\n" for file_path, file_content in files)
+
+def scan_codebase(repo, branch, use_cache=True, workers=DEFAULT_SCAN_WORKERS, working_tree=False):
+    return format_codebase_context(scan_codebase_files(branch, use_cache, workers, working_tree=working_tree), branch)
 
 def extract_issue_content(body):
     print("Extracting issue content...")
@@ -167,17 +280,65 @@ def clean_generated_code(content):
     
     return content
 
-def create_pull_request(repo, issue, generated_code, base_branch, issue_content):
-    print(f"Starting create_pull_request function for issue #{issue.number}")
+def iter_file_sections(chunks):
+    # Incrementally splits generated text on '# File: ' headers and yields
+    # (path, raw content) for each section as soon as the next header arrives.
+    # If the stream breaks, the unfinished section is dropped and the error re-raised.
+    header = '# File: '
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        start = buffer.find(header)
+        if start < 0:
+            # Keep only a possible partial header at the end of the buffer.
+            buffer = buffer[-len(header):]
+            continue
+        while True:
+            next_start = buffer.find(header, start + len(header))
+            if next_start < 0:
+                break
+            yield _split_section(buffer[start + len(header):next_start])
+            start = next_start
+        buffer = buffer[start:]
+    start = buffer.find(header)
+    if start >= 0:
+        yield _split_section(buffer[start + len(header):])
+
+def _split_section(section):
+    lines = section.split('\n')
+    return lines[0].strip(), '\n'.join(lines[1:])
+
+def resolve_section(file_path, raw_content, original_content, regenerate=None):
+    # Turns one generated section into the file's new content. Sections with
+    # SEARCH/REPLACE blocks or diff hunks are applied to the current file; if any
+    # edit cannot be located, `regenerate(file_path, original_content)` is asked
+    # for the whole file instead. Returns (new content or None, PR note or None).
+    if not is_patch(raw_content):
+        return clean_generated_code(raw_content), None
+    result = apply_patch(original_content, raw_content)
+    print(f"Edits for {file_path}: {result.summary()}")
+    if not result.failed:
+        return result.content, None
+    for hunk in result.failed:
+        print(f"  Could not locate edit: {hunk.describe()}")
+    if regenerate is not None:
+        print(f"Falling back to full-file generation for {file_path}")
+        content = regenerate(file_path, original_content)
+        if content:
+            return content, f"{len(result.failed)} edit(s) to {file_path} did not apply; the file was regenerated in full."
+    return None, f"Edits to {file_path} could not be applied ({result.summary()}); the file was left unchanged."
+
+def create_fix_branch(repo, issue, commit_sha):
+    from github import GithubException
     base_branch_name = f"fix-{issue.number}-{create_branch_name(issue.title)}"
     new_branch_name = base_branch_name
     counter = 1
 
     while True:
         try:
-            repo.create_git_ref(ref=f"refs/heads/{new_branch_name}", sha=repo.get_branch(base_branch).commit.sha)
+            repo.create_git_ref(ref=f"refs/heads/{new_branch_name}", sha=commit_sha)
             print(f"Created new branch: {new_branch_name}")
-            break
+            return new_branch_name
         except GithubException as e:
             if e.status == 422:
                 print(f"Branch {new_branch_name} already exists. Trying a new name...")
@@ -187,20 +348,41 @@ def create_pull_request(repo, issue, generated_code, base_branch, issue_content)
                 print(f"Error creating branch: {str(e)}")
                 raise
 
-    file_contents = {}
-    print("Processing generated code:")
-    print(generated_code)
-    
-    file_sections = re.split(r'# File: ', generated_code)
-    for section in file_sections[1:]:
-        lines = section.split('\n')
-        file_path = lines[0].strip()
-        content = '\n'.join(lines[1:])
-        file_contents[file_path] = clean_generated_code(content)  # Apply cleaning here
-
-    if not file_contents:
-        print("Error: No file contents were extracted from the generated code.")
-        return
+def git_file_mode(file_path):
+    try:
+        return '100755' if os.stat(file_path).st_mode & 0o111 else '100644'
+    except OSError:
+        return '100644'
+
+def commit_files(repo, base_commit, blobs, message):
+    from github import InputGitTreeElement
+    # One tree and one commit for all changed files, whatever their number.
+    elements = [
+        InputGitTreeElement(path=git_path, mode=mode, type='blob', sha=blob.result().sha)
+        for git_path, (blob, mode) in blobs.items()
+    ]
+    tree = repo.create_git_tree(elements, base_tree=base_commit.tree)
+    commit = repo.create_git_commit(message, tree, [base_commit])
+    print(f"Created commit {commit.sha[:7]} with {len(elements)} file(s)")
+    return commit
+
+def create_pull_request(repo, issue, generated_code, base_branch, issue_content, regenerate=None):
+    with tracer.span('create_pull_request', issue=f"#{issue.number}"):
+        return _create_pull_request(repo, issue, generated_code, base_branch, issue_content, regenerate)
+
+def upload_blob(repo, content, parent_span=None):
+    with tracer.adopt(parent_span), tracer.span('upload_blob', bytes_uploaded=len(content.encode('utf-8'))):
+        return repo.create_git_blob(content, 'utf-8')
+
+def _create_pull_request(repo, issue, generated_code, base_branch, issue_content, regenerate):
+    # `generated_code` is either the full response text or an iterator of streamed
+    # chunks; in the latter case each file's blob is uploaded as soon as its section
+    # is complete, while the model is still generating the rest. All files then land
+    # in a single commit on the new branch. Sections may hold whole files or edits
+    # (see resolve_section).
+    from github import GithubException
+    print(f"Starting create_pull_request function for issue #{issue.number}")
+    chunks = [generated_code] if isinstance(generated_code, str) else generated_code
 
     pr_description = f"""This pull request addresses issue #{issue.number}.
 
@@ -213,62 +395,110 @@ Desired Outcome:
 Changes made:
 """
 
+    base_commit = None
     changes_made = False
-    gitignore_patterns = parse_gitignore()
-    print(f"Processing {len(file_contents)} files...")
-    for file_path, new_content in file_contents.items():
-        if should_ignore(file_path, gitignore_patterns):
-            print(f"\nSkipping ignored file: {file_path}")
-            continue
-        
-        print(f"\nProcessing file: {file_path}")
-        original_content = get_file_content(file_path, gitignore_patterns)
-        
-        print("AI suggested content:")
-        print(new_content)
-        print("\nExisting content:")
-        print(original_content)
-        
-        if new_content.strip() != original_content.strip():
-            changes_made = True
-            print(f"Changes detected for {file_path}")
-            
+    sections_seen = 0
+    stream_error = None
+    notes = []
+    blobs = {}
+    ignore_matcher = parse_gitignore()
+    # Edits apply to, and diffs compare against, the base branch. When it is not
+    # checked out, originals come from its commit, never from the working tree.
+    from .git_object_utils import branch_commit, read_file_at
+    source_commit = branch_commit(base_branch)
+    pr_span = tracer.current()
+    upload_executor = ThreadPoolExecutor(max_workers=BLOB_UPLOAD_WORKERS)
+    try:
+        sections = iter_file_sections(chunks)
+        while True:
+            # Only failures of the stream itself end generation early; a file
+            # that cannot be processed is skipped with a note.
             try:
-                if original_content:
-                    current_file = repo.get_contents(file_path, ref=new_branch_name)
-                    repo.update_file(file_path, f"Fix #{issue.number}: Update {file_path}", new_content, current_file.sha, branch=new_branch_name)
+                file_path, raw_content = next(sections)
+            except StopIteration:
+                break
+            except Exception as e:
+                stream_error = e
+                print(f"Error while generating code: {str(e)}")
+                print("Continuing with the files that were completely generated.")
+                break
+            sections_seen += 1
+            if should_ignore(file_path, ignore_matcher):
+                print(f"\nSkipping ignored file: {file_path}")
+                continue
+
+            try:
+                print(f"\nProcessing file: {file_path}")
+                if source_commit is None:
+                    original_content, file_mode = get_file_content(file_path, ignore_matcher), git_file_mode(file_path)
+                else:
+                    original_content, file_mode = read_file_at(source_commit, file_path)
+                    original_content, file_mode = original_content or "", file_mode or '100644'
+                new_content, note = resolve_section(file_path, raw_content, original_content, regenerate)
+                if note:
+                    notes.append(note)
+                if new_content is None:
+                    continue
+                
+                print("AI suggested content:")
+                print(new_content)
+                print("\nExisting content:")
+                print(original_content)
+                
+                if new_content.strip() != original_content.strip():
+                    changes_made = True
+                    print(f"Changes detected for {file_path}")
+                    if base_commit is None:
+                        with tracer.span('get_base_commit'):
+                            base_commit = repo.get_branch(base_branch).commit.commit
+                    git_path = os.path.normpath(file_path).replace(os.sep, '/')
+                    blobs[git_path] = (upload_executor.submit(upload_blob, repo, new_content, pr_span), file_mode)
+
+                    diff = list(difflib.unified_diff(original_content.splitlines(), new_content.splitlines(), lineterm=''))
+                    pr_description += f"\nChanges in {file_path}:\n```diff\n" + '\n'.join(diff) + "\n```\n"
                 else:
-                    repo.create_file(file_path, f"Fix #{issue.number}: Create {file_path}", new_content, branch=new_branch_name)
-                print(f"Successfully updated/created {file_path}")
-            except GithubException as e:
-                print(f"Error updating/creating file {file_path}: {str(e)}")
+                    print(f"No changes detected for {file_path}")
+            except GithubException:
                 raise
+            except Exception as e:
+                print(f"Error processing {file_path}: {str(e)}")
+                notes.append(f"{file_path} was not changed because it could not be processed: {str(e)}")
+        if changes_made:
+            changed_paths = '\n'.join(f"- {git_path}" for git_path in blobs)
+            with tracer.span('commit_files', files_changed=len(blobs)):
+                commit = commit_files(repo, base_commit, blobs,
+                                      f"Fix #{issue.number}: {issue.title}\n\n{changed_paths}")
+    finally:
+        upload_executor.shutdown(wait=True)
 
-            import difflib
-            diff = list(difflib.unified_diff(original_content.splitlines(), new_content.splitlines(), lineterm=''))
-            pr_description += f"\nChanges in {file_path}:\n```diff\n" + '\n'.join(diff) + "\n```\n"
-        else:
-            print(f"No changes detected for {file_path}")
+    if not sections_seen:
+        print("Error: No file contents were extracted from the generated code.")
+        return
 
     if not changes_made:
         print("\nNo changes were made to any files. Skipping pull request creation.")
-        try:
-            repo.get_git_ref(f"heads/{new_branch_name}").delete()
-            print(f"Deleted branch {new_branch_name} as it contained no changes.")
-        except GithubException:
-            print(f"Failed to delete branch {new_branch_name}. You may want to delete it manually.")
         return
 
+    with tracer.span('create_fix_branch'):
+        new_branch_name = create_fix_branch(repo, issue, commit.sha)
+
+    if stream_error is not None:
+        pr_description += "\nNote: code generation was interrupted; only files that were completely generated are included.\n"
+    for note in notes:
+        pr_description += f"\nNote: {note}\n"
+
     pr_description += "\nThis code was generated automatically by an AI assistant. Please review carefully before merging."
 
     try:
-        pr = repo.create_pull(
-            title=f"Fix #{issue.number}: {issue.title}",
-            body=pr_description,
-            head=new_branch_name,
-            base=base_branch
-        )
+        with tracer.span('create_pull'):
+            pr = repo.create_pull(
+                title=f"Fix #{issue.number}: {issue.title}",
+                body=pr_description,
+                head=new_branch_name,
+                base=base_branch
+            )
         print(f"Created Pull Request: {pr.html_url}")
+        return pr
     except GithubException as e:
         print(f"Error creating pull request: {str(e)}")
         if e.status == 422:
@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+import requests
+from github.Requester import Requester, RequestsResponse
+from .config_utils import CODEBASE_CACHE_DIR
+from .manifest_utils import write_json_atomic
+from .trace_utils import tracer
+
+HTTP_CACHE_DIR = os.path.join(CODEBASE_CACHE_DIR, 'http')
+HTTP_CACHE_MAX_BYTES = 50 * 1024 * 1024
+HTTP_CACHE_TTL_SECONDS = 7 * 24 * 3600
+# The store is trimmed on the first write of a process and then every this many writes.
+HTTP_CACHE_EVICT_INTERVAL = 100
+POOL_SIZE = 16
+# Start spacing out requests once fewer than this many remain in the rate-limit window.
+RATE_LIMIT_RESERVE = 100
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 2
+MAX_BACKOFF_SECONDS = 120
+# Longer rate-limit waits (Retry-After, or a reset up to an hour away) are not
+# slept through: the 403/429 is handed to PyGithub, which raises it.
+MAX_RATE_LIMIT_WAIT_SECONDS = 300
+
+
+class TransportStats:
+    def __init__(self):
+        self.requests = 0
+        self.not_modified = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+        self.rate_limit_remaining = None
+        self.rate_limit_reset = None
+        self._lock = threading.Lock()
+
+    def add(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def __str__(self):
+        return (f"GitHub HTTP: {self.requests} requests, {self.not_modified} served from cache (304), "
+                f"{self.retries} retries, {self.wait_seconds:.1f}s waiting on rate limits")
+
+
+transport_stats = TransportStats()
+
+
+class CachedResponse:
+    # Mimics github.Requester.RequestsResponse for bodies replayed from the ETag cache.
+    def __init__(self, status, headers, text):
+        self.status = status
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.text = text
+
+    def getheaders(self):
+        return self.headers.items()
+
+    def read(self):
+        return self.text
+
+    def iter_content(self, chunk_size=1):
+        yield self.text.encode('utf-8')
+
+    def raise_for_status(self):
+        pass
+
+
+class ResponseStore:
+    """ETag / Last-Modified store for GET responses, one JSON file per URL.
+
+    Entries are keyed by path and query, not host and port, so the same
+    request through a cassette proxy on a random port reuses its entry.
+    Hits refresh an entry's mtime; entries older than `ttl` and the least
+    recently used ones past `max_bytes` are evicted, like ResponseCache.
+    """
+
+    def __init__(self, directory=HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_BYTES, ttl=HTTP_CACHE_TTL_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    def _path(self, path, headers):
+        # Responses depend on who is asking, so the credentials are part of the key.
+        identity = headers.get('Authorization', '') + '\n' + headers.get('Accept', '') + '\n' + path
+        return os.path.join(self.directory, hashlib.sha256(identity.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, path, headers):
+        file_path = self._path(path, headers)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(file_path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def put(self, path, headers, response):
+        validators = {k: response.headers[k] for k in ('ETag', 'Last-Modified') if k in response.headers}
+        if not validators:
+            return
+        write_json_atomic(self._path(path, headers),
+                          {'validators': validators, 'headers': dict(response.headers), 'body': response.text})
+        with self._lock:
+            self._puts += 1
+            due = self._puts % HTTP_CACHE_EVICT_INTERVAL == 1
+        if due:
+            self.evict()
+
+    def evict(self):
+        with self._lock:
+            try:
+                entries = [e for e in os.scandir(self.directory) if e.name.endswith('.json')]
+            except OSError:
+                return
+            stats = []
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                stats.append((stat.st_mtime, stat.st_size, entry.path))
+            cutoff = time.time() - self.ttl
+            total = sum(size for _, size, _ in stats)
+            for mtime, size, file_path in sorted(stats):
+                if mtime >= cutoff and total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    continue
+                self.evictions += 1
+                total -= size
+
+
+class CachingConnection:
+    """Drop-in for PyGithub's requests-based connection classes.
+
+    All connections share one pooled keep-alive session. GET responses are
+    revalidated with If-None-Match / If-Modified-Since so unchanged resources
+    come back as 304s (which GitHub does not count against the rate limit).
+    Requests are spaced out as X-RateLimit-Remaining runs low, and secondary
+    rate limits (403/429 with Retry-After) are retried with backoff.
+
+    PyGithub passes its urllib3 Retry policy (GithubRetry) as `retry`, but
+    that policy only works inside its own requests adapter, which this class
+    replaces. So the retries here take its place, and they only cover rate
+    limits. Connection errors are not retried: a request that may have
+    reached GitHub (a POST creating a blob or pull request) must not be
+    sent twice.
+    """
+
+    protocol = 'https'
+    session = None
+    store = ResponseStore()
+    _session_lock = threading.Lock()
+
+    def __init__(self, host, port=None, strict=False, timeout=None, retry=None, pool_size=None, **kwargs):
+        self.host = host
+        self.port = port or (443 if self.protocol == 'https' else 80)
+        self.timeout = timeout
+        self.verify = kwargs.get('verify', True)
+
+    @classmethod
+    def _session(cls):
+        with cls._session_lock:
+            if CachingConnection.session is None:
+                session = requests.Session()
+                session.auth = Requester.noopAuth
+                adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                CachingConnection.session = session
+            return CachingConnection.session
+
+    def request(self, verb, url, input, headers, stream=False):
+        self.verb = verb
+        self.url = url
+        self.input = input
+        self.headers = dict(headers)
+        self.stream = stream
+
+    def getresponse(self):
+        url = f"{self.protocol}://{self.host}:{self.port}{self.url}"
+        cacheable = self.verb == 'GET' and not self.stream
+        cached = self.store.get(self.url, self.headers) if cacheable else None
+        headers = dict(self.headers)
+        if cached:
+            if 'ETag' in cached['validators']:
+                headers['If-None-Match'] = cached['validators']['ETag']
+            if 'Last-Modified' in cached['validators']:
+                headers['If-Modified-Since'] = cached['validators']['Last-Modified']
+
+        for attempt in range(MAX_RETRIES + 1):
+            throttle()
+            response = getattr(self._session(), self.verb.lower())(
+                url, headers=headers, data=self.input, timeout=self.timeout,
+                verify=self.verify, allow_redirects=False, stream=self.stream)
+            transport_stats.add('requests')
+            tracer.count('github_requests')
+            record_rate_limit(response.headers)
+            delay = secondary_rate_limit_delay(response, attempt)
+            if delay is None or attempt == MAX_RETRIES or hasattr(self.input, 'read'):
+                break
+            if delay > MAX_RATE_LIMIT_WAIT_SECONDS:
+                logging.warning(f"GitHub rate limit on {self.verb} {self.url} asks for a {delay:.0f}s wait, "
+                                f"over the {MAX_RATE_LIMIT_WAIT_SECONDS}s limit; not retrying")
+                break
+            logging.debug(f"Secondary rate limit on {self.verb} {self.url}, retrying in {delay:.1f}s")
+            transport_stats.add('retries')
+            wait(delay)
+
+        if response.status_code == 304 and cached:
+            transport_stats.add('not_modified')
+            tracer.count('github_not_modified')
+            merged = dict(cached['headers'])
+            merged.update(response.headers)
+            return CachedResponse(200, merged, cached['body'])
+        if cacheable and response.status_code == 200:
+            self.store.put(self.url, self.headers, response)
+        return RequestsResponse(response)
+
+    def close(self):
+        pass
+
+
+class HTTPCachingConnection(CachingConnection):
+    protocol = 'http'
+
+
+def record_rate_limit(headers):
+    remaining = headers.get('X-RateLimit-Remaining')
+    reset = headers.get('X-RateLimit-Reset')
+    if remaining is not None and reset is not None:
+        transport_stats.rate_limit_remaining = int(remaining)
+        transport_stats.rate_limit_reset = int(reset)
+
+
+def throttle():
+    # Spread the remaining budget evenly over the rest of the window instead of
+    # running into a hard 403 halfway through a batch.
+    remaining = transport_stats.rate_limit_remaining
+    reset = transport_stats.rate_limit_reset
+    if remaining is None or reset is None or remaining >= RATE_LIMIT_RESERVE:
+        return
+    window = reset - time.time()
+    if window <= 0:
+        return
+    # Past the cap, the request goes ahead and its 403 is raised by PyGithub.
+    wait(min(window if remaining <= 0 else window / (remaining + 1), MAX_RATE_LIMIT_WAIT_SECONDS))
+
+
+def secondary_rate_limit_delay(response, attempt):
+    if response.status_code not in (403, 429):
+        return None
+    retry_after = response.headers.get('Retry-After')
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    if response.headers.get('X-RateLimit-Remaining') == '0':
+        reset = response.headers.get('X-RateLimit-Reset')
+        if reset is not None:
+            return max(0.0, int(reset) - time.time()) + 1
+    if response.status_code == 429 or 'secondary rate limit' in (response.text or '').lower():
+        return min(MAX_BACKOFF_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt) * (1 + random.random() / 4)
+    return None
+
+
+def wait(seconds):
+    if seconds <= 0:
+        return
+    transport_stats.add('wait_seconds', seconds)
+    time.sleep(seconds)
+
+
+def install_github_transport():
+    Requester.injectConnectionClasses(HTTPCachingConnection, CachingConnection)
+
+
+def log_transport_stats():
+    if transport_stats.requests:
+        logging.debug(str(transport_stats))
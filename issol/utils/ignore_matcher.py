@@ -0,0 +1,205 @@
+import os
+import re
+from .ignore_patterns import IGNORE_PATTERNS
+
+GITIGNORE_FILE = '.gitignore'
+
+
+def _translate_pattern(pattern):
+    # Translate a single gitignore glob (already stripped of '!' and a trailing '/')
+    # into a regex fragment matched against a '/'-separated path relative to the
+    # directory that owns the pattern.
+    anchored = '/' in pattern.rstrip('/')
+    if pattern.startswith('/'):
+        pattern = pattern[1:]
+
+    regex = ''
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern[i:i + 2] == '**':
+                at_start = i == 0 or pattern[i - 1] == '/'
+                at_end = i + 2 == n or pattern[i + 2] == '/'
+                if at_start and at_end:
+                    if i + 2 == n:
+                        regex += '.*'
+                        i += 2
+                    else:
+                        regex += '(?:.*/)?'
+                        i += 3
+                    continue
+            regex += '[^/]*'
+        elif c == '?':
+            regex += '[^/]'
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 1
+            if j >= n:
+                regex += re.escape(c)
+            else:
+                body = pattern[i + 1:j].replace('\\', '\\\\')
+                if body[0] in '!^':
+                    body = '^' + body[1:]
+                regex += f'[{body}]'
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            regex += re.escape(pattern[i])
+        else:
+            regex += re.escape(c)
+        i += 1
+
+    if not anchored:
+        regex = '(?:.*/)?' + regex
+    return regex
+
+
+def _parse_line(line):
+    line = line.rstrip('\n').rstrip('\r')
+    if not line or line.startswith('#'):
+        return None
+    if not line.endswith('\\ '):
+        line = line.rstrip()
+    if not line:
+        return None
+
+    negate = False
+    if line.startswith('!'):
+        negate = True
+        line = line[1:]
+    elif line.startswith('\\!') or line.startswith('\\#'):
+        line = line[1:]
+
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+    return _translate_pattern(line), negate, dir_only
+
+
+class _RuleSet:
+    # The rules of one ignore source (built-in patterns or a single .gitignore).
+    # Consecutive rules of the same polarity are folded into one alternation so a
+    # path is decided by a handful of regex calls rather than one per pattern.
+    def __init__(self, base, lines):
+        self.base = base
+        self.runs = []
+        for rule in filter(None, map(_parse_line, lines)):
+            regex, negate, dir_only = rule
+            if not self.runs or self.runs[-1][0] != negate:
+                self.runs.append((negate, [], []))
+            self.runs[-1][2 if dir_only else 1].append(regex)
+        self.runs = [
+            (negate, self._compile(any_paths), self._compile(any_paths + dir_paths))
+            for negate, any_paths, dir_paths in self.runs
+        ]
+        self.runs.reverse()
+
+    @staticmethod
+    def _compile(fragments):
+        if not fragments:
+            return None
+        return re.compile('(?:' + '|'.join(fragments) + r')\Z', re.DOTALL)
+
+    def match(self, rel_path, is_dir):
+        # Returns True (ignored), False (re-included) or None (no rule matched).
+        for negate, file_regex, dir_regex in self.runs:
+            regex = dir_regex if is_dir else file_regex
+            if regex is not None and regex.match(rel_path):
+                return not negate
+        return None
+
+    def __len__(self):
+        return len(self.runs)
+
+
+class IgnoreMatcher:
+    """Gitignore-style path matcher compiled once per scan.
+
+    Combines the built-in IGNORE_PATTERNS with the root and nested .gitignore
+    files and caches the decision for every directory, so checking a path costs
+    roughly one regex evaluation per path component.
+    """
+
+    def __init__(self, root='.', patterns=None, read_gitignore=True):
+        self.root = root
+        self.read_gitignore = read_gitignore
+        base_patterns = IGNORE_PATTERNS if patterns is None else patterns
+        self._builtin = _RuleSet('', base_patterns)
+        self._chains = {}
+        self._dir_cache = {}
+
+    def _normalize(self, path):
+        path = os.path.normpath(path)
+        if os.path.isabs(path):
+            path = os.path.relpath(path, os.path.abspath(self.root))
+        path = path.replace(os.sep, '/')
+        return '' if path == '.' else path
+
+    def _load_gitignore(self, directory):
+        if not self.read_gitignore:
+            return None
+        gitignore_path = os.path.join(self.root, directory, GITIGNORE_FILE)
+        try:
+            with open(gitignore_path, 'r', encoding='utf-8', errors='replace') as f:
+                ruleset = _RuleSet(directory, f.readlines())
+        except OSError:
+            return None
+        return ruleset if len(ruleset) else None
+
+    def _chain(self, directory):
+        # Rule sets that apply to entries of `directory`, ordered by increasing precedence.
+        chain = self._chains.get(directory)
+        if chain is None:
+            if directory:
+                parent = directory.rpartition('/')[0]
+                chain = self._chain(parent)
+            else:
+                chain = [self._builtin]
+            own = self._load_gitignore(directory)
+            if own is not None:
+                chain = chain + [own]
+            self._chains[directory] = chain
+        return chain
+
+    def _match(self, path, is_dir):
+        directory = path.rpartition('/')[0]
+        for ruleset in reversed(self._chain(directory)):
+            rel_path = path[len(ruleset.base) + 1:] if ruleset.base else path
+            result = ruleset.match(rel_path, is_dir)
+            if result is not None:
+                return result
+        return False
+
+    def _is_dir_ignored(self, directory):
+        if not directory:
+            return False
+        ignored = self._dir_cache.get(directory)
+        if ignored is None:
+            parent = directory.rpartition('/')[0]
+            # Git never re-includes entries below an excluded directory.
+            ignored = self._is_dir_ignored(parent) or self._match(directory, True)
+            self._dir_cache[directory] = ignored
+        return ignored
+
+    def is_ignored(self, path, is_dir=False):
+        path = self._normalize(path)
+        if not path or path.startswith('../'):
+            return False
+        if is_dir:
+            return self._is_dir_ignored(path)
+        if self._is_dir_ignored(path.rpartition('/')[0]):
+            return True
+        return self._match(path, False)
+
+    def gitignore_files(self):
+        return sorted({ruleset.base or '.' for chain in self._chains.values() for ruleset in chain[1:]})
+
+    def __repr__(self):
+        return f"IgnoreMatcher(root={self.root!r}, gitignore_files={self.gitignore_files()})"
@@ -133,5 +133,8 @@ IGNORE_PATTERNS = [
     ".tern-port",  # Tern
 
     # Microsoft Office temporary files
-    "~$*"
+    "~$*",
+
+    # issol's own caches and generated context (tech_stack.md is sent separately)
+    ".codebase_context/",
 ]
\ No newline at end of file
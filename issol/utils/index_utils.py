@@ -0,0 +1,301 @@
+import os
+import re
+import ast
+import time
+import logging
+from .config_utils import CODEBASE_CACHE_DIR
+from .manifest_utils import content_hash
+from .content_utils import content_classifier, is_omitted
+from .trace_utils import tracer
+
+INDEX_FILE = os.path.join(CODEBASE_CACHE_DIR, 'index.sqlite')
+INDEX_SCHEMA_VERSION = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    lines INTEGER
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS file_fts USING fts5(
+    path UNINDEXED, content, tokenize="unicode61 tokenchars '_'"
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    start_line INTEGER NOT NULL,
+    end_line INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols(name);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols(path);
+"""
+
+# Best-effort definitions for languages without a parser in the standard library.
+SYMBOL_PATTERNS = {
+    ('.js', '.jsx', '.ts', '.tsx', '.mjs', '.cjs'): [
+        ('function', re.compile(r'^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)')),
+        ('class', re.compile(r'^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([A-Za-z_$][\w$]*)')),
+        ('function', re.compile(r'^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s*)?(?:function|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)')),
+    ],
+    ('.go',): [
+        ('function', re.compile(r'^func\s+(?:\([^)]*\)\s*)?([A-Za-z_]\w*)')),
+        ('class', re.compile(r'^type\s+([A-Za-z_]\w*)\s+(?:struct|interface)')),
+    ],
+    ('.rs',): [
+        ('function', re.compile(r'^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?fn\s+([A-Za-z_]\w*)')),
+        ('class', re.compile(r'^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait)\s+([A-Za-z_]\w*)')),
+    ],
+    ('.rb',): [
+        ('function', re.compile(r'^\s*def\s+(?:self\.)?([A-Za-z_]\w*[?!]?)')),
+        ('class', re.compile(r'^\s*(?:class|module)\s+([A-Z]\w*)')),
+    ],
+    ('.java', '.kt', '.cs', '.scala'): [
+        ('class', re.compile(r'^\s*(?:(?:public|private|protected|internal|abstract|final|static|sealed|data|open)\s+)*(?:class|interface|enum|object|record)\s+([A-Za-z_]\w*)')),
+        ('function', re.compile(r'^\s*(?:(?:public|private|protected|internal|static|final|abstract|override|suspend|async)\s+)+[\w<>\[\],\s]*?\b([A-Za-z_]\w*)\s*\(')),
+        ('function', re.compile(r'^\s*fun\s+(?:<[^>]*>\s*)?(?:[\w.]+\.)?([A-Za-z_]\w*)\s*\(')),
+    ],
+}
+
+
+def count_lines(content):
+    return content.count('\n') + (1 if content and not content.endswith('\n') else 0)
+
+
+def _python_symbols(content):
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+    symbols = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            kind = 'class'
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            kind = 'function'
+        else:
+            continue
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        symbols.append((node.name, kind, start, getattr(node, 'end_lineno', None) or node.lineno))
+    return symbols
+
+
+def extract_symbols(file_path, content):
+    # Returns (name, kind, start_line, end_line) tuples for classes and functions.
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == '.py':
+        symbols = _python_symbols(content)
+        if symbols is not None:
+            return symbols
+    for extensions, patterns in SYMBOL_PATTERNS.items():
+        if ext in extensions:
+            break
+    else:
+        return []
+    symbols = []
+    for line_number, line in enumerate(content.splitlines(), 1):
+        for kind, pattern in patterns:
+            match = pattern.match(line)
+            if match:
+                symbols.append((match.group(1), kind, line_number, line_number))
+                break
+    return symbols
+
+
+class CodebaseIndex:
+    """SQLite index of the scanned codebase.
+
+    Holds per-file metadata, an FTS5 table over file contents and a symbol
+    table with class/function spans. It is built by `issol -c` and updated
+    incrementally: only files whose content hash changed are re-indexed.
+    """
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        import sqlite3  # Not at module level: compaction needs the symbol patterns, not SQLite.
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, INDEX_SCHEMA_VERSION):
+            self.conn.close()
+            os.remove(path)
+            self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f'PRAGMA user_version = {INDEX_SCHEMA_VERSION}')
+
+    @classmethod
+    def open_existing(cls, path=INDEX_FILE):
+        return cls(path) if os.path.exists(path) else None
+
+    def close(self):
+        self.conn.close()
+
+    def _remove(self, file_path):
+        self.conn.execute('DELETE FROM files WHERE path = ?', (file_path,))
+        self.conn.execute('DELETE FROM file_fts WHERE path = ?', (file_path,))
+        self.conn.execute('DELETE FROM symbols WHERE path = ?', (file_path,))
+
+    def _add(self, file_path, content, digest, stat_result):
+        # Stubbed files are counted from disk, as `issol -s` does without an index.
+        from .codebase_utils import count_file_lines
+        lines = count_file_lines(file_path) if is_omitted(content) else count_lines(content)
+        self.conn.execute(
+            'INSERT INTO files (path, mtime, size, hash, ext, lines) VALUES (?, ?, ?, ?, ?, ?)',
+            (file_path, stat_result.st_mtime_ns, stat_result.st_size, digest,
+             os.path.splitext(file_path)[1], lines))
+        self.conn.execute('INSERT INTO file_fts (path, content) VALUES (?, ?)', (file_path, content))
+        self.conn.executemany(
+            'INSERT INTO symbols (name, kind, path, start_line, end_line) VALUES (?, ?, ?, ?, ?)',
+            [(name, kind, file_path, start, end) for name, kind, start, end in extract_symbols(file_path, content)])
+
+    def update(self, files, hashes=None):
+        # Sync the index with a full list of (path, content) pairs.
+        start = time.perf_counter()
+        hashes = hashes or {}
+        existing = dict(self.conn.execute('SELECT path, hash FROM files'))
+        changed = 0
+        with self.conn:
+            for file_path, content in files:
+                digest = hashes.get(file_path) or content_hash(content)
+                if existing.pop(file_path, None) == digest:
+                    continue
+                try:
+                    stat_result = os.stat(file_path)
+                except OSError:
+                    continue
+                self._remove(file_path)
+                self._add(file_path, content, digest, stat_result)
+                changed += 1
+            for file_path in existing:
+                self._remove(file_path)
+        print(f"Index updated: {changed} files re-indexed, {len(existing)} removed "
+              f"({time.perf_counter() - start:.2f}s)")
+        return changed
+
+    def refresh(self, read_file):
+        # Brings the index in line with the working tree: one ignore-aware walk
+        # (the stat calls a per-row check would make anyway) finds added,
+        # deleted and changed files; only those are read and re-indexed.
+        from .snapshot_utils import get_codebase_snapshot
+        indexed = {file_path: (mtime, size) for file_path, mtime, size in
+                   self.conn.execute('SELECT path, mtime, size FROM files')}
+        added = changed = 0
+        with self.conn:
+            for entry in get_codebase_snapshot().files:
+                known = indexed.pop(entry.path, None)
+                if known == (entry.stat.st_mtime_ns, entry.size):
+                    continue
+                content = read_file(entry.path, entry.size)
+                self._remove(entry.path)
+                self._add(entry.path, content, content_hash(content), entry.stat)
+                if known is None:
+                    added += 1
+                else:
+                    changed += 1
+            for file_path in indexed:
+                self._remove(file_path)
+        if added or changed or indexed:
+            logging.debug(f"Index refreshed: {added} added, {changed} changed, {len(indexed)} removed")
+        return added + changed + len(indexed)
+
+    def load_files(self):
+        return self.conn.execute(
+            'SELECT f.path, t.content FROM files f JOIN file_fts t ON t.path = f.path ORDER BY f.path').fetchall()
+
+    def find_definitions(self, name):
+        return self.conn.execute(
+            'SELECT name, kind, path, start_line, end_line FROM symbols WHERE name = ? ORDER BY path, start_line',
+            (name,)).fetchall()
+
+    def find_references(self, name):
+        # FTS narrows the candidates to files containing the token; line numbers
+        # are then resolved only within those files.
+        query = '"' + name.replace('"', '""') + '"'
+        token = re.compile(r'(?<![\w])' + re.escape(name) + r'(?![\w])')
+        references = []
+        for file_path, content in self.conn.execute(
+                'SELECT path, content FROM file_fts WHERE file_fts MATCH ? ORDER BY path', (query,)):
+            for line_number, line in enumerate(content.splitlines(), 1):
+                if token.search(line):
+                    references.append((file_path, line_number, line.strip()))
+        return references
+
+    def search(self, query, limit=20):
+        return self.conn.execute(
+            'SELECT path, bm25(file_fts) AS rank FROM file_fts WHERE file_fts MATCH ? ORDER BY rank LIMIT ?',
+            (query, limit)).fetchall()
+
+    def file_stats(self):
+        return self.conn.execute('SELECT path, ext, lines, size FROM files ORDER BY path').fetchall()
+
+
+def update_codebase_index(branch, use_cache=True, workers=None):
+    from .github_utils import scan_codebase_files, DEFAULT_SCAN_WORKERS
+    from .manifest_utils import CodebaseManifest
+
+    # The index mirrors the files on disk (it is refreshed from their mtimes),
+    # whichever branch is requested.
+    manifest = CodebaseManifest.load() if use_cache else CodebaseManifest()
+    files = scan_codebase_files(branch, use_cache, workers or DEFAULT_SCAN_WORKERS, manifest=manifest,
+                                working_tree=True)
+    index = CodebaseIndex()
+    try:
+        index.update(files, {file_path: manifest.hash_for(file_path) for file_path, _ in files})
+    finally:
+        index.close()
+    return files
+
+
+def load_codebase_files(branch, use_cache=True, workers=None):
+    # Prefer the index built by `issol -c`; fall back to scanning the tree. A
+    # branch that is not checked out is always read from git objects.
+    from .github_utils import scan_codebase_files, DEFAULT_SCAN_WORKERS
+    from .git_object_utils import branch_commit
+
+    working_tree = branch_commit(branch) is None
+    index = CodebaseIndex.open_existing() if use_cache and working_tree else None
+    if index is None:
+        return scan_codebase_files(branch, use_cache, workers or DEFAULT_SCAN_WORKERS, working_tree=working_tree)
+    with tracer.span('load_codebase_index') as span:
+        try:
+            print(f"Loading codebase from index {index.path} (branch: {branch})")
+            index.refresh(content_classifier.read)
+            files = index.load_files()
+        finally:
+            index.close()
+        span.set(files_loaded=len(files), chars_loaded=sum(len(content) for _, content in files))
+    return files
+
+
+def print_symbol_lookup(name, refresh=True):
+    # The refresh walks and stats the whole tree, which dominates on a large
+    # repository; refresh=False answers from the index as last built.
+    index = CodebaseIndex.open_existing()
+    if index is None:
+        print("No codebase index found. Run `issol -c` first.")
+        return
+    try:
+        start = time.perf_counter()
+        if refresh:
+            index.refresh(content_classifier.read)
+        refreshed = time.perf_counter()
+        definitions = index.find_definitions(name)
+        references = index.find_references(name)
+        elapsed = time.perf_counter() - start
+    finally:
+        index.close()
+    print(f"Definitions of {name}:")
+    for _, kind, file_path, start_line, end_line in definitions:
+        print(f"  {file_path}:{start_line}-{end_line} ({kind})")
+    if not definitions:
+        print("  (none)")
+    print(f"References to {name}:")
+    for file_path, line_number, line in references:
+        print(f"  {file_path}:{line_number}: {line}")
+    if not references:
+        print("  (none)")
+    logging.debug(f"Symbol lookup took {elapsed * 1000:.1f} ms"
+                  + (f", {(refreshed - start) * 1000:.1f} ms of it refreshing the index" if refresh else ""))
@@ -0,0 +1,206 @@
+import logging
+from .trace_utils import tracer
+
+ISSUE_PAGE_SIZE = 100
+# GitHub's search returns at most this many results for one query.
+SEARCH_RESULT_LIMIT = 1000
+MAX_LABELS = 20
+
+# Only the fields issol uses. The body is fetched only when it will be read.
+ISSUE_FIELDS = """
+    number
+    title
+    url
+    updatedAt
+    body @include(if: $withBody)
+    labels(first: %d) { nodes { name } }
+""" % MAX_LABELS
+
+SEARCH_QUERY = """
+query($query: String!, $first: Int!, $after: String, $withBody: Boolean!) {
+  search(query: $query, type: ISSUE, first: $first, after: $after) {
+    issueCount
+    pageInfo { hasNextPage endCursor }
+    nodes { ... on Issue { %s } }
+  }
+}""" % ISSUE_FIELDS
+
+ISSUES_QUERY = """
+query($owner: String!, $name: String!, $first: Int!, $after: String, $labels: [String!], $since: DateTime,
+      $withBody: Boolean!) {
+  repository(owner: $owner, name: $name) {
+    issues(states: OPEN, first: $first, after: $after, labels: $labels, filterBy: {since: $since},
+           orderBy: {field: CREATED_AT, direction: ASC}) {
+      totalCount
+      pageInfo { hasNextPage endCursor }
+      nodes { %s }
+    }
+  }
+}""" % ISSUE_FIELDS
+
+
+class IssueSummary:
+    """The fields of an issue that listing and resolving need.
+
+    process_issue and create_pull_request only read number, title and body,
+    so a summary fetched in bulk can stand in for a PyGithub Issue.
+    """
+
+    __slots__ = ('number', 'title', 'body', 'url', 'updated_at', 'labels')
+
+    def __init__(self, number, title, body=None, url=None, updated_at=None, labels=()):
+        self.number = number
+        self.title = title
+        self.body = body
+        self.url = url
+        self.updated_at = updated_at
+        self.labels = list(labels)
+
+    @classmethod
+    def from_node(cls, node):
+        return cls(node['number'], node['title'], node.get('body'), node.get('url'), node.get('updatedAt'),
+                   [label['name'] for label in (node.get('labels') or {}).get('nodes', [])])
+
+    @classmethod
+    def from_rest(cls, issue, with_body):
+        updated_at = issue.updated_at.strftime('%Y-%m-%dT%H:%M:%SZ') if issue.updated_at else None
+        return cls(issue.number, issue.title, issue.body if with_body else None, issue.html_url, updated_at,
+                   [label.name for label in issue.labels])
+
+    def to_dict(self):
+        data = {'number': self.number, 'title': self.title, 'url': self.url, 'updated_at': self.updated_at,
+                'labels': self.labels}
+        if self.body is not None:
+            data['body'] = self.body
+        return data
+
+
+def graphql(repo, query, variables):
+    # Returns (data, errors). Unlike Requester.graphql_query, partial results
+    # (e.g. one missing issue among many) are not turned into an exception.
+    requester = repo.requester
+    with tracer.span('graphql'):
+        _, response = requester.requestJsonAndCheck('POST', requester.graphql_url,
+                                                     input={'query': query, 'variables': variables})
+    return response.get('data') or {}, response.get('errors') or []
+
+
+def _quote(value):
+    return '"' + value.replace('"', '') + '"'
+
+
+def search_query(full_name, marker=None, labels=(), since=None):
+    terms = [f"repo:{full_name}", 'is:issue', 'is:open']
+    if marker:
+        terms.append(f"in:title {_quote(marker)}")
+    terms.extend(f"label:{_quote(label)}" for label in labels)
+    if since:
+        terms.append(f"updated:>={since}")
+    terms.append('sort:created-asc')
+    return ' '.join(terms)
+
+
+def _paginate(repo, query, variables, connection):
+    # Yields the pages of one GraphQL connection, and its total count first.
+    after = None
+    while True:
+        data, errors = graphql(repo, query, dict(variables, first=ISSUE_PAGE_SIZE, after=after))
+        if errors:
+            raise RuntimeError('; '.join(error.get('message', str(error)) for error in errors))
+        page = connection(data)
+        if after is None:
+            yield page.get('issueCount', page.get('totalCount'))
+        yield page['nodes']
+        if not page['pageInfo']['hasNextPage']:
+            return
+        after = page['pageInfo']['endCursor']
+
+
+def _iter_graphql(repo, marker, labels, since, with_body):
+    full_name = repo.full_name
+    if marker:
+        pages = _paginate(repo, SEARCH_QUERY, {'query': search_query(full_name, marker, labels, since),
+                                               'withBody': with_body}, lambda data: data['search'])
+        total = next(pages)
+        if total <= SEARCH_RESULT_LIMIT:
+            logging.debug(f"Search matched {total} open issues")
+            for nodes in pages:
+                yield from (IssueSummary.from_node(node) for node in nodes if node)
+            return
+        # Too many matches for search to page through: list them all instead.
+        logging.debug(f"Search matched {total} issues, over the search limit; listing open issues instead")
+        pages.close()
+    owner, name = full_name.split('/')
+    pages = _paginate(repo, ISSUES_QUERY, {'owner': owner, 'name': name, 'labels': list(labels) or None,
+                                           'since': since, 'withBody': with_body},
+                      lambda data: data['repository']['issues'])
+    logging.debug(f"Listing {next(pages)} open issues")
+    for nodes in pages:
+        yield from (IssueSummary.from_node(node) for node in nodes)
+
+
+def _iter_rest(repo, labels, since, with_body):
+    kwargs = {'state': 'open'}
+    if labels:
+        kwargs['labels'] = list(labels)
+    if since:
+        from datetime import datetime
+        kwargs['since'] = datetime.fromisoformat(since)
+    for issue in repo.get_issues(**kwargs):
+        # The REST issues endpoint lists pull requests too. Reading
+        # issue.pull_request would fetch every plain issue again to complete it.
+        if '/pull/' not in issue.html_url:
+            yield IssueSummary.from_rest(issue, with_body)
+
+
+def iter_open_issues(repo, marker=None, labels=(), since=None, with_body=False):
+    """Yields the open issues of `repo` as IssueSummary objects, page by page.
+
+    With a marker, GitHub's issue search filters titles and labels on the
+    server, so unmarked issues are never transferred; search matches words
+    rather than the exact phrase, so titles are checked again here. Without
+    one, or when search would match more issues than it can return, the
+    repository's issues are listed in pages of 100. `since` is an ISO 8601
+    timestamp with a UTC offset. Without the GraphQL API, REST is used.
+    """
+    count = 0
+    try:
+        for issue in _iter_graphql(repo, marker, labels, since, with_body):
+            count += 1
+            if not marker or marker in issue.title:
+                yield issue
+        return
+    except Exception as e:
+        if count:
+            raise
+        logging.warning(f"Could not list issues with GraphQL ({str(e)}), falling back to the REST API")
+    for issue in _iter_rest(repo, labels, since, with_body):
+        if not marker or marker in issue.title:
+            yield issue
+
+
+def fetch_issues(repo, numbers):
+    """Fetches several issues with one GraphQL request per 100 issues.
+
+    Returns {number: IssueSummary}; issues that do not exist are left out.
+    Returns None if the GraphQL API is unavailable.
+    """
+    owner, name = repo.full_name.split('/')
+    issues = {}
+    numbers = list(dict.fromkeys(numbers))
+    for start in range(0, len(numbers), ISSUE_PAGE_SIZE):
+        batch = numbers[start:start + ISSUE_PAGE_SIZE]
+        aliases = '\n'.join(f"issue_{number}: issue(number: {int(number)}) {{ {ISSUE_FIELDS} }}" for number in batch)
+        query = ("query($owner: String!, $name: String!, $withBody: Boolean!) "
+                 f"{{ repository(owner: $owner, name: $name) {{ {aliases} }} }}")
+        try:
+            data, errors = graphql(repo, query, {'owner': owner, 'name': name, 'withBody': True})
+        except Exception as e:
+            logging.warning(f"Could not fetch issues with GraphQL ({str(e)}), fetching them one by one")
+            return None
+        for error in errors:
+            logging.debug(f"GraphQL: {error.get('message', error)}")
+        for node in (data.get('repository') or {}).values():
+            if node:
+                issues[node['number']] = IssueSummary.from_node(node)
+    return issues
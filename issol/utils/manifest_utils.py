@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from .config_utils import CODEBASE_CACHE_DIR
+from .content_utils import content_classifier
+
+MANIFEST_FILE = os.path.join(CODEBASE_CACHE_DIR, 'manifest.json')
+CONTENTS_FILE_NAME = 'contents.sqlite'
+MANIFEST_VERSION = 5
+
+# Files modified this recently may still change within the same mtime tick,
+# so they are re-read on the next scan instead of being trusted from the manifest.
+RACY_WINDOW_NS = 2 * 10**9
+# Blobs of branches that have not been read for this long are forgotten on prune.
+BLOB_TTL = 14 * 24 * 3600
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8', errors='surrogateescape')).hexdigest()
+
+
+def write_json_atomic(path, data):
+    # A uniquely named temporary file, so concurrent writers (a scan and the
+    # --serve watcher, or two processes) never write into each other's file.
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(path) or '.',
+                                     prefix=os.path.basename(path) + '.', suffix='.tmp', delete=False) as f:
+        tmp_path = f.name
+        try:
+            json.dump(data, f)
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, path)
+
+
+class CodebaseManifest:
+    """On-disk record of (mtime, size, content hash) per scanned path.
+
+    manifest.json holds only those records. File contents are stored once
+    per hash in a SQLite table (contents.sqlite) and read by hash only for
+    files served from the cache, so a warm scan costs one stat per file, one
+    small JSON read and one primary-key lookup per file; saving rewrites the
+    records and commits the contents that were added, never the whole text.
+    Derived data (token counts, ...) can be attached per hash with
+    get_derived/set_derived and survives as long as the content does.
+
+    Files read from git objects are recorded by blob SHA instead of path, so a
+    blob shared between branches (or with the working tree) is read once and
+    shares its content and derived data.
+    """
+
+    def __init__(self, path=MANIFEST_FILE, persistent=False):
+        self.path = path
+        self.contents_path = os.path.join(os.path.dirname(path), CONTENTS_FILE_NAME)
+        # Only a loaded manifest writes contents to disk; otherwise (--no-cache) they stay in memory.
+        self.persistent = persistent
+        # Cached contents depend on how files are classified (size cap, stubs).
+        self.settings = {'max_file_size': content_classifier.max_file_size}
+        self.entries = {}
+        self.derived = {}
+        self.blobs = {}
+        self.seen = set()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        # Hashes that lost a reference; their contents are deleted on prune if nothing else uses them.
+        self._released = set()
+        self._memory = {}
+        self._db = None
+        self._discard_contents = False
+        self._db_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=MANIFEST_FILE):
+        manifest = cls(path, persistent=True)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            manifest._discard_contents = True
+            return manifest
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable manifest {path}: {str(e)}")
+            manifest._discard_contents = True
+            return manifest
+        if data.get('version') != MANIFEST_VERSION or data.get('settings') != manifest.settings:
+            logging.debug(f"Manifest version or content settings changed in {path}, starting fresh")
+            manifest._discard_contents = True
+            return manifest
+        manifest.entries = data.get('entries', {})
+        manifest.derived = data.get('derived', {})
+        manifest.blobs = data.get('blobs', {})
+        return manifest
+
+    def _contents(self):
+        # Opened on first use and shared by the scan's worker threads under _db_lock.
+        if self._db is None:
+            import sqlite3
+            os.makedirs(os.path.dirname(self.contents_path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(self.contents_path, timeout=30, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS contents (hash TEXT PRIMARY KEY, content BLOB NOT NULL)')
+            if self._discard_contents:
+                # Nothing refers to contents stored for an older or missing manifest.
+                self._db.execute('DELETE FROM contents')
+        return self._db
+
+    def save(self):
+        if not self.dirty:
+            return
+        if self._db is not None:
+            # Contents first: the records written next may refer to them.
+            with self._db_lock:
+                self._db.commit()
+        write_json_atomic(self.path, {
+            'version': MANIFEST_VERSION,
+            'settings': self.settings,
+            'entries': self.entries,
+            'derived': self.derived,
+            'blobs': self.blobs,
+        })
+        self.dirty = False
+
+    def begin_scan(self):
+        # Reset per-scan bookkeeping when one manifest is kept in memory across scans.
+        self.seen = set()
+        self.hits = 0
+        self.misses = 0
+
+    def load_content(self, digest):
+        # None when the stored content is gone (e.g. pruned by another process).
+        if not self.persistent:
+            return self._memory.get(digest)
+        with self._db_lock:
+            row = self._contents().execute('SELECT content FROM contents WHERE hash = ?', (digest,)).fetchone()
+        return row[0].decode('utf-8', errors='surrogateescape') if row else None
+
+    def store_content(self, content):
+        # Safe to call from worker threads; committed by save().
+        digest = content_hash(content)
+        if not self.persistent:
+            self._memory[digest] = content
+            return digest
+        data = content.encode('utf-8', errors='surrogateescape')
+        with self._db_lock:
+            self._contents().execute('INSERT OR IGNORE INTO contents (hash, content) VALUES (?, ?)', (digest, data))
+        return digest
+
+    @staticmethod
+    def is_racy(stat_result):
+        return time.time_ns() - stat_result.st_mtime_ns < RACY_WINDOW_NS
+
+    def lookup(self, file_path, stat_result):
+        # Returns the content hash when the file is unchanged; load it with load_content.
+        self.seen.add(file_path)
+        entry = self.entries.get(file_path)
+        if (entry is not None
+                and entry['mtime'] == stat_result.st_mtime_ns
+                and entry['size'] == stat_result.st_size):
+            return entry['hash']
+        return None
+
+    def record(self, file_path, stat_result, digest):
+        # `digest` is None for a racily modified file, which is not recorded.
+        old = self.entries.pop(file_path, None)
+        if old is not None and old['hash'] != digest:
+            self._released.add(old['hash'])
+        self.dirty = True
+        if digest is None:
+            return
+        self.entries[file_path] = {
+            'mtime': stat_result.st_mtime_ns,
+            'size': stat_result.st_size,
+            'hash': digest,
+        }
+
+    def lookup_blob(self, blob_sha):
+        entry = self.blobs.get(blob_sha)
+        content = self.load_content(entry['hash']) if entry is not None else None
+        if content is not None:
+            self.hits += 1
+            now = int(time.time())
+            # Only refresh the timestamp daily, so a warm scan leaves the manifest clean.
+            if now - entry['used'] > 24 * 3600:
+                entry['used'] = now
+                self.dirty = True
+            return content
+        self.misses += 1
+        return None
+
+    def record_blob(self, blob_sha, content):
+        digest = self.store_content(content)
+        self.blobs[blob_sha] = {'hash': digest, 'used': int(time.time())}
+        self.dirty = True
+        return digest
+
+    def hash_for(self, file_path):
+        entry = self.entries.get(file_path)
+        return entry['hash'] if entry else None
+
+    def get_derived(self, digest, key):
+        return self.derived.get(digest, {}).get(key)
+
+    def set_derived(self, digest, key, value):
+        self.derived.setdefault(digest, {})[key] = value
+        self.dirty = True
+
+    def prune(self, seen_paths=None):
+        # Drop entries for deleted files, blobs not read for BLOB_TTL and any
+        # content no longer referenced.
+        stale = set(self.entries) - set(self.seen if seen_paths is None else seen_paths)
+        for file_path in stale:
+            self._released.add(self.entries.pop(file_path)['hash'])
+        cutoff = time.time() - BLOB_TTL
+        expired = [blob_sha for blob_sha, entry in self.blobs.items() if entry['used'] < cutoff]
+        for blob_sha in expired:
+            self._released.add(self.blobs.pop(blob_sha)['hash'])
+        live = {entry['hash'] for entry in self.entries.values()} | {entry['hash'] for entry in self.blobs.values()}
+        orphans = (self._released | set(self.derived)) - live
+        for digest in orphans:
+            self.derived.pop(digest, None)
+            self._memory.pop(digest, None)
+        if orphans and self.persistent:
+            with self._db_lock:
+                self._contents().executemany('DELETE FROM contents WHERE hash = ?', [(digest,) for digest in orphans])
+        self._released.clear()
+        if stale or expired or orphans:
+            self.dirty = True
+        return len(stale)
+
+
+def invalidate_cache():
+    # Only what a scan produces. The model response cache, the HTTP
+    # validators and tech stack notes stay.
+    from .index_utils import INDEX_FILE
+    from .compaction_utils import SKELETON_CACHE_FILE
+    removed = []
+    contents_path = os.path.join(CODEBASE_CACHE_DIR, CONTENTS_FILE_NAME)
+    for path in (MANIFEST_FILE, contents_path, contents_path + '-wal', contents_path + '-shm',
+                 INDEX_FILE, SKELETON_CACHE_FILE):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        removed.append(os.path.basename(path))
+    if removed:
+        print(f"Removed {', '.join(removed)} from {CODEBASE_CACHE_DIR}")
+    else:
+        print("No scan cache to remove.")
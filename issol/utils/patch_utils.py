@@ -0,0 +1,198 @@
+import re
+import difflib
+
+SEARCH_MARKER = re.compile(r'^\s*<{5,9} ?SEARCH\s*$')
+DIVIDER_MARKER = re.compile(r'^\s*={5,9}\s*$')
+REPLACE_MARKER = re.compile(r'^\s*>{5,9} ?REPLACE\s*$')
+HUNK_HEADER = re.compile(r'^@@ .* @@')
+# A fence the model wrapped around its edits. Inside SEARCH/REPLACE blocks and
+# diff lines (which start with ' ', '+' or '-') fences are file content.
+FENCE = re.compile(r'^```')
+# Minimum similarity for a SEARCH block that matches neither exactly nor up to whitespace.
+FUZZY_THRESHOLD = 0.85
+
+
+class Hunk:
+    def __init__(self, search, replace):
+        self.search = search
+        self.replace = replace
+        self.match = None
+
+    def describe(self):
+        first = next((line.strip() for line in self.search if line.strip()), '<append>')
+        return f"{len(self.search)} line(s) at '{first[:60]}'"
+
+
+class PatchResult:
+    def __init__(self, content, applied, failed):
+        self.content = content
+        self.applied = applied
+        self.failed = failed
+
+    def summary(self):
+        fuzzy = sum(1 for hunk in self.applied if hunk.match != 'exact')
+        text = f"applied {len(self.applied)}/{len(self.applied) + len(self.failed)} edit(s)"
+        return text + (f" ({fuzzy} by fuzzy match)" if fuzzy else '')
+
+
+def is_patch(raw_content):
+    lines = raw_content.split('\n')
+    return any(SEARCH_MARKER.match(line) for line in lines) or any(HUNK_HEADER.match(line) for line in lines)
+
+
+def parse_search_replace(lines):
+    hunks = []
+    search = replace = None
+    for line in lines:
+        if SEARCH_MARKER.match(line):
+            search, replace = [], None
+        elif search is not None and replace is None and DIVIDER_MARKER.match(line):
+            replace = []
+        elif replace is not None and REPLACE_MARKER.match(line):
+            hunks.append(Hunk(search, replace))
+            search = replace = None
+        elif replace is not None:
+            replace.append(line)
+        elif search is not None:
+            search.append(line)
+    return hunks
+
+
+def parse_unified_diff(lines):
+    hunks = []
+    current = None
+    for line in lines:
+        if HUNK_HEADER.match(line):
+            current = Hunk([], [])
+            hunks.append(current)
+        elif FENCE.match(line):
+            # The end of a fenced diff block, not a context line missing its space.
+            current = None
+        elif current is None or line.startswith(('--- ', '+++ ', '\\')):
+            continue
+        elif line.startswith('-'):
+            current.search.append(line[1:])
+        elif line.startswith('+'):
+            current.replace.append(line[1:])
+        else:
+            # Context line; models sometimes drop the leading space.
+            line = line[1:] if line.startswith(' ') else line
+            current.search.append(line)
+            current.replace.append(line)
+    for hunk in hunks:
+        # Trailing blank context left over from the section break.
+        while hunk.search and hunk.replace and not hunk.search[-1].strip() and not hunk.replace[-1].strip():
+            hunk.search.pop()
+            hunk.replace.pop()
+    return hunks
+
+
+def parse_edits(raw_content):
+    # Lines outside SEARCH/REPLACE blocks and diff hunks, wrapping fences
+    # included, are ignored by the parsers, so nothing is stripped here.
+    lines = raw_content.split('\n')
+    if any(SEARCH_MARKER.match(line) for line in lines):
+        return parse_search_replace(lines)
+    return parse_unified_diff(lines)
+
+
+def _indent(line):
+    return line[:len(line) - len(line.lstrip())]
+
+
+def find_block(lines, search, start=0):
+    """Locate `search` in `lines`, preferring matches at or after `start`.
+
+    Tries an exact match, then one that ignores indentation and trailing
+    whitespace, then the most similar window above FUZZY_THRESHOLD. Returns
+    (index, kind) or None.
+    """
+    size = len(search)
+    if not size or size > len(lines):
+        return None
+    order = list(range(start, len(lines) - size + 1)) + list(range(0, min(start, len(lines) - size + 1)))
+
+    for i in order:
+        if lines[i:i + size] == search:
+            return i, 'exact'
+
+    stripped = [line.strip() for line in lines]
+    stripped_search = [line.strip() for line in search]
+    for i in order:
+        if stripped[i:i + size] == stripped_search:
+            return i, 'whitespace'
+
+    target = '\n'.join(stripped_search)
+    best = None
+    matcher = difflib.SequenceMatcher(autojunk=False)
+    matcher.set_seq2(target)
+    for i in order:
+        matcher.set_seq1('\n'.join(stripped[i:i + size]))
+        if matcher.real_quick_ratio() < FUZZY_THRESHOLD or matcher.quick_ratio() < FUZZY_THRESHOLD:
+            continue
+        ratio = matcher.ratio()
+        if ratio >= FUZZY_THRESHOLD and (best is None or ratio > best[1]):
+            best = (i, ratio)
+    return (best[0], 'fuzzy') if best else None
+
+
+def _reindent(replace, search, original):
+    # Map each indentation used in the SEARCH block to the indentation of the
+    # line it matched and carry that over to the replacement. Deeper levels
+    # that only appear in the replacement are scaled by the same ratio.
+    mapping = {}
+    for search_line, original_line in zip(search, original):
+        if search_line.strip() and original_line.strip():
+            mapping.setdefault(_indent(search_line), _indent(original_line))
+    if all(have == want for have, want in mapping.items()):
+        return replace
+    ratio = next((len(want) / len(have) for have, want in mapping.items()
+                  if have and have.strip(' ') == '' and want.strip(' ') == ''), None)
+    shifted = []
+    for line in replace:
+        indent = _indent(line)
+        if not line.strip():
+            shifted.append(line)
+        elif indent in mapping:
+            shifted.append(mapping[indent] + line[len(indent):])
+        elif ratio is not None and indent.strip(' ') == '':
+            shifted.append(' ' * round(len(indent) * ratio) + line[len(indent):])
+        else:
+            shifted.append(line)
+    return shifted
+
+
+def apply_edits(original, hunks):
+    """Apply hunks to `original` in order and return a PatchResult.
+
+    A hunk with an empty SEARCH block appends its lines to the end of the file.
+    Hunks that cannot be located are reported in `failed` and skipped.
+    """
+    trailing_newline = original.endswith('\n')
+    lines = original.split('\n') if original else []
+    if trailing_newline:
+        lines.pop()
+    applied, failed = [], []
+    position = 0
+    for hunk in hunks:
+        if not any(line.strip() for line in hunk.search):
+            hunk.match = 'exact'
+            lines.extend(hunk.replace)
+            applied.append(hunk)
+            continue
+        found = find_block(lines, hunk.search, position)
+        if found is None:
+            failed.append(hunk)
+            continue
+        index, hunk.match = found
+        matched = lines[index:index + len(hunk.search)]
+        replacement = hunk.replace if hunk.match == 'exact' else _reindent(hunk.replace, hunk.search, matched)
+        lines[index:index + len(hunk.search)] = replacement
+        position = index + len(replacement)
+        applied.append(hunk)
+    content = '\n'.join(lines) + ('\n' if trailing_newline or not original else '')
+    return PatchResult(content, applied, failed)
+
+
+def apply_patch(original, raw_content):
+    return apply_edits(original, parse_edits(raw_content))
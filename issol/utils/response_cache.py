@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from .config_utils import CODEBASE_CACHE_DIR
+from .manifest_utils import write_json_atomic
+
+RESPONSE_CACHE_DIR = os.path.join(CODEBASE_CACHE_DIR, 'responses')
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+# The directory is trimmed on the first write of a process and then every this many writes.
+EVICT_INTERVAL = 50
+
+
+def response_cache_key(model, temperature, max_tokens, system_prompt, human_prompt):
+    payload = json.dumps([model, temperature, max_tokens, system_prompt, human_prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Content-addressed, size-bounded LRU cache of model responses on disk.
+
+    Each response is stored as one JSON file named after the hash of the
+    request parameters. Hits refresh the file's mtime, and the least recently
+    used files are evicted once the directory grows past `max_bytes`. The
+    directory is listed for that on the first write and every EVICT_INTERVAL
+    writes, not on each one.
+    """
+
+    def __init__(self, directory=RESPONSE_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+        if self.ttl and time.time() - entry.get('created', 0) > self.ttl:
+            self._discard(path)
+            self._count('misses')
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count('hits')
+        return entry['response']
+
+    def put(self, key, response):
+        if not self.enabled:
+            return
+        write_json_atomic(self._path(key), {'created': time.time(), 'response': response})
+        with self._lock:
+            self._puts += 1
+            due = self._puts % EVICT_INTERVAL == 1
+        if due:
+            self.evict()
+
+    def evict(self):
+        with self._lock:
+            try:
+                entries = [e for e in os.scandir(self.directory) if e.name.endswith('.json')]
+            except OSError:
+                return
+            stats = []
+            for entry in entries:
+                try:
+                    stats.append((entry.stat().st_mtime, entry.stat().st_size, entry.path))
+                except OSError:
+                    continue
+            total = sum(size for _, size, _ in stats)
+            for _, size, path in sorted(stats):
+                if total <= self.max_bytes:
+                    break
+                self._discard(path)
+                self.evictions += 1
+                total -= size
+
+    def clear(self):
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            self._discard(entry.path)
+
+    def _discard(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        return f"response cache: {self.hits} hits, {self.misses} misses, {self.evictions} evictions"
+
+
+def log_cache_stats(cache):
+    if cache.hits or cache.misses:
+        logging.info(cache.stats().capitalize())
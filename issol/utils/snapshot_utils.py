@@ -0,0 +1,104 @@
+import os
+import time
+import logging
+import threading
+from .ignore_matcher import IgnoreMatcher
+
+
+class FileEntry:
+    __slots__ = ('path', 'ext', 'stat', '_content')
+
+    def __init__(self, path, stat_result):
+        self.path = path
+        self.ext = os.path.splitext(path)[1]
+        self.stat = stat_result
+        self._content = None
+
+    @property
+    def size(self):
+        return self.stat.st_size
+
+    @property
+    def content(self):
+        # Loaded on first access only; most consumers never need every file's text.
+        if self._content is None:
+            self._content = self.read()
+        return self._content
+
+    def read(self):
+        # Reads the file without keeping the text on the entry.
+        from .github_utils import get_file_content
+        return get_file_content(self.path)
+
+
+class CodebaseSnapshot:
+    """One ignore-aware os.scandir traversal of the working tree.
+
+    Records every non-ignored directory and file (with its stat result) in
+    sorted, top-down order. Scanning, context generation and summarize all
+    read from the same snapshot instead of walking the tree themselves.
+    directory_mtimes holds each directory's mtime from just before it was
+    listed, so a later stat shows whether entries were added or removed.
+    """
+
+    def __init__(self, root='.', ignore_matcher=None):
+        self.root = root
+        self.ignore_matcher = ignore_matcher or IgnoreMatcher(root)
+        self.directories = []
+        self.files = []
+        self.directory_mtimes = {}
+        self.ignored = 0
+        self.elapsed = 0.0
+
+    def build(self):
+        start = time.perf_counter()
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                self.directory_mtimes[directory] = os.stat(directory).st_mtime_ns
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                logging.warning(f"Could not list directory {directory}: {str(e)}")
+                continue
+            subdirs = []
+            files = []
+            for entry in entries:
+                path = os.path.join(directory, entry.name)
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.ignore_matcher.is_ignored(path, is_dir=True):
+                            self.ignored += 1
+                        else:
+                            subdirs.append(path)
+                    elif entry.is_file():
+                        if self.ignore_matcher.is_ignored(path):
+                            self.ignored += 1
+                        else:
+                            files.append(FileEntry(path, entry.stat()))
+                except OSError as e:
+                    logging.warning(f"Could not stat {path}: {str(e)}")
+            self.directories.append((directory, files))
+            self.files.extend(files)
+            stack.extend(reversed(subdirs))
+        self.elapsed = time.perf_counter() - start
+        logging.info(f"Snapshot: {len(self.files)} files in {len(self.directories)} directories "
+                     f"({self.total_bytes() / 1e6:.2f} MB, {self.ignored} ignored entries) in {self.elapsed:.3f}s")
+        return self
+
+    def total_bytes(self):
+        return sum(entry.size for entry in self.files)
+
+
+_snapshots = {}
+_snapshot_lock = threading.Lock()
+
+
+def get_codebase_snapshot(root='.', refresh=False, ignore_matcher=None):
+    # Shared per process so one command walks the tree at most once.
+    with _snapshot_lock:
+        snapshot = _snapshots.get(root)
+        if snapshot is None or refresh:
+            snapshot = _snapshots[root] = CodebaseSnapshot(root, ignore_matcher).build()
+        return snapshot
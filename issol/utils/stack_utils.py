@@ -0,0 +1,488 @@
+import os
+import re
+import ast
+import glob
+import json
+import hashlib
+import logging
+import xml.etree.ElementTree as ElementTree
+from .config_utils import CODEBASE_CACHE_DIR
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+STACK_CACHE_FILE = os.path.join(CODEBASE_CACHE_DIR, 'tech_stack.json')
+# Bump when detection changes, so cached reports are rebuilt.
+DETECTOR_VERSION = 2
+MAX_MANIFESTS = 200
+MAX_LISTED_DEPENDENCIES = 40
+
+LANGUAGES = {
+    '.py': 'Python', '.pyi': 'Python', '.js': 'JavaScript', '.jsx': 'JavaScript', '.mjs': 'JavaScript',
+    '.cjs': 'JavaScript', '.ts': 'TypeScript', '.tsx': 'TypeScript', '.go': 'Go', '.rs': 'Rust',
+    '.java': 'Java', '.kt': 'Kotlin', '.kts': 'Kotlin', '.scala': 'Scala', '.rb': 'Ruby', '.php': 'PHP',
+    '.cs': 'C#', '.fs': 'F#', '.c': 'C', '.h': 'C', '.cc': 'C++', '.cpp': 'C++', '.hpp': 'C++', '.cxx': 'C++',
+    '.m': 'Objective-C', '.swift': 'Swift', '.dart': 'Dart', '.ex': 'Elixir', '.exs': 'Elixir', '.erl': 'Erlang',
+    '.hs': 'Haskell', '.clj': 'Clojure', '.lua': 'Lua', '.r': 'R', '.R': 'R', '.jl': 'Julia', '.pl': 'Perl',
+    '.sh': 'Shell', '.bash': 'Shell', '.ps1': 'PowerShell', '.sql': 'SQL', '.html': 'HTML', '.css': 'CSS',
+    '.scss': 'SCSS', '.sass': 'SCSS', '.less': 'Less', '.vue': 'Vue', '.svelte': 'Svelte', '.tf': 'Terraform',
+    '.proto': 'Protocol Buffers', '.graphql': 'GraphQL', '.gql': 'GraphQL',
+}
+
+# Dependency name (lowercase) -> (category, display name).
+KNOWN_PACKAGES = {
+    # Python
+    'django': ('frameworks', 'Django'), 'flask': ('frameworks', 'Flask'), 'fastapi': ('frameworks', 'FastAPI'),
+    'starlette': ('frameworks', 'Starlette'), 'tornado': ('frameworks', 'Tornado'), 'aiohttp': ('frameworks', 'aiohttp'),
+    'sqlalchemy': ('libraries', 'SQLAlchemy'), 'pydantic': ('libraries', 'Pydantic'), 'celery': ('libraries', 'Celery'),
+    'numpy': ('libraries', 'NumPy'), 'pandas': ('libraries', 'pandas'), 'scipy': ('libraries', 'SciPy'),
+    'torch': ('libraries', 'PyTorch'), 'tensorflow': ('libraries', 'TensorFlow'),
+    'scikit-learn': ('libraries', 'scikit-learn'), 'requests': ('libraries', 'Requests'), 'httpx': ('libraries', 'HTTPX'),
+    'pygithub': ('libraries', 'PyGithub'), 'gitpython': ('libraries', 'GitPython'),
+    'anthropic': ('libraries', 'Anthropic SDK'), 'openai': ('libraries', 'OpenAI SDK'),
+    'langchain': ('libraries', 'LangChain'), 'boto3': ('libraries', 'AWS SDK'),
+    'gunicorn': ('tools', 'Gunicorn'), 'uvicorn': ('tools', 'Uvicorn'),
+    'pytest': ('testing', 'pytest'), 'hypothesis': ('testing', 'Hypothesis'), 'tox': ('testing', 'tox'),
+    'nox': ('testing', 'nox'), 'black': ('tools', 'Black'), 'ruff': ('tools', 'Ruff'), 'flake8': ('tools', 'Flake8'),
+    'mypy': ('tools', 'mypy'), 'psycopg2': ('databases', 'PostgreSQL'), 'psycopg2-binary': ('databases', 'PostgreSQL'),
+    'psycopg': ('databases', 'PostgreSQL'), 'asyncpg': ('databases', 'PostgreSQL'), 'pymysql': ('databases', 'MySQL'),
+    'mysqlclient': ('databases', 'MySQL'), 'pymongo': ('databases', 'MongoDB'), 'redis': ('databases', 'Redis'),
+    # JavaScript / TypeScript
+    'react': ('frameworks', 'React'), 'next': ('frameworks', 'Next.js'), 'vue': ('frameworks', 'Vue'),
+    'nuxt': ('frameworks', 'Nuxt'), 'svelte': ('frameworks', 'Svelte'), '@angular/core': ('frameworks', 'Angular'),
+    'express': ('frameworks', 'Express'), 'koa': ('frameworks', 'Koa'), 'fastify': ('frameworks', 'Fastify'),
+    '@nestjs/core': ('frameworks', 'NestJS'), 'graphql': ('libraries', 'GraphQL'), 'tailwindcss': ('libraries', 'Tailwind CSS'),
+    'prisma': ('libraries', 'Prisma'), '@prisma/client': ('libraries', 'Prisma'), 'sequelize': ('libraries', 'Sequelize'),
+    'typeorm': ('libraries', 'TypeORM'), 'mongoose': ('databases', 'MongoDB'), 'pg': ('databases', 'PostgreSQL'),
+    'mysql2': ('databases', 'MySQL'), 'ioredis': ('databases', 'Redis'), 'typescript': ('tools', 'TypeScript compiler'),
+    'jest': ('testing', 'Jest'), 'mocha': ('testing', 'Mocha'), 'vitest': ('testing', 'Vitest'),
+    'cypress': ('testing', 'Cypress'), '@playwright/test': ('testing', 'Playwright'), 'webpack': ('tools', 'webpack'),
+    'vite': ('tools', 'Vite'), 'eslint': ('tools', 'ESLint'), 'prettier': ('tools', 'Prettier'),
+    '@babel/core': ('tools', 'Babel'),
+    # Go
+    'github.com/gin-gonic/gin': ('frameworks', 'Gin'), 'github.com/labstack/echo': ('frameworks', 'Echo'),
+    'github.com/gofiber/fiber': ('frameworks', 'Fiber'), 'gorm.io/gorm': ('libraries', 'GORM'),
+    'github.com/spf13/cobra': ('libraries', 'Cobra'), 'google.golang.org/grpc': ('libraries', 'gRPC'),
+    'github.com/stretchr/testify': ('testing', 'testify'), 'github.com/jackc/pgx': ('databases', 'PostgreSQL'),
+    'github.com/lib/pq': ('databases', 'PostgreSQL'), 'github.com/go-redis/redis': ('databases', 'Redis'),
+    'github.com/redis/go-redis': ('databases', 'Redis'),
+    # Rust
+    'tokio': ('libraries', 'Tokio'), 'actix-web': ('frameworks', 'Actix Web'), 'axum': ('frameworks', 'Axum'),
+    'rocket': ('frameworks', 'Rocket'), 'serde': ('libraries', 'Serde'), 'diesel': ('libraries', 'Diesel'),
+    'sqlx': ('libraries', 'SQLx'), 'clap': ('libraries', 'clap'), 'reqwest': ('libraries', 'reqwest'),
+    # Java / Kotlin (Maven artifactId)
+    'spring-core': ('frameworks', 'Spring'), 'hibernate-core': ('libraries', 'Hibernate'), 'lombok': ('libraries', 'Lombok'),
+    'junit': ('testing', 'JUnit'), 'junit-jupiter': ('testing', 'JUnit'), 'mockito-core': ('testing', 'Mockito'),
+    'postgresql': ('databases', 'PostgreSQL'), 'mysql-connector-java': ('databases', 'MySQL'),
+    # Ruby
+    'rails': ('frameworks', 'Ruby on Rails'), 'sinatra': ('frameworks', 'Sinatra'), 'rspec': ('testing', 'RSpec'),
+    'sidekiq': ('libraries', 'Sidekiq'),
+}
+KNOWN_PREFIXES = [('spring-boot', ('frameworks', 'Spring Boot')), ('@angular/', ('frameworks', 'Angular')),
+                  ('@nestjs/', ('frameworks', 'NestJS')), ('junit-jupiter', ('testing', 'JUnit'))]
+# Container image name -> database or service it provides.
+KNOWN_IMAGES = {'postgres': 'PostgreSQL', 'mysql': 'MySQL', 'mariadb': 'MariaDB', 'redis': 'Redis', 'mongo': 'MongoDB',
+                'elasticsearch': 'Elasticsearch', 'rabbitmq': 'RabbitMQ', 'memcached': 'Memcached'}
+
+# Lockfile name -> package manager. Most are in the built-in ignore patterns, so
+# they are looked up on disk next to each manifest rather than in the snapshot.
+LOCKFILES = {'poetry.lock': 'Poetry', 'uv.lock': 'uv', 'Pipfile.lock': 'Pipenv', 'package-lock.json': 'npm',
+             'yarn.lock': 'Yarn', 'pnpm-lock.yaml': 'pnpm', 'bun.lockb': 'Bun', 'Gemfile.lock': 'Bundler',
+             'composer.lock': 'Composer'}
+# .github and .gitlab-ci.yml are hidden from the snapshot by the built-in
+# ignore patterns, so CI configs are looked up on disk.
+CI_CONFIGS = [('GitHub Actions', '.github/workflows/*.y*ml'), ('GitLab CI', '.gitlab-ci.yml'),
+              ('CircleCI', '.circleci/config.yml'), ('Travis CI', '.travis.yml'), ('Jenkins', 'Jenkinsfile'),
+              ('Azure Pipelines', 'azure-pipelines.yml'), ('Bitbucket Pipelines', 'bitbucket-pipelines.yml')]
+
+
+class StackReport:
+    """What the manifests, lockfiles, container and CI configs of a tree say about its stack."""
+
+    CATEGORIES = ('frameworks', 'libraries', 'databases', 'testing', 'tools', 'package_managers', 'containers', 'ci')
+
+    def __init__(self):
+        self.languages = []
+        self.runtimes = {}
+        self.manifests = []
+        self.dependencies = {}
+        self.found = {category: set() for category in self.CATEGORIES}
+
+    def add(self, category, name):
+        if name:
+            self.found[category].add(name)
+
+    def add_dependencies(self, ecosystem, names):
+        names = {normalize_dependency(name) for name in names if name}
+        names.discard('')
+        self.dependencies.setdefault(ecosystem, set()).update(names)
+        for name in names:
+            known = KNOWN_PACKAGES.get(name) or next(
+                (value for prefix, value in KNOWN_PREFIXES if name.startswith(prefix)), None)
+            if known:
+                self.add(*known)
+
+    def to_dict(self):
+        data = {'languages': self.languages, 'runtimes': self.runtimes, 'manifests': self.manifests}
+        data.update((category, sorted(names)) for category, names in self.found.items())
+        data['dependencies'] = {ecosystem: sorted(names) for ecosystem, names in sorted(self.dependencies.items())}
+        return data
+
+
+def normalize_dependency(name):
+    name = name.strip().strip('"\'').lower()
+    # Go major-version suffixes: github.com/labstack/echo/v4 -> github.com/labstack/echo
+    return re.sub(r'/v\d+$', '', name)
+
+
+def requirement_name(requirement):
+    # "Django[bcrypt]>=4.2; python_version>'3.8'" -> "django"
+    match = re.match(r'\s*([A-Za-z0-9][A-Za-z0-9._-]*)', requirement)
+    return match.group(1).replace('_', '-') if match else None
+
+
+def load_toml(text):
+    if tomllib is None:
+        return None
+    try:
+        return tomllib.loads(text)
+    except ValueError:
+        return None
+
+
+def parse_pyproject(text, report):
+    report.add('package_managers', 'pip')
+    data = load_toml(text)
+    if data is None:
+        # No TOML parser: take quoted requirement strings from dependency arrays.
+        names = re.findall(r'^\s*"([A-Za-z0-9][A-Za-z0-9._-]*)[^"]*",?\s*$', text, re.MULTILINE)
+        report.add_dependencies('Python', names)
+        return
+    project = data.get('project', {})
+    requirements = list(project.get('dependencies', []))
+    for extra in project.get('optional-dependencies', {}).values():
+        requirements.extend(extra)
+    for group in data.get('dependency-groups', {}).values():
+        requirements.extend(item for item in group if isinstance(item, str))
+    names = [requirement_name(requirement) for requirement in requirements]
+    poetry = data.get('tool', {}).get('poetry', {})
+    if poetry:
+        report.add('package_managers', 'Poetry')
+        names.extend(name for name in poetry.get('dependencies', {}) if name != 'python')
+        for group in poetry.get('group', {}).values():
+            names.extend(group.get('dependencies', {}))
+    backend = data.get('build-system', {}).get('build-backend', '')
+    for module, tool in (('hatchling', 'Hatch'), ('flit', 'Flit'), ('pdm', 'PDM'), ('setuptools', 'setuptools'),
+                         ('maturin', 'maturin')):
+        if backend.startswith(module):
+            report.add('tools', tool)
+    for tool in data.get('tool', {}):
+        known = KNOWN_PACKAGES.get(tool)
+        if known and known[0] in ('tools', 'testing'):
+            report.add(*known)
+    python = project.get('requires-python') or poetry.get('dependencies', {}).get('python')
+    if isinstance(python, str):
+        report.runtimes.setdefault('Python', python)
+    report.add_dependencies('Python', names)
+
+
+def parse_setup_py(text, report):
+    report.add('package_managers', 'pip')
+    report.add('tools', 'setuptools')
+    requirements = []
+    try:
+        tree = ast.parse(text)
+    except SyntaxError:
+        tree = None
+    for node in ast.walk(tree) if tree is not None else ():
+        if isinstance(node, ast.keyword) and node.arg in ('install_requires', 'tests_require', 'extras_require'):
+            requirements.extend(n.value for n in ast.walk(node.value)
+                                if isinstance(n, ast.Constant) and isinstance(n.value, str))
+        if isinstance(node, ast.keyword) and node.arg == 'python_requires' and isinstance(node.value, ast.Constant):
+            report.runtimes.setdefault('Python', node.value.value)
+    report.add_dependencies('Python', [requirement_name(requirement) for requirement in requirements])
+
+
+def parse_setup_cfg(text, report):
+    report.add('tools', 'setuptools')
+    block = re.search(r'install_requires\s*=\s*\n((?:[ \t]+\S.*\n?)+)', text)
+    if block:
+        report.add_dependencies('Python', [requirement_name(line) for line in block.group(1).splitlines()])
+
+
+def parse_requirements(text, report):
+    report.add('package_managers', 'pip')
+    lines = [line.split('#')[0].strip() for line in text.splitlines()]
+    report.add_dependencies('Python', [requirement_name(line) for line in lines if line and not line.startswith('-')])
+
+
+def parse_pipfile(text, report):
+    report.add('package_managers', 'Pipenv')
+    data = load_toml(text) or {}
+    report.add_dependencies('Python', list(data.get('packages', {})) + list(data.get('dev-packages', {})))
+
+
+def parse_package_json(text, report):
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return
+    report.add('package_managers', 'npm')
+    names = []
+    for key in ('dependencies', 'devDependencies', 'peerDependencies', 'optionalDependencies'):
+        names.extend((data.get(key) or {}).keys())
+    report.add_dependencies('JavaScript', names)
+    node = (data.get('engines') or {}).get('node')
+    if node:
+        report.runtimes.setdefault('Node.js', node)
+    manager = data.get('packageManager', '')
+    if manager:
+        report.add('package_managers', {'yarn': 'Yarn', 'pnpm': 'pnpm', 'npm': 'npm', 'bun': 'Bun'}.get(
+            manager.split('@')[0], manager.split('@')[0]))
+
+
+def parse_go_mod(text, report):
+    report.add('package_managers', 'Go modules')
+    version = re.search(r'^go\s+(\S+)', text, re.MULTILINE)
+    if version:
+        report.runtimes.setdefault('Go', version.group(1))
+    names = re.findall(r'^\s*(?:require\s+)?([a-z0-9.-]+\.[a-z]+/\S+)\s+v\S+', text, re.MULTILINE)
+    report.add_dependencies('Go', names)
+
+
+def parse_cargo_toml(text, report):
+    report.add('package_managers', 'Cargo')
+    data = load_toml(text)
+    if data is None:
+        block = re.search(r'^\[dependencies\]\n((?:[^\[].*\n?)*)', text, re.MULTILINE)
+        names = re.findall(r'^([A-Za-z0-9_-]+)\s*=', block.group(1), re.MULTILINE) if block else []
+        report.add_dependencies('Rust', names)
+        return
+    names = []
+    for key in ('dependencies', 'dev-dependencies', 'build-dependencies'):
+        names.extend(data.get(key, {}))
+    names.extend(data.get('workspace', {}).get('dependencies', {}))
+    edition = data.get('package', {}).get('edition')
+    if edition:
+        report.runtimes.setdefault('Rust', f"edition {edition}")
+    report.add_dependencies('Rust', names)
+
+
+def parse_pom_xml(text, report):
+    report.add('package_managers', 'Maven')
+    try:
+        root = ElementTree.fromstring(text)
+    except ElementTree.ParseError:
+        return
+    namespace = root.tag[:root.tag.index('}') + 1] if root.tag.startswith('{') else ''
+    names = [element.text for element in root.iter(f"{namespace}artifactId")
+             if element.text and element.text != root.findtext(f"{namespace}artifactId")]
+    report.add_dependencies('Java', names)
+    for prop in ('java.version', 'maven.compiler.release', 'maven.compiler.source'):
+        version = root.findtext(f"{namespace}properties/{namespace}{prop}")
+        if version:
+            report.runtimes.setdefault('Java', version)
+            break
+
+
+def parse_gradle(text, report):
+    report.add('package_managers', 'Gradle')
+    names = re.findall(r'''["'][\w.-]+:([\w.-]+)(?::[^"']*)?["']''', text)
+    report.add_dependencies('Java', names)
+
+
+def parse_gemfile(text, report):
+    report.add('package_managers', 'Bundler')
+    report.add_dependencies('Ruby', re.findall(r'''^\s*gem\s+["']([^"']+)["']''', text, re.MULTILINE))
+    version = re.search(r'''^\s*ruby\s+["']([^"']+)["']''', text, re.MULTILINE)
+    if version:
+        report.runtimes.setdefault('Ruby', version.group(1))
+
+
+def parse_composer_json(text, report):
+    report.add('package_managers', 'Composer')
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return
+    report.add_dependencies('PHP', [name for key in ('require', 'require-dev') for name in (data.get(key) or {})
+                                    if '/' in name])
+
+
+def add_image(report, image):
+    report.add('containers', image)
+    name = image.split('@')[0].split(':')[0].rsplit('/', 1)[-1]
+    if name in KNOWN_IMAGES:
+        report.add('databases', KNOWN_IMAGES[name])
+
+
+def parse_dockerfile(text, report):
+    report.add('tools', 'Docker')
+    stages = set()
+    for image, stage in re.findall(r'^\s*FROM\s+(?:--\S+\s+)*(\S+)(?:\s+AS\s+(\S+))?', text, re.MULTILINE | re.IGNORECASE):
+        if image not in stages and image.lower() != 'scratch':
+            add_image(report, image)
+        if stage:
+            stages.add(stage)
+
+
+def parse_compose(text, report):
+    report.add('tools', 'Docker Compose')
+    for image in re.findall(r'^\s*image:\s*["\']?([^"\'\s#]+)', text, re.MULTILINE):
+        add_image(report, image)
+
+
+MANIFEST_PARSERS = {
+    'pyproject.toml': parse_pyproject, 'setup.py': parse_setup_py, 'setup.cfg': parse_setup_cfg,
+    'Pipfile': parse_pipfile, 'package.json': parse_package_json, 'go.mod': parse_go_mod,
+    'Cargo.toml': parse_cargo_toml, 'pom.xml': parse_pom_xml, 'build.gradle': parse_gradle,
+    'build.gradle.kts': parse_gradle, 'Gemfile': parse_gemfile, 'composer.json': parse_composer_json,
+}
+
+
+def manifest_parser(file_name):
+    if file_name in MANIFEST_PARSERS:
+        return MANIFEST_PARSERS[file_name]
+    if re.fullmatch(r'requirements.*\.(txt|in)', file_name):
+        return parse_requirements
+    if file_name == 'Dockerfile' or file_name.startswith('Dockerfile.') or file_name.endswith('.Dockerfile'):
+        return parse_dockerfile
+    if re.fullmatch(r'(docker-)?compose(\..+)?\.ya?ml', file_name):
+        return parse_compose
+    return None
+
+
+def find_manifests(snapshot):
+    # Shallowest first, so a monorepo's root manifests are never crowded out.
+    entries = [entry for entry in snapshot.files if manifest_parser(os.path.basename(entry.path))]
+    entries.sort(key=lambda entry: (entry.path.count(os.sep), entry.path))
+    return entries[:MAX_MANIFESTS]
+
+
+def find_ci_configs():
+    configs = []
+    for name, pattern in CI_CONFIGS:
+        paths = sorted(glob.glob(pattern))
+        if paths:
+            configs.append((name, paths))
+    return configs
+
+
+def count_languages(snapshot):
+    counts = {}
+    for entry in snapshot.files:
+        language = LANGUAGES.get(entry.ext)
+        if language:
+            counts[language] = counts.get(language, 0) + 1
+    total = sum(counts.values())
+    return [{'name': name, 'files': files, 'share': round(files / total, 3)}
+            for name, files in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
+
+
+def read_text(path):
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+def stack_fingerprint(manifest_texts, ci_texts, languages):
+    """Changes when a manifest, lockfile name, CI config or the set of languages changes.
+
+    File counts are left out, so adding a source file in a known language
+    does not make the report (and the model call enriching it) stale.
+    """
+    digest = hashlib.sha256(f"v{DETECTOR_VERSION}\n".encode('utf-8'))
+    for path, text in sorted(manifest_texts.items()) + sorted(ci_texts.items()):
+        digest.update(f"{path}\0{hashlib.sha256(text.encode('utf-8')).hexdigest()}\n".encode('utf-8'))
+    digest.update('\n'.join(sorted(language['name'] for language in languages)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def detect_tech_stack(snapshot):
+    """Returns (report, fingerprint) for the tree in `snapshot`, without calling the model."""
+    report = StackReport()
+    report.languages = count_languages(snapshot)
+    manifest_texts = {}
+    for entry in find_manifests(snapshot):
+        file_name = os.path.basename(entry.path)
+        text = entry.read()
+        manifest_texts[os.path.relpath(entry.path, snapshot.root)] = text
+        report.manifests.append(os.path.relpath(entry.path, snapshot.root))
+        try:
+            manifest_parser(file_name)(text, report)
+        except Exception as e:
+            logging.warning(f"Could not parse {entry.path}: {str(e)}")
+
+    # Only presence counts toward the fingerprint; lockfile contents change with every install.
+    for directory in sorted({os.path.dirname(path) for path in report.manifests} | {''}):
+        for lockfile, manager in LOCKFILES.items():
+            path = os.path.join(directory, lockfile)
+            if os.path.isfile(os.path.join(snapshot.root, path)):
+                report.add('package_managers', manager)
+                manifest_texts.setdefault(path, '')
+
+    ci_texts = {}
+    for name, paths in find_ci_configs():
+        report.add('ci', name)
+        for path in paths:
+            ci_texts[path] = read_text(path)
+            if name == 'GitHub Actions' and re.search(r'uses:\s*["\']?docker/', ci_texts[path]):
+                report.add('tools', 'Docker')
+    return report.to_dict(), stack_fingerprint(manifest_texts, ci_texts, report.languages)
+
+
+def render_report(report):
+    lines = []
+    if report['languages']:
+        lines.append("## Languages\n")
+        lines.extend(f"- {language['name']}: {language['files']} file{'s' if language['files'] != 1 else ''} "
+                     f"({language['share']:.0%})"
+                     for language in report['languages'])
+        lines.append("")
+    if report['runtimes']:
+        lines.append("## Runtimes\n")
+        lines.extend(f"- {name} {version}" for name, version in sorted(report['runtimes'].items()))
+        lines.append("")
+    titles = [('frameworks', 'Frameworks'), ('libraries', 'Libraries'), ('databases', 'Databases and services'),
+              ('testing', 'Testing'), ('tools', 'Build and DevOps tools'), ('package_managers', 'Package managers'),
+              ('containers', 'Container images'), ('ci', 'Continuous integration')]
+    for key, title in titles:
+        if report[key]:
+            lines.append(f"## {title}\n")
+            lines.extend(f"- {name}" for name in report[key])
+            lines.append("")
+    if report['dependencies']:
+        lines.append("## Dependencies\n")
+        for ecosystem, names in report['dependencies'].items():
+            shown = ', '.join(names[:MAX_LISTED_DEPENDENCIES])
+            more = f" and {len(names) - MAX_LISTED_DEPENDENCIES} more" if len(names) > MAX_LISTED_DEPENDENCIES else ""
+            lines.append(f"- {ecosystem}: {shown}{more}")
+        lines.append("")
+    if report['manifests']:
+        lines.append("## Detected from\n")
+        lines.append(', '.join(f"`{path}`" for path in report['manifests']))
+        lines.append("")
+    return '\n'.join(lines)
+
+
+def load_cached_stack(fingerprint):
+    try:
+        with open(STACK_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # A report saved without notes (the model call failed) is a miss, so the notes are fetched again.
+    return cached if cached.get('fingerprint') == fingerprint and cached.get('enrichment') else None
+
+
+def save_cached_stack(fingerprint, report, enrichment):
+    os.makedirs(CODEBASE_CACHE_DIR, exist_ok=True)
+    with open(STACK_CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': fingerprint, 'report': report, 'enrichment': enrichment}, f, indent=2)
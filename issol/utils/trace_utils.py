@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+class Span:
+    __slots__ = ('name', 'attrs', 'parent', 'start', 'end', 'thread')
+
+    def __init__(self, name, parent, attrs):
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.thread = threading.get_ident()
+        self.start = time.perf_counter()
+        self.end = None
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    @property
+    def path(self):
+        names = []
+        span = self
+        while span is not None:
+            names.append(span.name)
+            span = span.parent
+        return tuple(reversed(names))
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key, amount=1):
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+    def add(self, key, amount=1):
+        pass
+
+
+_null_span = _NullSpan()
+
+
+class Tracer:
+    """Records nested timing spans for --profile and --trace-json.
+
+    Disabled by default, in which case span() hands out a shared no-op span.
+    Each thread keeps its own stack of open spans; work handed to a pool can
+    be attached to the submitting span with adopt().
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self.totals = {}
+        self.origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self):
+        stack = self._stack() if self.enabled else None
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name, detached=False, **attrs):
+        # A detached span is timed but never becomes the parent of other spans;
+        # generators use it so the caller's work between yields is not nested under them.
+        if not self.enabled:
+            yield _null_span
+            return
+        stack = self._stack()
+        span = Span(name, stack[-1] if stack else None, attrs)
+        if not detached:
+            stack.append(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            if not detached:
+                stack.remove(span)
+            with self._lock:
+                self.spans.append(span)
+
+    @contextmanager
+    def adopt(self, span):
+        # Makes `span` the parent of spans opened on this (worker) thread.
+        if not self.enabled or span is None:
+            yield
+            return
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield
+        finally:
+            stack.remove(span)
+
+    def count(self, key, amount=1, span=None):
+        # Adds to `span` (default: the innermost open span on this thread) and to the process totals.
+        if not self.enabled:
+            return
+        with self._lock:
+            self.totals[key] = self.totals.get(key, 0) + amount
+        span = span or self.current()
+        if span is not None:
+            span.add(key, amount)
+
+    def summary(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        phases = {}
+        first_start = {}
+        for span in spans:
+            path = span.path
+            first_start.setdefault(path, span.start)
+            phase = phases.setdefault(path, {'calls': 0, 'total': 0.0, 'max': 0.0, 'attrs': {}})
+            phase['calls'] += 1
+            phase['total'] += span.duration
+            phase['max'] = max(phase['max'], span.duration)
+            for key, value in span.attrs.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    phase['attrs'][key] = phase['attrs'].get(key, 0) + value
+
+        def tree_order(path):
+            # Children sort directly below their parent, siblings by first start.
+            return [first_start.get(path[:i + 1], 0) for i in range(len(path))]
+
+        lines = ["Profile:", f"{'Phase':<40} {'Calls':>5} {'Total (s)':>10} {'Max (s)':>8}  Details"]
+        for path in sorted(phases, key=tree_order):
+            phase = phases[path]
+            label = '  ' * (len(path) - 1) + path[-1]
+            details = ' '.join(f"{key}={_format_value(value)}" for key, value in phase['attrs'].items())
+            lines.append(f"{label:<40} {phase['calls']:>5} {phase['total']:>10.3f} {phase['max']:>8.3f}  {details}")
+        if self.totals:
+            lines.append("Totals: " + ', '.join(f"{key}={_format_value(value)}" for key, value in sorted(self.totals.items())))
+        return '\n'.join(lines)
+
+    def chrome_trace(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        threads = {}
+        events = []
+        pid = os.getpid()
+        for span in spans:
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            events.append({
+                'name': span.name,
+                'ph': 'X',
+                'ts': round((span.start - self.origin) * 1e6, 1),
+                'dur': round(span.duration * 1e6, 1),
+                'pid': pid,
+                'tid': tid,
+                'args': {key: value for key, value in span.attrs.items() if _is_json_value(value)},
+            })
+        for tid in threads.values():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': 'main' if tid == 1 else f"worker-{tid - 1}"}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'totals': self.totals}}
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+def _format_value(value):
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+
+def _is_json_value(value):
+    return isinstance(value, (str, int, float, bool)) or value is None
+
+
+tracer = Tracer()
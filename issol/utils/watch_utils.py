@@ -0,0 +1,123 @@
+import os
+import time
+import logging
+import threading
+from .github_utils import scan_codebase_files, DEFAULT_SCAN_WORKERS
+from .git_object_utils import branch_commit
+from .ignore_matcher import GITIGNORE_FILE
+from .manifest_utils import CodebaseManifest
+from .snapshot_utils import get_codebase_snapshot
+from .content_utils import content_classifier
+from .config_utils import WATCH_INTERVAL
+
+DEFAULT_WATCH_INTERVAL = WATCH_INTERVAL
+
+
+class CodebaseWatcher:
+    """Keeps the scanned files of one branch current for a long-running process.
+
+    Every `interval` seconds the working tree is checked again (or, for a
+    branch read from git objects, its commit is resolved again). A check
+    stats each directory and file of the last walk, without listing
+    directories or matching ignore rules: about 0.04s for 18k files, against
+    0.5s for a walk. Only when a directory's mtime (an entry was added or
+    removed) or a file's mtime or size changed is the tree walked again and
+    the files rescanned, using one manifest and one ignore matcher kept in
+    memory. Callers get the latest (path, content) list from files().
+    """
+
+    def __init__(self, branch, use_cache=True, workers=DEFAULT_SCAN_WORKERS, interval=DEFAULT_WATCH_INTERVAL):
+        self.branch = branch
+        self.use_cache = use_cache
+        self.workers = workers
+        self.interval = interval
+        self.manifest = CodebaseManifest.load() if use_cache else CodebaseManifest()
+        self.ignore_matcher = None
+        self.scans = 0
+        self.last_scan_seconds = 0.0
+        self.last_scan_at = None
+        self._gitignores = None
+        self._snapshot = None
+        self._tree_signature = None
+        self._signature = None
+        self._files = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _unchanged(snapshot):
+        try:
+            for directory, mtime in snapshot.directory_mtimes.items():
+                if os.stat(directory).st_mtime_ns != mtime:
+                    return False
+            for entry in snapshot.files:
+                stat = os.stat(entry.path)
+                if stat.st_mtime_ns != entry.stat.st_mtime_ns or stat.st_size != entry.size:
+                    return False
+        except OSError:
+            return False
+        return True
+
+    def _working_tree_signature(self):
+        if self._snapshot is not None and self._unchanged(self._snapshot):
+            return self._tree_signature
+        snapshot = get_codebase_snapshot(refresh=True, ignore_matcher=self.ignore_matcher)
+        gitignores = self._gitignore_state(snapshot)
+        if self._gitignores is not None and gitignores != self._gitignores:
+            # Ignore rules changed: compile them again and walk the tree with the new rules.
+            snapshot = get_codebase_snapshot(refresh=True)
+            gitignores = self._gitignore_state(snapshot)
+        self.ignore_matcher = snapshot.ignore_matcher
+        self._gitignores = gitignores
+        self._snapshot = snapshot
+        self._tree_signature = hash(tuple((entry.path, entry.stat.st_mtime_ns, entry.size) for entry in snapshot.files))
+        return self._tree_signature
+
+    @staticmethod
+    def _gitignore_state(snapshot):
+        return tuple((entry.path, entry.stat.st_mtime_ns) for entry in snapshot.files
+                     if os.path.basename(entry.path) == GITIGNORE_FILE)
+
+    def refresh(self):
+        # Returns True when the files were rescanned.
+        commit = branch_commit(self.branch)
+        signature = commit if commit is not None else self._working_tree_signature()
+        if signature == self._signature:
+            return False
+        start = time.perf_counter()
+        self.manifest.begin_scan()
+        content_classifier.skipped.clear()
+        files = scan_codebase_files(self.branch, self.use_cache, self.workers, manifest=self.manifest,
+                                    working_tree=commit is None)
+        with self._lock:
+            self._files = files
+            self._signature = signature
+        self.scans += 1
+        self.last_scan_seconds = time.perf_counter() - start
+        self.last_scan_at = time.time()
+        if self.scans > 1:
+            print(f"Codebase changed, rescanned {len(files)} files in {self.last_scan_seconds:.2f}s")
+        return True
+
+    def files(self):
+        with self._lock:
+            return self._files
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.warning(f"Codebase refresh failed: {str(e)}")
+
+    def start(self):
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name='codebase-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -3,9 +3,9 @@ from setuptools import setup, find_packages
 setup(
     name='issol',
     version='0.3.2',
-    packages=find_packages(),
+    packages=find_packages(exclude=['tests', 'tests.*']),
     install_requires=[
-        'PyGithub',
+        'PyGithub>=2.2',
         'anthropic',
         'gitpython',
     ],
@@ -14,5 +14,5 @@ setup(
             'issol=issol.cli:main',
         ],
     },
-    python_requires='>=3.6',
+    python_requires='>=3.8',
 )
\ No newline at end of file
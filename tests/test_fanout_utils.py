@@ -0,0 +1,28 @@
+from issol.utils.fanout_utils import group_related_files, related_key
+
+
+def test_test_markers_are_stripped():
+    assert related_key('src/user.py') == 'user'
+    assert related_key('tests/test_user.py') == 'user'
+    assert related_key('pkg/user_test.go') == 'user'
+    assert related_key('lib/user_tests.py') == 'user'
+    assert related_key('web/user.spec.ts') == 'user'
+
+
+def test_generic_stems_are_keyed_by_path():
+    assert related_key('a/__init__.py') == 'a/__init__.py'
+    assert related_key('./b/utils.py') == 'b/utils.py'
+    assert related_key('test_utils.py') == 'test_utils.py'
+
+
+def test_module_and_tests_are_grouped_in_order():
+    files = ['src/user.py', 'src/order.py', 'tests/test_user.py', 'web/user.spec.ts', 'tests/test_order.py']
+    assert group_related_files(files) == [
+        ['src/user.py', 'tests/test_user.py', 'web/user.spec.ts'],
+        ['src/order.py', 'tests/test_order.py'],
+    ]
+
+
+def test_generic_files_stay_separate_and_blank_entries_are_dropped():
+    files = ['a/__init__.py', ' b/__init__.py ', '', '   ', 'main.py']
+    assert group_related_files(files) == [['a/__init__.py'], ['b/__init__.py'], ['main.py']]
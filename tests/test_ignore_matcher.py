@@ -0,0 +1,87 @@
+from issol.utils.ignore_matcher import IgnoreMatcher
+
+
+def make_matcher(tmp_path, gitignore, nested=None):
+    (tmp_path / '.gitignore').write_text(gitignore)
+    for directory, text in (nested or {}).items():
+        (tmp_path / directory).mkdir(parents=True, exist_ok=True)
+        (tmp_path / directory / '.gitignore').write_text(text)
+    return IgnoreMatcher(str(tmp_path), patterns=[])
+
+
+def test_negation_re_includes_a_file(tmp_path):
+    matcher = make_matcher(tmp_path, '*.log\n!keep.log\n')
+    assert matcher.is_ignored('debug.log')
+    assert matcher.is_ignored('sub/debug.log')
+    assert not matcher.is_ignored('keep.log')
+    assert not matcher.is_ignored('sub/keep.log')
+
+
+def test_later_rule_wins(tmp_path):
+    matcher = make_matcher(tmp_path, '!keep.log\n*.log\n')
+    assert matcher.is_ignored('keep.log')
+
+
+def test_negation_cannot_re_include_below_an_ignored_directory(tmp_path):
+    matcher = make_matcher(tmp_path, 'build/\n!build/keep.txt\n')
+    assert matcher.is_ignored('build', is_dir=True)
+    assert matcher.is_ignored('build/keep.txt')
+
+
+def test_nested_gitignore_negates_a_parent_rule(tmp_path):
+    matcher = make_matcher(tmp_path, '*.txt\n', {'docs': '!notes.txt\n'})
+    assert matcher.is_ignored('notes.txt')
+    assert not matcher.is_ignored('docs/notes.txt')
+    assert matcher.is_ignored('docs/other.txt')
+
+
+def test_leading_slash_anchors_to_the_gitignore_directory(tmp_path):
+    matcher = make_matcher(tmp_path, '/config.py\n', {'pkg': '/local.py\n'})
+    assert matcher.is_ignored('config.py')
+    assert not matcher.is_ignored('pkg/config.py')
+    assert matcher.is_ignored('pkg/local.py')
+    assert not matcher.is_ignored('local.py')
+    assert not matcher.is_ignored('pkg/sub/local.py')
+
+
+def test_inner_slash_anchors_and_bare_names_match_at_any_depth(tmp_path):
+    matcher = make_matcher(tmp_path, 'docs/build\ntmp\n')
+    assert matcher.is_ignored('docs/build', is_dir=True)
+    assert not matcher.is_ignored('src/docs/build', is_dir=True)
+    assert matcher.is_ignored('tmp', is_dir=True)
+    assert matcher.is_ignored('a/b/tmp')
+
+
+def test_trailing_slash_only_matches_directories(tmp_path):
+    matcher = make_matcher(tmp_path, 'cache/\n')
+    assert matcher.is_ignored('cache', is_dir=True)
+    assert matcher.is_ignored('cache/data.bin')
+    assert not matcher.is_ignored('cache')
+
+
+def test_double_star_prefix_matches_any_depth(tmp_path):
+    matcher = make_matcher(tmp_path, '**/fixtures/*.json\n')
+    assert matcher.is_ignored('fixtures/a.json')
+    assert matcher.is_ignored('a/b/fixtures/a.json')
+    assert not matcher.is_ignored('a/fixtures/deeper/a.json')
+
+
+def test_double_star_in_the_middle_matches_zero_or_more_directories(tmp_path):
+    matcher = make_matcher(tmp_path, 'a/**/b.txt\n')
+    assert matcher.is_ignored('a/b.txt')
+    assert matcher.is_ignored('a/x/b.txt')
+    assert matcher.is_ignored('a/x/y/b.txt')
+    assert not matcher.is_ignored('c/a/b.txt')
+
+
+def test_double_star_suffix_matches_everything_inside(tmp_path):
+    matcher = make_matcher(tmp_path, 'out/**\n')
+    assert matcher.is_ignored('out/a.txt')
+    assert matcher.is_ignored('out/x/y.txt')
+    assert not matcher.is_ignored('out', is_dir=True)
+
+
+def test_single_star_does_not_cross_directories(tmp_path):
+    matcher = make_matcher(tmp_path, 'src/*.gen\n')
+    assert matcher.is_ignored('src/a.gen')
+    assert not matcher.is_ignored('src/sub/a.gen')
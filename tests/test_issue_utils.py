@@ -0,0 +1,127 @@
+from datetime import datetime
+
+import pytest
+
+from issol.utils.issue_utils import ISSUE_PAGE_SIZE, fetch_issues, iter_open_issues
+
+
+def node(number, title, body=None, labels=()):
+    return {'number': number, 'title': title, 'url': f"https://github.com/o/r/issues/{number}",
+            'updatedAt': '2024-01-01T00:00:00Z', 'body': body,
+            'labels': {'nodes': [{'name': label} for label in labels]}}
+
+
+def page(nodes, cursor=None, total=None):
+    return {'totalCount': total, 'issueCount': total, 'nodes': nodes,
+            'pageInfo': {'hasNextPage': cursor is not None, 'endCursor': cursor}}
+
+
+class FakeRequester:
+    graphql_url = 'https://api.github.com/graphql'
+
+    def __init__(self, responses):
+        # Each response is a dict returned as the GraphQL payload, or an exception to raise.
+        self.responses = list(responses)
+        self.calls = []
+
+    def requestJsonAndCheck(self, verb, url, input=None):
+        self.calls.append(input)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return {}, response
+
+
+class FakeRestIssue:
+    def __init__(self, number, title, body='', pull=False, labels=()):
+        self.number = number
+        self.title = title
+        self.body = body
+        self.html_url = f"https://github.com/o/r/{'pull' if pull else 'issues'}/{number}"
+        self.updated_at = datetime(2024, 1, 1)
+        self.labels = [type('Label', (), {'name': label})() for label in labels]
+
+
+class FakeRepo:
+    full_name = 'o/r'
+
+    def __init__(self, responses, rest_issues=()):
+        self.requester = FakeRequester(responses)
+        self.rest_issues = list(rest_issues)
+        self.rest_kwargs = None
+
+    def get_issues(self, **kwargs):
+        self.rest_kwargs = kwargs
+        return iter(self.rest_issues)
+
+
+def listing(nodes, cursor=None, total=None):
+    return {'data': {'repository': {'issues': page(nodes, cursor, total)}}}
+
+
+def search(nodes, cursor=None, total=None):
+    return {'data': {'search': page(nodes, cursor, total)}}
+
+
+def test_listing_follows_cursors_across_pages():
+    repo = FakeRepo([listing([node(1, 'a'), node(2, 'b')], 'c1', total=3), listing([node(3, 'c')])])
+    issues = list(iter_open_issues(repo, labels=['bug']))
+    assert [issue.number for issue in issues] == [1, 2, 3]
+    variables = [call['variables'] for call in repo.requester.calls]
+    assert [v['after'] for v in variables] == [None, 'c1']
+    assert all(v['first'] == ISSUE_PAGE_SIZE and v['labels'] == ['bug'] for v in variables)
+    assert all(v['owner'] == 'o' and v['name'] == 'r' and v['withBody'] is False for v in variables)
+
+
+def test_marker_search_rechecks_titles():
+    repo = FakeRepo([search([node(1, 'AI: Generate Code for x', 'body'), node(2, 'Generate AI code'), None],
+                           total=2)])
+    issues = list(iter_open_issues(repo, marker='AI: Generate Code', with_body=True))
+    assert [(issue.number, issue.body) for issue in issues] == [(1, 'body')]
+    query = repo.requester.calls[0]['variables']['query']
+    assert 'repo:o/r' in query and 'in:title "AI: Generate Code"' in query
+
+
+def test_search_over_the_limit_lists_issues_instead():
+    repo = FakeRepo([search([node(1, 'AI: Generate Code')], 'c1', total=5000),
+                     listing([node(1, 'AI: Generate Code'), node(2, 'other')], total=2)])
+    issues = list(iter_open_issues(repo, marker='AI: Generate Code'))
+    assert [issue.number for issue in issues] == [1]
+    assert 'repository(' in repo.requester.calls[1]['query']
+
+
+def test_graphql_errors_fall_back_to_rest():
+    rest_issues = [FakeRestIssue(1, 'one', labels=['bug']), FakeRestIssue(2, 'a pull request', pull=True),
+                   FakeRestIssue(3, 'three')]
+    repo = FakeRepo([{'errors': [{'message': 'GraphQL is disabled'}]}], rest_issues)
+    issues = list(iter_open_issues(repo, labels=['bug'], since='2024-01-01T00:00:00+00:00'))
+    assert [issue.number for issue in issues] == [1, 3]
+    assert issues[0].labels == ['bug'] and issues[0].body is None
+    assert repo.rest_kwargs['labels'] == ['bug']
+    assert repo.rest_kwargs['since'] == datetime.fromisoformat('2024-01-01T00:00:00+00:00')
+
+
+def test_failure_after_issues_were_yielded_is_raised():
+    repo = FakeRepo([listing([node(1, 'a')], 'c1'), ConnectionError('reset')], [FakeRestIssue(1, 'a')])
+    issues = iter_open_issues(repo)
+    assert next(issues).number == 1
+    with pytest.raises(ConnectionError):
+        next(issues)
+    assert repo.rest_kwargs is None
+
+
+def test_fetch_issues_batches_numbers_and_skips_missing_ones():
+    numbers = list(range(1, ISSUE_PAGE_SIZE + 3))
+    first = {f"issue_{n}": node(n, f"issue {n}") for n in numbers[:ISSUE_PAGE_SIZE]}
+    first['issue_5'] = None
+    repo = FakeRepo([{'data': {'repository': first}, 'errors': [{'message': 'Could not resolve issue 5'}]},
+                     {'data': {'repository': {f"issue_{n}": node(n, f"issue {n}") for n in numbers[ISSUE_PAGE_SIZE:]}}}])
+    issues = fetch_issues(repo, numbers + [1])
+    assert len(repo.requester.calls) == 2
+    assert sorted(issues) == [n for n in numbers if n != 5]
+    assert issues[7].title == 'issue 7'
+
+
+def test_fetch_issues_returns_none_without_graphql():
+    repo = FakeRepo([RuntimeError('GraphQL unavailable')])
+    assert fetch_issues(repo, [1, 2]) is None
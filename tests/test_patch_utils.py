@@ -0,0 +1,91 @@
+from issol.utils.patch_utils import apply_patch, find_block, is_patch, parse_edits
+
+ORIGINAL = """import os
+
+
+def load(path):
+    with open(path) as f:
+        data = f.read()
+    return data
+
+
+def save(path, data):
+    with open(path, 'w') as f:
+        f.write(data)
+"""
+
+
+def search_replace(search, replace):
+    return f"<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE\n"
+
+
+def test_exact_match():
+    result = apply_patch(ORIGINAL, search_replace("        data = f.read()", "        data = f.read().strip()"))
+    assert [hunk.match for hunk in result.applied] == ['exact']
+    assert not result.failed
+    assert "        data = f.read().strip()\n" in result.content
+    assert result.content.endswith("f.write(data)\n")
+
+
+def test_whitespace_match_is_reindented():
+    search = "with open(path) as f:\n    data = f.read()"
+    replace = "with open(path, encoding='utf-8') as f:\n    data = f.read()"
+    result = apply_patch(ORIGINAL, search_replace(search, replace))
+    assert [hunk.match for hunk in result.applied] == ['whitespace']
+    assert "    with open(path, encoding='utf-8') as f:\n        data = f.read()\n" in result.content
+
+
+def test_fuzzy_match():
+    search = "def save(path, data):\n    with open(path, 'wb') as f:\n        f.write(data)"
+    replace = "def save(path, data):\n    with open(path, 'a') as f:\n        f.write(data)"
+    result = apply_patch(ORIGINAL, search_replace(search, replace))
+    assert [hunk.match for hunk in result.applied] == ['fuzzy']
+    assert "    with open(path, 'a') as f:\n" in result.content
+    assert "'w')" not in result.content
+
+
+def test_unrelated_block_fails_and_leaves_the_file_alone():
+    result = apply_patch(ORIGINAL, search_replace("class Cache:\n    pass", "class Cache:\n    size = 0"))
+    assert not result.applied
+    assert len(result.failed) == 1
+    assert result.content == ORIGINAL
+    assert result.summary() == "applied 0/1 edit(s)"
+
+
+def test_find_block_prefers_matches_after_start():
+    lines = ['x = 1', 'y = 2', 'x = 1']
+    assert find_block(lines, ['x = 1']) == (0, 'exact')
+    assert find_block(lines, ['x = 1'], start=1) == (2, 'exact')
+
+
+def test_empty_search_appends():
+    patch = "<<<<<<< SEARCH\n=======\n\n\ndef remove(path):\n    os.remove(path)\n>>>>>>> REPLACE\n"
+    result = apply_patch(ORIGINAL, patch)
+    assert [hunk.match for hunk in result.applied] == ['exact']
+    assert result.content == ORIGINAL + "\n\ndef remove(path):\n    os.remove(path)\n"
+
+
+def test_fences_inside_search_replace_blocks_are_kept():
+    original = "Usage:\n```\nissol -r 1\n```\n"
+    patch = "```\n" + search_replace("```\nissol -r 1\n```", "```\nissol -r 1 2\n```") + "```\n"
+    result = apply_patch(original, patch)
+    assert not result.failed
+    assert result.content == "Usage:\n```\nissol -r 1 2\n```\n"
+
+
+def test_unified_diff_inside_a_fence():
+    patch = """```diff
+@@ -6,3 +6,3 @@
+     with open(path) as f:
+-        data = f.read()
++        data = f.read().strip()
+     return data
+```
+"""
+    assert is_patch(patch)
+    hunks = parse_edits(patch)
+    assert len(hunks) == 1
+    assert hunks[0].search[-1] == "    return data"
+    result = apply_patch(ORIGINAL, patch)
+    assert [hunk.match for hunk in result.applied] == ['exact']
+    assert "        data = f.read().strip()\n" in result.content